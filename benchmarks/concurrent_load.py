@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark de latence de l'API sous charge concurrente.
+
+Lance un serveur uvicorn sur une base SQLite temporaire (ou cible un serveur
+existant avec --url), puis envoie en parallèle :
+
+- des lectures rapides (GET d'une feuille d'aventure)
+- des écritures (PATCH de l'endurance, un commit SQLite par requête)
+- quelques requêtes lourdes (simulation de combats)
+
+et affiche les percentiles de latence par type de requête. Une route qui bloque
+la boucle d'événements retarde toutes les autres : cela se voit sur le p99 des
+lectures.
+
+Usage :
+    uv run python benchmarks/concurrent_load.py --duration 10 --clients 32
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def request(base_url: str, method: str, path: str, body: dict | None = None) -> dict:
+    """Envoie une requête JSON et retourne la réponse décodée."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(req, timeout=120) as response:
+        return json.loads(response.read() or b"null")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    """Lance l'application sur une base temporaire et attend qu'elle réponde."""
+    database = Path(tempfile.mkdtemp()) / "benchmark.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "PYTHONPATH": str(ROOT / "src")}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ldvh_companion.api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            request(f"http://127.0.0.1:{port}", "GET", "/api/series")
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("Le serveur n'a pas démarré")
+
+
+def create_sheets(base_url: str, count: int) -> list[int]:
+    """Crée les feuilles d'aventure utilisées par le benchmark."""
+    books = request(base_url, "GET", "/api/books")
+    return [request(base_url, "POST", "/api/adventure-sheets", {"book_id": books[0]["id"]})["id"] for _ in range(count)]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Percentile par la méthode du rang le plus proche."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(base_url: str, clients: int, duration: float, heavy_clients: int, sheet_ids: list[int]) -> dict:
+    """Exécute la charge et retourne les latences (en ms) par type de requête."""
+    latencies: dict[str, list[float]] = {"read": [], "write": [], "heavy": []}
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(kind: str) -> None:
+        nonlocal errors
+        rng = random.Random()
+        while time.monotonic() < stop_at:
+            sheet_id = rng.choice(sheet_ids)
+            if kind == "heavy":
+                measured, method, path = "heavy", "POST", f"/api/combat/simulate?sheet_id={sheet_id}"
+                body = {"monster_name": "Orque", "monster_skill": 8, "monster_stamina": 10, "simulations": 200_000}
+            elif rng.random() < 0.8:
+                measured, method, path, body = "read", "GET", f"/api/adventure-sheets/{sheet_id}", None
+            else:
+                measured, method, path = "write", "PATCH", f"/api/adventure-sheets/{sheet_id}"
+                body = {"ops": [{"op": "inc", "field": "current_stamina", "value": rng.choice((-1, 1))}]}
+
+            started = time.perf_counter()
+            try:
+                request(base_url, method, path, body)
+            except OSError:
+                with lock:
+                    errors += 1
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[measured].append(elapsed)
+
+    kinds = ["heavy"] * heavy_clients + ["light"] * clients
+    with ThreadPoolExecutor(max_workers=len(kinds)) as executor:
+        for kind in kinds:
+            executor.submit(client, kind)
+
+    return {"latencies": latencies, "errors": errors}
+
+
+def main() -> None:
+    """Point d'entrée du benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Serveur existant à mesurer (défaut: lance un serveur temporaire)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32, help="Clients envoyant lectures et écritures")
+    parser.add_argument("--heavy-clients", type=int, default=2, help="Clients envoyant des simulations")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de la mesure en secondes")
+    parser.add_argument("--sheets", type=int, default=20, help="Nombre de feuilles d'aventure créées")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = start_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        sheet_ids = create_sheets(base_url, args.sheets)
+        result = run(base_url, args.clients, args.duration, args.heavy_clients, sheet_ids)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{'type':<8}{'requêtes':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, values in result["latencies"].items():
+        if not values:
+            continue
+        print(
+            f"{kind:<8}{len(values):>10}{len(values) / args.duration:>10.1f}"
+            f"{statistics.median(values):>10.1f}{percentile(values, 0.95):>10.1f}"
+            f"{percentile(values, 0.99):>10.1f}{max(values):>10.1f}"
+        )
+    print(f"erreurs : {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
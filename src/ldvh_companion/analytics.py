@@ -0,0 +1,477 @@
+"""Statistiques par livre et par monstre, tenues à jour de façon incrémentale.
+
+Les tables `book_stats`, `death_stats` et `monster_stats` sont des compteurs :
+les routes qui terminent une feuille ou un combat les incrémentent dans la même
+transaction, et les routes d'analyse les lisent sans parcourir les feuilles ni
+les combats. Une mort est comptée au dernier paragraphe visité par la feuille
+(voir graph.py), et suit les visites notées après elle. Les combats sont
+regroupés par nom de monstre normalisé, comme dans le bestiaire.
+
+Les compteurs décrivent les feuilles et les combats présents, courants et
+archivés : archiver une feuille ne les modifie pas, la supprimer (seule ou avec
+son livre ou sa série) en retire sa contribution dans la même transaction. Une
+reconstruction complète, qui les recalcule à partir de ces mêmes feuilles et
+combats, donne donc les mêmes valeurs ; elle est faite au premier démarrage,
+après un import, et à la demande :
+    uv run python -m ldvh_companion.analytics
+"""
+
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import datetime
+
+from sqlalchemy import Integer, Table, case, delete, false, func, insert, select, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .archive import iter_archived_rows
+from .graph import last_visited_paragraph
+from .models import (
+    AdventureSheet,
+    ArchivedSheet,
+    BookAnalytics,
+    BookStats,
+    Combat,
+    CombatRound,
+    DeathLocation,
+    DeathStats,
+    MonsterAnalytics,
+    MonsterStats,
+    ParagraphVisit,
+)
+from .utils import normalize_monster_name
+
+# Compteurs de book_stats
+BOOK_COUNTERS = ("attempt_count", "finished_count", "death_count", "completed_count", "completed_attempt_sum")
+
+
+def _increment(db: Session, table: Table, key: dict, increments: dict[str, int], values: dict | None = None) -> None:
+    """Ajoute des incréments aux compteurs d'une ligne, créée si besoin (une seule requête).
+
+    Les colonnes de `values` ne sont posées qu'à la création de la ligne.
+    """
+    increments = {column: value for column, value in increments.items() if value}
+    if not increments:
+        return
+
+    now = datetime.utcnow()
+    statement = sqlite_insert(table).values(**key, **(values or {}), **increments, updated_at=now)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={**{column: table.c[column] + statement.excluded[column] for column in increments}, "updated_at": now},
+        )
+    )
+
+
+def _sheet_counters(is_active: bool, current_stamina: int | None, attempt_number: int) -> dict[str, int]:
+    """Contribution d'une feuille aux compteurs de fin de partie de son livre."""
+    if is_active:
+        return {}
+    if not current_stamina:
+        return {"finished_count": 1, "death_count": 1}
+    return {"finished_count": 1, "completed_count": 1, "completed_attempt_sum": attempt_number}
+
+
+def record_sheet_created(db: Session, book_id: int) -> None:
+    """Compte une nouvelle tentative dans un livre (sans valider la transaction)."""
+    _increment(db, BookStats.__table__, {"book_id": book_id}, {"attempt_count": 1})
+
+
+def record_sheet_change(
+    db: Session,
+    sheet_id: int,
+    book_id: int,
+    attempt_number: int,
+    before: tuple[bool, int | None],
+    after: tuple[bool, int | None],
+) -> None:
+    """Met à jour les compteurs d'un livre quand une feuille est terminée, reprise ou modifiée une fois terminée.
+
+    Args:
+        db: Session de base de données (la transaction n'est pas validée)
+        sheet_id: ID de la feuille
+        book_id: ID du livre de la feuille
+        attempt_number: Numéro de tentative de la feuille
+        before: (is_active, current_stamina) avant la modification
+        after: (is_active, current_stamina) après la modification
+    """
+    old = _sheet_counters(*before, attempt_number)
+    new = _sheet_counters(*after, attempt_number)
+    _increment(
+        db,
+        BookStats.__table__,
+        {"book_id": book_id},
+        {column: new.get(column, 0) - old.get(column, 0) for column in BOOK_COUNTERS},
+    )
+
+    deaths = new.get("death_count", 0) - old.get("death_count", 0)
+    if deaths:
+        paragraph = last_visited_paragraph(db, sheet_id)
+        if paragraph is not None:
+            _increment(db, DeathStats.__table__, {"book_id": book_id, "paragraph": paragraph}, {"death_count": deaths})
+
+
+def record_visit_after_death(db: Session, sheet_id: int, previous_paragraph: int | None, paragraph: int) -> None:
+    """Déplace la mort d'une feuille au paragraphe qu'elle vient de visiter (sans valider la transaction).
+
+    Sans effet si la feuille n'est pas terminée par une mort : la mort reste
+    comptée au dernier paragraphe visité, comme dans `rebuild_analytics`.
+
+    Args:
+        db: Session de base de données (transaction d'écriture déjà ouverte, voir `begin_write`)
+        sheet_id: ID de la feuille
+        previous_paragraph: Dernier paragraphe visité avant cette visite, ou None
+        paragraph: Paragraphe visité
+    """
+    sheet = db.execute(
+        select(
+            AdventureSheet.book_id,
+            AdventureSheet.is_active,
+            AdventureSheet.current_stamina,
+            AdventureSheet.attempt_number,
+        ).where(AdventureSheet.id == sheet_id)
+    ).one()
+    if not _sheet_counters(sheet.is_active, sheet.current_stamina, sheet.attempt_number).get("death_count"):
+        return
+
+    if previous_paragraph is not None:
+        _increment(
+            db, DeathStats.__table__, {"book_id": sheet.book_id, "paragraph": previous_paragraph}, {"death_count": -1}
+        )
+    _increment(db, DeathStats.__table__, {"book_id": sheet.book_id, "paragraph": paragraph}, {"death_count": 1})
+
+
+def _combat_counters(winner: str, rounds_fought: int | None, damage_to_player: int | None) -> dict[str, int]:
+    """Contribution d'un combat terminé aux compteurs de son monstre."""
+    return {
+        "combat_count": 1,
+        "player_win_count": int(winner == "player"),
+        "monster_win_count": int(winner == "monster"),
+        "draw_count": int(winner == "draw"),
+        "rounds_total": rounds_fought or 0,
+        "damage_to_player_total": damage_to_player or 0,
+    }
+
+
+def record_combat_end(db: Session, combat: Combat) -> None:
+    """Compte un combat terminé dans les statistiques de son monstre (sans valider la transaction)."""
+    damage = db.scalar(select(func.sum(CombatRound.damage_to_player)).where(CombatRound.combat_id == combat.id))
+    _increment(
+        db,
+        MonsterStats.__table__,
+        {"name_key": normalize_monster_name(combat.monster_name)},
+        _combat_counters(combat.winner, combat.rounds_fought, damage),
+        {"monster_name": combat.monster_name},
+    )
+
+
+Counters = defaultdict[str, int]
+
+
+def _collect_counters(
+    db: Session, sheet_filter: object, archive_filter: object
+) -> tuple[dict[int, Counters], dict[tuple[int, int], int], dict[str, Counters], dict[str, str]]:
+    """Calcule la contribution de feuilles courantes et archivées (avec leurs combats) aux compteurs.
+
+    Args:
+        db: Session de base de données
+        sheet_filter: Condition sur AdventureSheet sélectionnant les feuilles courantes
+        archive_filter: Condition sur ArchivedSheet sélectionnant les feuilles archivées
+
+    Returns:
+        (compteurs par livre, morts par (livre, paragraphe), compteurs par nom de monstre normalisé,
+        nom affiché de chaque monstre : celui de son premier combat)
+    """
+    books: defaultdict[int, Counters] = defaultdict(lambda: defaultdict(int))
+    deaths: defaultdict[tuple[int, int], int] = defaultdict(int)
+    monsters: defaultdict[str, Counters] = defaultdict(lambda: defaultdict(int))
+    monster_names: dict[str, str] = {}
+
+    def add(target: Counters, counters: dict[str, int]) -> None:
+        for column, value in counters.items():
+            target[column] += value
+
+    def add_combat(name: str, counters: dict[str, int]) -> None:
+        key = normalize_monster_name(name)
+        monster_names.setdefault(key, name)
+        add(monsters[key], counters)
+
+    # Feuilles et combats courants : agrégés en SQL
+    finished = AdventureSheet.is_active.is_(False)
+    alive = finished & (func.coalesce(AdventureSheet.current_stamina, 0) > 0)
+    sheet_rows = db.execute(
+        select(
+            AdventureSheet.book_id,
+            func.count().label("attempt_count"),
+            func.sum(finished.cast(Integer)).label("finished_count"),
+            func.sum((finished & ~alive).cast(Integer)).label("death_count"),
+            func.sum(alive.cast(Integer)).label("completed_count"),
+            func.sum(case((alive, AdventureSheet.attempt_number), else_=0)).label("completed_attempt_sum"),
+        )
+        .where(sheet_filter)
+        .group_by(AdventureSheet.book_id)
+    ).mappings()
+    for row in sheet_rows:
+        add(books[row["book_id"]], {column: row[column] or 0 for column in BOOK_COUNTERS})
+
+    last_position = (
+        select(ParagraphVisit.sheet_id, func.max(ParagraphVisit.position).label("position"))
+        .group_by(ParagraphVisit.sheet_id)
+        .subquery()
+    )
+    death_rows = db.execute(
+        select(AdventureSheet.book_id, ParagraphVisit.paragraph, func.count())
+        .join(last_position, last_position.c.sheet_id == AdventureSheet.id)
+        .join(
+            ParagraphVisit,
+            (ParagraphVisit.sheet_id == last_position.c.sheet_id)
+            & (ParagraphVisit.position == last_position.c.position),
+        )
+        .where(sheet_filter, finished & ~alive)
+        .group_by(AdventureSheet.book_id, ParagraphVisit.paragraph)
+    )
+    for book_id, paragraph, count in death_rows:
+        deaths[book_id, paragraph] += count
+
+    damage = (
+        select(CombatRound.combat_id, func.sum(CombatRound.damage_to_player).label("damage"))
+        .group_by(CombatRound.combat_id)
+        .subquery()
+    )
+    combat_rows = db.execute(
+        select(Combat.monster_name, Combat.winner, Combat.rounds_fought, damage.c.damage)
+        .join(AdventureSheet, AdventureSheet.id == Combat.sheet_id)
+        .outerjoin(damage, damage.c.combat_id == Combat.id)
+        .where(sheet_filter, Combat.winner.isnot(None))
+        .order_by(Combat.id)
+    )
+    for monster_name, winner, rounds_fought, damage_to_player in combat_rows:
+        add_combat(monster_name, _combat_counters(winner, rounds_fought, damage_to_player))
+
+    # Feuilles archivées : lues dans leurs archives
+    connection = db.connection()
+
+    def archived(name: str) -> Iterator[dict]:
+        return iter_archived_rows(connection, name, archive_filter=archive_filter)
+
+    last_visits: dict[int, tuple[int, int]] = {}
+    for visit in archived("paragraph_visits"):
+        if visit["position"] > last_visits.get(visit["sheet_id"], (0, 0))[0]:
+            last_visits[visit["sheet_id"]] = (visit["position"], visit["paragraph"])
+    for sheet in archived("adventure_sheets"):
+        counters = _sheet_counters(sheet["is_active"], sheet["current_stamina"], sheet["attempt_number"])
+        add(books[sheet["book_id"]], {"attempt_count": 1})
+        add(books[sheet["book_id"]], counters)
+        if counters.get("death_count") and sheet["id"] in last_visits:
+            deaths[sheet["book_id"], last_visits[sheet["id"]][1]] += 1
+    archived_damage: defaultdict[int, int] = defaultdict(int)
+    for combat_round in archived("combat_rounds"):
+        archived_damage[combat_round["combat_id"]] += combat_round["damage_to_player"] or 0
+    for combat in archived("combats"):
+        if combat["winner"] is not None:
+            add_combat(
+                combat["monster_name"],
+                _combat_counters(combat["winner"], combat["rounds_fought"], archived_damage[combat["id"]]),
+            )
+
+    return books, deaths, monsters, monster_names
+
+
+def _negated(counters: dict[str, int]) -> dict[str, int]:
+    """Incréments qui annulent une contribution aux compteurs."""
+    return {column: -value for column, value in counters.items()}
+
+
+def _add_sheets(db: Session, sheet_filter: object, archive_filter: object, sign: int) -> None:
+    """Ajoute (sign=1) ou retire (sign=-1) des compteurs la contribution de feuilles et de leurs combats."""
+    books, deaths, monsters, monster_names = _collect_counters(db, sheet_filter, archive_filter)
+    for book_id, counters in books.items():
+        _increment(db, BookStats.__table__, {"book_id": book_id}, counters if sign > 0 else _negated(counters))
+    for (book_id, paragraph), count in deaths.items():
+        _increment(
+            db, DeathStats.__table__, {"book_id": book_id, "paragraph": paragraph}, {"death_count": sign * count}
+        )
+    for key, counters in monsters.items():
+        _increment(
+            db,
+            MonsterStats.__table__,
+            {"name_key": key},
+            counters if sign > 0 else _negated(counters),
+            {"monster_name": monster_names[key]},
+        )
+
+
+def forget_sheets(db: Session, sheet_filter: object, archive_filter: object = false()) -> None:
+    """Retire des compteurs la contribution de feuilles sur le point d'être supprimées (sans valider la transaction).
+
+    À appeler dans la transaction de la suppression, avant elle, pour que les
+    compteurs restent ceux qu'une reconstruction complète calculerait.
+
+    Args:
+        db: Session de base de données (transaction d'écriture déjà ouverte, voir `begin_write`)
+        sheet_filter: Condition sur AdventureSheet sélectionnant les feuilles courantes supprimées
+        archive_filter: Condition sur ArchivedSheet sélectionnant les feuilles archivées supprimées
+    """
+    _add_sheets(db, sheet_filter, archive_filter, -1)
+
+
+def count_sheets(db: Session, sheet_filter: object, archive_filter: object = false()) -> None:
+    """Ajoute aux compteurs la contribution de feuilles (sans valider la transaction).
+
+    Avec `forget_sheets` avant une réécriture des feuilles et `count_sheets`
+    après, les compteurs suivent les feuilles réécrites.
+
+    Args:
+        db: Session de base de données (transaction d'écriture déjà ouverte, voir `begin_write`)
+        sheet_filter: Condition sur AdventureSheet sélectionnant les feuilles courantes
+        archive_filter: Condition sur ArchivedSheet sélectionnant les feuilles archivées
+    """
+    _add_sheets(db, sheet_filter, archive_filter, 1)
+
+
+def rebuild_analytics(db: Session) -> tuple[int, int]:
+    """Recalcule tous les compteurs à partir des feuilles et des combats, courants et archivés.
+
+    Args:
+        db: Session de base de données (validée en cas de succès, annulée sinon)
+
+    Returns:
+        (nombre de livres, nombre de monstres) ayant des statistiques
+    """
+    try:
+        books, deaths, monsters, monster_names = _collect_counters(db, true(), true())
+
+        now = datetime.utcnow()
+        db.execute(delete(BookStats))
+        db.execute(delete(DeathStats))
+        db.execute(delete(MonsterStats))
+        if books:
+            db.execute(
+                insert(BookStats),
+                [{"book_id": book_id, **counters, "updated_at": now} for book_id, counters in books.items()],
+            )
+        if deaths:
+            db.execute(
+                insert(DeathStats),
+                [
+                    {"book_id": book_id, "paragraph": paragraph, "death_count": count, "updated_at": now}
+                    for (book_id, paragraph), count in deaths.items()
+                ],
+            )
+        if monsters:
+            db.execute(
+                insert(MonsterStats),
+                [
+                    {"name_key": key, "monster_name": monster_names[key], **counters, "updated_at": now}
+                    for key, counters in monsters.items()
+                ],
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(books), len(monsters)
+
+
+def analytics_empty(db: Session) -> bool:
+    """Indique si les compteurs n'ont jamais été calculés alors que des feuilles existent."""
+    if db.scalar(select(BookStats.book_id).limit(1)) is not None:
+        return False
+    return db.scalar(select(AdventureSheet.id).union_all(select(ArchivedSheet.id)).limit(1)) is not None
+
+
+def book_analytics(db: Session, book_id: int) -> BookAnalytics:
+    """Retourne les statistiques d'un livre (lecture d'une seule ligne)."""
+    stats = db.get(BookStats, book_id)
+    counters = {column: getattr(stats, column) if stats is not None else 0 for column in BOOK_COUNTERS}
+    finished, completed = counters["finished_count"], counters["completed_count"]
+    return BookAnalytics(
+        book_id=book_id,
+        attempt_count=counters["attempt_count"],
+        finished_count=finished,
+        death_count=counters["death_count"],
+        completed_count=completed,
+        death_rate=counters["death_count"] / finished if finished else None,
+        average_attempts_to_complete=counters["completed_attempt_sum"] / completed if completed else None,
+    )
+
+
+def death_locations(db: Session, book_id: int, limit: int = 20) -> list[DeathLocation]:
+    """Retourne les paragraphes où les parties d'un livre se sont le plus souvent terminées par une mort.
+
+    Args:
+        db: Session de base de données
+        book_id: ID du livre
+        limit: Nombre maximal de paragraphes
+
+    Returns:
+        Paragraphes, du plus au moins meurtrier
+    """
+    located = DeathStats.book_id == book_id, DeathStats.death_count > 0
+    total = db.scalar(select(func.sum(DeathStats.death_count)).where(*located)) or 0
+    rows = db.scalars(
+        select(DeathStats).where(*located).order_by(DeathStats.death_count.desc(), DeathStats.paragraph).limit(limit)
+    )
+    return [
+        DeathLocation(paragraph=row.paragraph, death_count=row.death_count, share=row.death_count / total)
+        for row in rows
+    ]
+
+
+def monster_analytics(db: Session, sort: str = "kills", limit: int = 20) -> list[MonsterAnalytics]:
+    """Retourne les monstres les plus meurtriers.
+
+    Args:
+        db: Session de base de données
+        sort: "kills" (combats perdus par le joueur), "lethality" (part de combats perdus) ou "combats"
+        limit: Nombre maximal de monstres
+
+    Returns:
+        Statistiques des monstres, dans l'ordre demandé
+    """
+    order = {
+        "kills": (MonsterStats.monster_win_count.desc(),),
+        "lethality": ((MonsterStats.monster_win_count * 1.0 / MonsterStats.combat_count).desc(),),
+        "combats": (MonsterStats.combat_count.desc(),),
+    }[sort]
+    rows = db.scalars(
+        select(MonsterStats)
+        .where(MonsterStats.combat_count > 0)
+        .order_by(*order, MonsterStats.monster_name)
+        .limit(limit)
+    )
+    return [
+        MonsterAnalytics(
+            monster_name=row.monster_name,
+            combat_count=row.combat_count,
+            player_win_count=row.player_win_count,
+            monster_win_count=row.monster_win_count,
+            draw_count=row.draw_count,
+            lethality=row.monster_win_count / row.combat_count,
+            average_rounds=row.rounds_total / row.combat_count,
+            average_damage_to_player=row.damage_to_player_total / row.combat_count,
+        )
+        for row in rows
+    ]
+
+
+def main() -> None:
+    """Point d'entrée en ligne de commande : reconstruction complète des statistiques."""
+    from .database import SessionLocal, create_tables
+    from .migrations import run_migrations
+
+    create_tables()
+    run_migrations()
+
+    db = SessionLocal()
+    try:
+        book_count, monster_count = rebuild_analytics(db)
+    finally:
+        db.close()
+    print(f"Statistiques reconstruites : {book_count} livre(s), {monster_count} monstre(s)")
+
+
+if __name__ == "__main__":
+    main()
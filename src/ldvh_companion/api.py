@@ -1,37 +1,140 @@
 """API principale de l'application LDVH Companion."""
 
-from fastapi import Depends, FastAPI, HTTPException, status
+import tempfile
+from collections.abc import Collection
+from datetime import datetime
+from typing import Annotated, Literal
+
+import numpy as np
+from anyio import to_thread
+from fastapi import Depends, FastAPI, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.requests import Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-
-from .database import create_tables, get_db, init_db
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, false, func, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, joinedload
+
+from .analytics import (
+    book_analytics,
+    death_locations,
+    forget_sheets,
+    monster_analytics,
+    rebuild_analytics,
+    record_combat_end,
+    record_sheet_change,
+    record_sheet_created,
+    record_visit_after_death,
+)
+from .archive import (
+    archive_finished_sheets,
+    decode_archive,
+    load_archived_sheet,
+    resolve_codec,
+    restore_archived_sheet,
+    vacuum_database,
+)
+from .bestiary import MAX_SUGGESTIONS, rebuild_bestiary, record_monster, suggest_monsters
+from .catalog import catalog
+from .combat_store import combat_store, new_combat_id
+from .config import settings
+from .database import SessionLocal, begin_write, create_tables, engine, get_db, get_read_db, init_db, read_engine
+from .dice import DiceStream, default_stream, sheet_stream
+from .dice_expressions import compile_expression, evaluate, iter_bulk_samples
+from .dice_expressions import distribution as dice_distribution
+from .events import (
+    created_event,
+    patch_events,
+    rebuild_sheet,
+    record_sheet_events,
+    replay_sheet_events,
+    sheet_state_at,
+)
+from .graph import (
+    GRAPH_TABLES,
+    START_PARAGRAPH,
+    BookGraph,
+    book_graphs,
+    last_visited_paragraph,
+    load_book_graph,
+    record_visit,
+    replace_book_graph,
+    sheet_visits,
+)
+from .http_cache import CATALOG_CACHE_CONTROL, SHEET_CACHE_CONTROL, NotModifiedError, conditional_get
+from .migrations import run_migrations
 from .models import (
     AdventureSheet,
     AdventureSheetCreate,
+    AdventureSheetDetailResponse,
+    AdventureSheetPatchOps,
     AdventureSheetResponse,
     AdventureSheetUpdate,
+    ArchivedSheet,
+    ArchiveResult,
     Book,
+    BookAnalytics,
     BookCreate,
+    BookGraphResponse,
+    BookGraphUpdate,
     BookResponse,
-    CombatAction,
+    CatalogCacheStats,
+    Combat,
+    CombatOdds,
+    CombatRecordResponse,
+    CombatReplayRequest,
+    CombatRound,
+    CombatRoundRequest,
+    CombatRoundResult,
+    CombatSimulationRequest,
+    CombatSimulationResult,
     CombatStart,
     CombatState,
+    DashboardStats,
+    DeathLocation,
+    DiceBulkRequest,
     DiceRoll,
+    Encounter,
+    EncounterCreate,
+    EncounterResponse,
+    ImportResult,
+    MonsterAnalytics,
+    MonsterSuggestion,
+    ParagraphRoute,
+    ParagraphVisitCreate,
+    ParagraphVisitResponse,
+    ReachableParagraph,
+    SearchHit,
     Series,
     SeriesCreate,
     SeriesResponse,
+    SheetEvent,
+    SheetEventResponse,
+    SheetStateResponse,
 )
+from .pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, fetch_page, parse_fields
+from .search import SEARCH_SOURCES, search
+from .simulation import simulate_combats
+from .solver import combat_odds
+from .stats import STATS_TABLES, get_dashboard_stats
+from .transfer import ImportMode, export_lines, import_lines
 from .utils import (
+    INITIAL_STATS_EXPRESSIONS,
     calculate_initial_stats,
-    execute_combat_round,
-    get_next_attempt_number,
-    parse_monster_encounters,
+    combat_round_from_record,
+    combat_round_to_record,
+    execute_combat_rounds,
+    insert_adventure_sheet,
+    normalize_monster_name,
+    replay_combat,
     roll_1d6,
-    roll_2d6,
+    roll_dice_list,
+    sheet_patch_values,
     start_combat,
+    table_row_from_json,
     validate_character_stats,
 )
 
@@ -42,11 +145,185 @@ app = FastAPI(
     version="0.1.0",
 )
 
+# Nombre maximal de rounds résolus par une seule requête de combat
+MAX_COMBAT_ROUNDS_PER_REQUEST = 500
+
+# Objets liés qu'une feuille d'aventure peut inclure (paramètre include=)
+SHEET_INCLUDES = ("book", "series", "encounters")
+
+# Nombre d'essais pour attribuer un numéro de tentative en cas de créations concurrentes
+MAX_INSERT_ATTEMPTS = 5
+
+# Taille au-delà de laquelle un fichier importé est mis en attente sur disque plutôt qu'en mémoire
+IMPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Nombre maximal de résultats par page de recherche
+MAX_SEARCH_RESULTS = 100
+
 # Configuration des templates et fichiers statiques
 templates = Jinja2Templates(directory="src/ldvh_companion/templates")
 app.mount("/static", StaticFiles(directory="src/ldvh_companion/static"), name="static")
 
 
+# Cache HTTP des routes GET (voir http_cache.py) : dépendances par groupe de tables
+series_cache = Depends(conditional_get(("series",), CATALOG_CACHE_CONTROL))
+books_cache = Depends(conditional_get(("books",), CATALOG_CACHE_CONTROL))
+sheets_cache = Depends(conditional_get(("adventure_sheets", "books", "archived_sheets"), SHEET_CACHE_CONTROL))
+sheet_cache = Depends(
+    conditional_get(("adventure_sheets", "books", "series", "encounters", "archived_sheets"), SHEET_CACHE_CONTROL)
+)
+encounters_cache = Depends(conditional_get(("encounters", "archived_sheets"), SHEET_CACHE_CONTROL))
+events_cache = Depends(conditional_get(("sheet_events", "archived_sheets"), SHEET_CACHE_CONTROL))
+stats_cache = Depends(conditional_get(STATS_TABLES, SHEET_CACHE_CONTROL))
+analytics_cache = Depends(conditional_get(("book_stats", "death_stats", "monster_stats"), SHEET_CACHE_CONTROL))
+monsters_cache = Depends(conditional_get(("monsters",), SHEET_CACHE_CONTROL))
+graph_cache = Depends(conditional_get(GRAPH_TABLES, CATALOG_CACHE_CONTROL))
+visits_cache = Depends(conditional_get(("paragraph_visits", "archived_sheets"), SHEET_CACHE_CONTROL))
+journey_cache = Depends(conditional_get((*GRAPH_TABLES, "paragraph_visits", "archived_sheets"), SHEET_CACHE_CONTROL))
+
+
+@app.exception_handler(NotModifiedError)
+async def not_modified_handler(request: Request, exc: NotModifiedError) -> Response:
+    """Répond 304 quand le client a déjà la version courante de la ressource."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=exc.headers)
+
+
+# Les routes qui font des entrées/sorties bloquantes (SQLAlchemy synchrone) ou des
+# calculs lourds sont déclarées avec `def` : FastAPI les exécute dans un pool de
+# threads borné (voir `startup_event`) au lieu de bloquer la boucle d'événements.
+
+
+def commit_or_conflict(db: Session, detail: str) -> None:
+    """Valide la transaction, en traduisant une violation de contrainte d'unicité en erreur 409."""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=detail) from e
+
+
+def delete_cascade(
+    db: Session, model: type, row_id: int, sheet_filter: object, archive_filter: object = false()
+) -> bool:
+    """Supprime une ligne par une seule requête ; la base supprime en cascade ses dépendances.
+
+    La contribution des feuilles supprimées aux statistiques en est retirée dans
+    la même transaction. Les sessions de combat en cours de ces feuilles (sans
+    clé étrangère, éventuellement en mémoire) sont abandonnées après le commit.
+
+    Args:
+        db: Session de base de données
+        model: Modèle de la ligne à supprimer
+        row_id: ID de la ligne
+        sheet_filter: Condition sur AdventureSheet sélectionnant les feuilles supprimées
+        archive_filter: Condition sur ArchivedSheet sélectionnant les feuilles archivées supprimées
+
+    Returns:
+        True si la ligne existait
+    """
+    begin_write(db)
+    session_ids = db.scalars(
+        select(Combat.session_id)
+        .join(AdventureSheet, AdventureSheet.id == Combat.sheet_id)
+        .where(sheet_filter, Combat.session_id.isnot(None), Combat.is_active.is_(True))
+    ).all()
+
+    forget_sheets(db, sheet_filter, archive_filter)
+    deleted = db.execute(delete(model).where(model.id == row_id)).rowcount
+    db.commit()
+    for session_id in session_ids:
+        combat_store.delete(session_id)
+    return bool(deleted)
+
+
+def load_adventure_sheet(db: Session, sheet_id: int, includes: Collection[str] = ()) -> AdventureSheet | None:
+    """Charge une feuille d'aventure et les objets liés demandés par une seule requête (jointures).
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+        includes: Objets liés à charger parmi SHEET_INCLUDES
+
+    Returns:
+        Feuille d'aventure, ou None si elle n'existe pas
+    """
+    options = []
+    if "series" in includes:
+        options.append(joinedload(AdventureSheet.book).joinedload(Book.series))
+    elif "book" in includes:
+        options.append(joinedload(AdventureSheet.book))
+    if "encounters" in includes:
+        options.append(joinedload(AdventureSheet.encounters))
+
+    return db.query(AdventureSheet).options(*options).filter(AdventureSheet.id == sheet_id).first()
+
+
+def list_page(
+    db: Session,
+    model: type,
+    response_model: type[BaseModel],
+    key_columns: list,
+    filters: list,
+    limit: int | None,
+    cursor: str | None,
+    fields: str | None,
+    headers: dict[str, str] | None = None,
+) -> JSONResponse:
+    """Construit la réponse d'une route de liste paginée par clé.
+
+    `limit` limite la taille de la page (toutes les lignes si absent) ; l'en-tête
+    `X-Next-Cursor` donne alors le curseur à passer en `cursor` pour la page suivante.
+    `fields=a,b,c` ne lit et ne renvoie que les colonnes demandées. `headers` est
+    ajouté à la réponse (en-têtes de cache).
+    """
+    try:
+        selected = parse_fields(fields, response_model.model_fields)
+        if selected is None:
+            query = db.query(model)
+        else:
+            # Lire aussi les colonnes de la clé, nécessaires au curseur
+            columns = [getattr(model, field) for field in selected]
+            columns += [column for column in key_columns if column.key not in selected]
+            query = db.query(*columns)
+        rows, next_cursor = fetch_page(query.filter(*filters), key_columns, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    if selected is None:
+        content = [response_model.model_validate(row).model_dump(mode="json") for row in rows]
+    else:
+        content = jsonable_encoder([{field: getattr(row, field) for field in selected} for row in rows])
+
+    headers = dict(headers or {})
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return JSONResponse(content=content, headers=headers)
+
+
+def archived_sheets_page(
+    db: Session, filters: list, limit: int | None, cursor: str | None, fields: str | None, headers: dict[str, str]
+) -> JSONResponse:
+    """Comme `list_page`, pour les feuilles archivées : chaque feuille de la page est décompressée."""
+    try:
+        selected = parse_fields(fields, AdventureSheetResponse.model_fields)
+        key_columns = [ArchivedSheet.book_id, ArchivedSheet.attempt_number]
+        rows, next_cursor = fetch_page(db.query(ArchivedSheet).filter(*filters), key_columns, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    content = [
+        AdventureSheetResponse.model_validate(decode_archive(row)["adventure_sheets"][0]).model_dump(mode="json")
+        for row in rows
+    ]
+    if selected is not None:
+        content = [{field: sheet[field] for field in selected} for sheet in content]
+
+    headers = dict(headers)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return JSONResponse(content=content, headers=headers)
+
+
 # Routes pour l'interface web
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request) -> HTMLResponse:
@@ -73,27 +350,41 @@ async def adventure_sheets_page(request: Request) -> HTMLResponse:
 
 
 @app.get("/adventure-sheets/{sheet_id}/game", response_class=HTMLResponse)
-async def adventure_sheet_game_page(request: Request, sheet_id: int, db: Session = Depends(get_db)) -> HTMLResponse:
+def adventure_sheet_game_page(request: Request, sheet_id: int, db: Session = Depends(get_read_db)) -> HTMLResponse:
     """Page de jeu d'une feuille d'aventure."""
-    sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
+    # Feuille et rencontres en une seule requête, livre et série depuis le catalogue
+    sheet = load_adventure_sheet(db, sheet_id, ("encounters",))
     if not sheet:
+        if db.get(ArchivedSheet, sheet_id) is not None:
+            raise HTTPException(
+                status_code=404, detail="Feuille d'aventure archivée : restaurez-la pour reprendre la partie"
+            )
         raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
 
-    book = db.query(Book).filter(Book.id == sheet.book_id).first()
+    book = catalog.get_book(db, sheet.book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
 
-    series = db.query(Series).filter(Series.id == book.series_id).first()
+    series = catalog.get_series(db, book.series_id)
     if not series:
         raise HTTPException(status_code=404, detail="Série non trouvée")
 
-    # Parser les rencontres de monstres
-    monster_encounters = []
-    if sheet.monster_encounters:
-        try:
-            monster_encounters = parse_monster_encounters(sheet.monster_encounters or "")
-        except:
-            monster_encounters = []
+    # Rencontres de monstres
+    monster_encounters = [EncounterResponse.model_validate(encounter).model_dump() for encounter in sheet.encounters]
+
+    # Historique des combats terminés et combats encore en cours côté serveur
+    combat_history = []
+    active_combats = {}
+    for combat in db.query(Combat).filter(Combat.sheet_id == sheet.id).order_by(Combat.id):
+        if combat.winner is not None:
+            combat_history.append(CombatRecordResponse.model_validate(combat).model_dump(mode="json"))
+        elif combat.is_active and combat.session_id:
+            stored = combat_store.get(combat.session_id)
+            if stored is not None:
+                active_combats[combat.monster_name] = {
+                    "state": stored[1].model_dump(),
+                    "rounds": [combat_round_from_record(record, combat).model_dump() for record in combat.rounds],
+                }
 
     context = {
         "request": request,
@@ -113,8 +404,8 @@ async def adventure_sheet_game_page(request: Request, sheet_id: int, db: Session
         "provisions": sheet.provisions,
         "equipment": sheet.equipment,
         "monster_encounters": monster_encounters,
-        "active_combats": sheet.active_combats if sheet.active_combats else "{}",
-        "combat_history": sheet.combat_history if sheet.combat_history else "[]",
+        "active_combats": active_combats,
+        "combat_history": combat_history,
         "is_active": sheet.is_active,
         "notes": sheet.notes,
         "series_name": series.name,
@@ -129,32 +420,51 @@ async def adventure_sheet_game_page(request: Request, sheet_id: int, db: Session
 
 # Séries
 @app.post("/api/series", response_model=SeriesResponse, status_code=status.HTTP_201_CREATED)
-async def create_series(series: SeriesCreate, db: Session = Depends(get_db)) -> SeriesResponse:
+def create_series(series: SeriesCreate, db: Session = Depends(get_db)) -> SeriesResponse:
     """Crée une nouvelle série."""
     db_series = Series(**series.dict())
     db.add(db_series)
     db.commit()
+    catalog.invalidate()
     db.refresh(db_series)
     return db_series
 
 
 @app.get("/api/series", response_model=list[SeriesResponse])
-async def get_series(db: Session = Depends(get_db)) -> list[SeriesResponse]:
-    """Récupère toutes les séries."""
-    return db.query(Series).all()
+def get_series(
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_read_db),
+    cache_headers: dict[str, str] = series_cache,
+) -> JSONResponse:
+    """Récupère les séries, ordonnées par id (voir `list_page` pour la pagination)."""
+    return list_page(db, Series, SeriesResponse, [Series.id], [], limit, cursor, fields, cache_headers)
+
+
+@app.get("/api/stats", response_model=DashboardStats, dependencies=[stats_cache])
+def get_stats(db: Session = Depends(get_read_db)) -> DashboardStats:
+    """Statistiques du tableau de bord : totaux, par série et par statut des feuilles."""
+    return get_dashboard_stats(db)
 
 
-@app.get("/api/series/{series_id}", response_model=SeriesResponse)
-async def get_series_by_id(series_id: int, db: Session = Depends(get_db)) -> SeriesResponse:
+@app.get("/api/catalog/cache", response_model=CatalogCacheStats)
+def get_catalog_cache_stats() -> CatalogCacheStats:
+    """Compteurs du cache du catalogue de ce worker (succès, rechargements, invalidations)."""
+    return catalog.stats()
+
+
+@app.get("/api/series/{series_id}", response_model=SeriesResponse, dependencies=[series_cache])
+def get_series_by_id(series_id: int, db: Session = Depends(get_read_db)) -> SeriesResponse:
     """Récupère une série par son ID."""
-    series = db.query(Series).filter(Series.id == series_id).first()
+    series = catalog.get_series(db, series_id)
     if not series:
         raise HTTPException(status_code=404, detail="Série non trouvée")
     return series
 
 
 @app.put("/api/series/{series_id}", response_model=SeriesResponse)
-async def update_series(series_id: int, series_update: SeriesCreate, db: Session = Depends(get_db)) -> SeriesResponse:
+def update_series(series_id: int, series_update: SeriesCreate, db: Session = Depends(get_db)) -> SeriesResponse:
     """Met à jour une série."""
     db_series = db.query(Series).filter(Series.id == series_id).first()
     if not db_series:
@@ -165,85 +475,80 @@ async def update_series(series_id: int, series_update: SeriesCreate, db: Session
     db_series.description = series_update.description
 
     db.commit()
+    catalog.invalidate()
     db.refresh(db_series)
     return db_series
 
 
 @app.delete("/api/series/{series_id}")
-async def delete_series(series_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
-    """Supprime une série."""
-    db_series = db.query(Series).filter(Series.id == series_id).first()
-    if not db_series:
+def delete_series(series_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
+    """Supprime une série, ses livres et leurs feuilles d'aventure (en cascade dans la base)."""
+    series_books = select(Book.id).where(Book.series_id == series_id)
+    if not delete_cascade(
+        db, Series, series_id, AdventureSheet.book_id.in_(series_books), ArchivedSheet.book_id.in_(series_books)
+    ):
         raise HTTPException(status_code=404, detail="Série non trouvée")
 
-    db.delete(db_series)
-    db.commit()
+    catalog.invalidate()
     return {"message": "Série supprimée avec succès"}
 
 
 # Livres
 @app.post("/api/books", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-async def create_book(book: BookCreate, db: Session = Depends(get_db)) -> BookResponse:
+def create_book(book: BookCreate, db: Session = Depends(get_db)) -> BookResponse:
     """Crée un nouveau livre."""
     # Vérifier que la série existe
-    series = db.query(Series).filter(Series.id == book.series_id).first()
-    if not series:
+    if not catalog.get_series(db, book.series_id):
         raise HTTPException(status_code=404, detail="Série non trouvée")
+    if catalog.get_book_by_number(db, book.series_id, book.book_number):
+        raise HTTPException(status_code=409, detail="Ce numéro de tome existe déjà pour cette série")
 
-    # Vérifier que le numéro de tome n'existe pas déjà pour cette série
-    existing_book = (
-        db.query(Book).filter(Book.series_id == book.series_id, Book.book_number == book.book_number).first()
-    )
-    if existing_book:
-        raise HTTPException(status_code=400, detail="Ce numéro de tome existe déjà pour cette série")
-
+    # L'index unique (series_id, book_number) rejette les doublons créés entre-temps
     db_book = Book(**book.dict())
     db.add(db_book)
-    db.commit()
+    commit_or_conflict(db, "Ce numéro de tome existe déjà pour cette série")
+    catalog.invalidate()
     db.refresh(db_book)
     return db_book
 
 
 @app.get("/api/books", response_model=list[BookResponse])
-async def get_books(series_id: int | None = None, db: Session = Depends(get_db)) -> list[BookResponse]:
-    """Récupère tous les livres, optionnellement filtrés par série."""
-    query = db.query(Book)
-    if series_id:
-        query = query.filter(Book.series_id == series_id)
-    return query.all()
-
-
-@app.get("/api/books/{book_id}", response_model=BookResponse)
-async def get_book_by_id(book_id: int, db: Session = Depends(get_db)) -> BookResponse:
+def get_books(
+    series_id: int | None = None,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_read_db),
+    cache_headers: dict[str, str] = books_cache,
+) -> JSONResponse:
+    """Récupère les livres, optionnellement filtrés par série, ordonnés par (series_id, book_number)."""
+    filters = [Book.series_id == series_id] if series_id else []
+    key_columns = [Book.series_id, Book.book_number]
+    return list_page(db, Book, BookResponse, key_columns, filters, limit, cursor, fields, cache_headers)
+
+
+@app.get("/api/books/{book_id}", response_model=BookResponse, dependencies=[books_cache])
+def get_book_by_id(book_id: int, db: Session = Depends(get_read_db)) -> BookResponse:
     """Récupère un livre par son ID."""
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book = catalog.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
     return book
 
 
 @app.put("/api/books/{book_id}", response_model=BookResponse)
-async def update_book(book_id: int, book_update: BookCreate, db: Session = Depends(get_db)) -> BookResponse:
+def update_book(book_id: int, book_update: BookCreate, db: Session = Depends(get_db)) -> BookResponse:
     """Met à jour un livre."""
     db_book = db.query(Book).filter(Book.id == book_id).first()
     if not db_book:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
 
-    # Vérifier que la série existe
-    series = db.query(Series).filter(Series.id == book_update.series_id).first()
-    if not series:
+    # Vérifier que la série existe et que le numéro de tome est libre
+    if not catalog.get_series(db, book_update.series_id):
         raise HTTPException(status_code=404, detail="Série non trouvée")
-
-    # Vérifier que le numéro de tome n'existe pas déjà pour cette série (sauf pour ce livre)
-    existing_book = (
-        db.query(Book)
-        .filter(
-            Book.series_id == book_update.series_id, Book.book_number == book_update.book_number, Book.id != book_id
-        )
-        .first()
-    )
-    if existing_book:
-        raise HTTPException(status_code=400, detail="Ce numéro de tome existe déjà pour cette série")
+    other = catalog.get_book_by_number(db, book_update.series_id, book_update.book_number)
+    if other and other.id != book_id:
+        raise HTTPException(status_code=409, detail="Ce numéro de tome existe déjà pour cette série")
 
     # Mettre à jour les champs fournis
     db_book.title = book_update.title
@@ -251,35 +556,27 @@ async def update_book(book_id: int, book_update: BookCreate, db: Session = Depen
     db_book.book_number = book_update.book_number
     db_book.description = book_update.description
 
-    db.commit()
+    # L'index unique (series_id, book_number) rejette les doublons créés entre-temps
+    commit_or_conflict(db, "Ce numéro de tome existe déjà pour cette série")
+    catalog.invalidate()
     db.refresh(db_book)
     return db_book
 
 
 @app.delete("/api/books/{book_id}")
-async def delete_book(book_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
-    """Supprime un livre."""
-    db_book = db.query(Book).filter(Book.id == book_id).first()
-    if not db_book:
+def delete_book(book_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
+    """Supprime un livre et ses feuilles d'aventure (en cascade dans la base)."""
+    if not delete_cascade(db, Book, book_id, AdventureSheet.book_id == book_id, ArchivedSheet.book_id == book_id):
         raise HTTPException(status_code=404, detail="Livre non trouvé")
 
-    db.delete(db_book)
-    db.commit()
+    catalog.invalidate()
     return {"message": "Livre supprimé avec succès"}
 
 
 # Feuilles d'aventures
 @app.post("/api/adventure-sheets", response_model=AdventureSheetResponse, status_code=status.HTTP_201_CREATED)
-async def create_adventure_sheet(sheet: AdventureSheetCreate, db: Session = Depends(get_db)) -> AdventureSheetResponse:
+def create_adventure_sheet(sheet: AdventureSheetCreate, db: Session = Depends(get_db)) -> AdventureSheetResponse:
     """Crée une nouvelle feuille d'aventure."""
-    # Vérifier que le livre existe
-    book = db.query(Book).filter(Book.id == sheet.book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Livre non trouvé")
-
-    # Obtenir le prochain numéro de tentative automatiquement
-    sheet.attempt_number = get_next_attempt_number(sheet.book_id, db)
-
     # Calculer les statistiques initiales si non fournies
     if sheet.initial_skill is None or sheet.initial_stamina is None or sheet.initial_luck is None:
         skill, stamina, luck = calculate_initial_stats()
@@ -291,120 +588,624 @@ async def create_adventure_sheet(sheet: AdventureSheetCreate, db: Session = Depe
     if not validate_character_stats(sheet.initial_skill, sheet.initial_stamina, sheet.initial_luck):
         raise HTTPException(status_code=400, detail="Statistiques du personnage invalides")
 
-    # Créer la feuille avec les statistiques courantes égales aux initiales
-    db_sheet = AdventureSheet(
-        book_id=sheet.book_id,
-        attempt_number=sheet.attempt_number,
-        character_name=sheet.character_name,
-        initial_skill=sheet.initial_skill,
-        initial_stamina=sheet.initial_stamina,
-        initial_luck=sheet.initial_luck,
-        current_skill=sheet.initial_skill,
-        current_stamina=sheet.initial_stamina,
-        current_luck=sheet.initial_luck,
-        gold=0,
-        jewelry=None,
-        potions=None,
-        provisions=None,
-        equipment=None,
-        monster_encounters=None,
-        active_combats=None,
-        combat_history=None,
-        is_active=True,
-        notes=None,
-    )
+    # Créer la feuille avec les statistiques courantes égales aux initiales ;
+    # le numéro de tentative est attribué par la requête d'insertion
+    values = {
+        "book_id": sheet.book_id,
+        "character_name": sheet.character_name,
+        "initial_skill": sheet.initial_skill,
+        "initial_stamina": sheet.initial_stamina,
+        "initial_luck": sheet.initial_luck,
+        "current_skill": sheet.initial_skill,
+        "current_stamina": sheet.initial_stamina,
+        "current_luck": sheet.initial_luck,
+        "gold": 0,
+        "is_active": True,
+    }
 
-    db.add(db_sheet)
-    db.commit()
-    db.refresh(db_sheet)
-    return db_sheet
+    for _ in range(MAX_INSERT_ATTEMPTS):
+        try:
+            sheet_id = insert_adventure_sheet(values, db)
+            if sheet_id is not None:
+                record_sheet_events(db, sheet_id, [created_event(db, sheet_id)])
+                record_sheet_created(db, sheet.book_id)
+            db.commit()
+            break
+        except IntegrityError:
+            # Numéro de tentative pris par une création concurrente : recalculer
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Conflit sur le numéro de tentative, veuillez réessayer")
+
+    if sheet_id is None:
+        raise HTTPException(status_code=404, detail="Livre non trouvé")
+
+    return db.get(AdventureSheet, sheet_id)
 
 
 @app.get("/api/adventure-sheets", response_model=list[AdventureSheetResponse])
-async def get_adventure_sheets(
-    book_id: int | None = None, db: Session = Depends(get_db)
-) -> list[AdventureSheetResponse]:
-    """Récupère toutes les feuilles d'aventures, optionnellement filtrées par livre."""
-    query = db.query(AdventureSheet)
+def get_adventure_sheets(
+    book_id: int | None = None,
+    series_id: int | None = None,
+    is_active: bool | None = None,
+    archived: bool = False,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    db: Session = Depends(get_read_db),
+    cache_headers: dict[str, str] = sheets_cache,
+) -> JSONResponse:
+    """Récupère les feuilles d'aventures, ordonnées par (book_id, attempt_number).
+
+    Filtres optionnels par livre, par série et par statut (voir `list_page` pour la pagination).
+    `archived=true` liste les feuilles archivées (toutes terminées) au lieu des feuilles courantes.
+    """
+    model = ArchivedSheet if archived else AdventureSheet
+    filters = []
     if book_id:
-        query = query.filter(AdventureSheet.book_id == book_id)
-    return query.order_by(AdventureSheet.attempt_number.desc()).all()
+        filters.append(model.book_id == book_id)
+    if series_id:
+        filters.append(model.book_id.in_(select(Book.id).where(Book.series_id == series_id)))
 
+    if archived:
+        if is_active:
+            filters.append(false())
+        return archived_sheets_page(db, filters, limit, cursor, fields, cache_headers)
 
-@app.get("/api/adventure-sheets/{sheet_id}", response_model=AdventureSheetResponse)
-async def get_adventure_sheet_by_id(sheet_id: int, db: Session = Depends(get_db)) -> AdventureSheetResponse:
-    """Récupère une feuille d'aventure par son ID."""
-    sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
+    if is_active is not None:
+        filters.append(AdventureSheet.is_active == is_active)
+
+    key_columns = [AdventureSheet.book_id, AdventureSheet.attempt_number]
+    return list_page(
+        db, AdventureSheet, AdventureSheetResponse, key_columns, filters, limit, cursor, fields, cache_headers
+    )
+
+
+@app.get(
+    "/api/adventure-sheets/{sheet_id}",
+    response_model=AdventureSheetDetailResponse,
+    response_model_exclude_unset=True,
+    dependencies=[sheet_cache],
+)
+def get_adventure_sheet_by_id(
+    sheet_id: int, include: str | None = None, db: Session = Depends(get_read_db)
+) -> AdventureSheetDetailResponse:
+    """Récupère une feuille d'aventure par son ID.
+
+    `include=book,series,encounters` ajoute les objets liés, chargés dans la même requête.
+    Une feuille archivée est relue depuis l'archive.
+    """
+    try:
+        includes = set(parse_fields(include, SHEET_INCLUDES, "include") or ())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    sheet = load_adventure_sheet(db, sheet_id, includes)
     if not sheet:
-        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
-    return sheet
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+        return archived_sheet_detail(db, payload, includes)
+
+    related = {}
+    if "book" in includes:
+        related["book"] = BookResponse.model_validate(sheet.book)
+    if "series" in includes:
+        related["series"] = SeriesResponse.model_validate(sheet.book.series)
+    if "encounters" in includes:
+        related["encounters"] = [EncounterResponse.model_validate(encounter) for encounter in sheet.encounters]
+
+    return AdventureSheetDetailResponse(**AdventureSheetResponse.model_validate(sheet).model_dump(), **related)
+
+
+def archived_sheet_detail(db: Session, payload: dict, includes: set[str]) -> AdventureSheetDetailResponse:
+    """Construit la réponse détaillée d'une feuille archivée (livre et série depuis le catalogue)."""
+    sheet = AdventureSheetResponse.model_validate(payload["adventure_sheets"][0])
+    related = {}
+    if includes & {"book", "series"}:
+        book = catalog.get_book(db, sheet.book_id)
+        if "book" in includes:
+            related["book"] = book
+        if "series" in includes:
+            related["series"] = catalog.get_series(db, book.series_id) if book else None
+    if "encounters" in includes:
+        related["encounters"] = [EncounterResponse.model_validate(row) for row in payload["encounters"]]
+
+    return AdventureSheetDetailResponse(**sheet.model_dump(), **related)
 
 
 @app.put("/api/adventure-sheets/{sheet_id}", response_model=AdventureSheetResponse)
-async def update_adventure_sheet(
+def update_adventure_sheet(
     sheet_id: int, sheet_update: AdventureSheetUpdate, db: Session = Depends(get_db)
 ) -> AdventureSheetResponse:
     """Met à jour une feuille d'aventure."""
+    # Verrou d'écriture avant la lecture : l'état avant modification compté dans les statistiques est à jour
+    begin_write(db)
     db_sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
     if not db_sheet:
         raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
 
-    # Mettre à jour les champs fournis
+    # Mettre à jour les champs fournis, en journalisant ceux qui changent
     update_data = sheet_update.dict(exclude_unset=True)
+    before = (db_sheet.is_active, db_sheet.current_stamina)
+    events = [
+        {"kind": "set", "field": field, "value": value}
+        for field, value in update_data.items()
+        if getattr(db_sheet, field) != value
+    ]
     for field, value in update_data.items():
         setattr(db_sheet, field, value)
 
+    record_sheet_events(db, sheet_id, events)
+    record_sheet_change(
+        db, sheet_id, db_sheet.book_id, db_sheet.attempt_number, before, (db_sheet.is_active, db_sheet.current_stamina)
+    )
     db.commit()
     db.refresh(db_sheet)
     return db_sheet
 
 
-@app.delete("/api/adventure-sheets/{sheet_id}")
-async def delete_adventure_sheet(sheet_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
-    """Supprime une feuille d'aventure."""
-    db_sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
-    if not db_sheet:
+@app.patch("/api/adventure-sheets/{sheet_id}")
+def patch_adventure_sheet(
+    sheet_id: int,
+    patch: Annotated[AdventureSheetPatchOps | AdventureSheetUpdate, Field(union_mode="left_to_right")],
+    db: Session = Depends(get_db),
+) -> dict:
+    """Modifie quelques champs d'une feuille d'aventure en une seule requête UPDATE.
+
+    Accepte un JSON Merge Patch (`{"current_stamina": 12}`) ou une liste d'opérations
+    (`{"ops": [{"op": "inc", "field": "current_stamina", "value": -2}]}`).
+    Seuls les champs modifiés sont retournés, avec l'identifiant et la date de mise à jour.
+    """
+    try:
+        values = sheet_patch_values(patch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if not values:
+        raise HTTPException(status_code=400, detail="Aucun champ à modifier")
+
+    # État de fin de partie avant la modification, pour les statistiques du livre,
+    # lu sous le verrou d'écriture : deux PATCH concurrents ne partent pas du même état
+    previous = None
+    if values.keys() & {"is_active", "current_stamina"}:
+        begin_write(db)
+        previous = db.execute(
+            select(
+                AdventureSheet.book_id,
+                AdventureSheet.attempt_number,
+                AdventureSheet.is_active,
+                AdventureSheet.current_stamina,
+            ).where(AdventureSheet.id == sheet_id)
+        ).first()
+
+    columns = [getattr(AdventureSheet, field) for field in values]
+    row = db.execute(
+        update(AdventureSheet)
+        .where(AdventureSheet.id == sheet_id)
+        .values(values)
+        .returning(AdventureSheet.id, *columns, AdventureSheet.updated_at)
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
 
-    db.delete(db_sheet)
+    record_sheet_events(db, sheet_id, patch_events(patch))
+    result = row._asdict()
+    if previous is not None:
+        record_sheet_change(
+            db,
+            sheet_id,
+            previous.book_id,
+            previous.attempt_number,
+            (previous.is_active, previous.current_stamina),
+            (result.get("is_active", previous.is_active), result.get("current_stamina", previous.current_stamina)),
+        )
     db.commit()
+    return result
+
+
+@app.delete("/api/adventure-sheets/{sheet_id}")
+def delete_adventure_sheet(sheet_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
+    """Supprime une feuille d'aventure, ses rencontres et ses combats (en cascade dans la base), ou son archive."""
+    if not delete_cascade(db, AdventureSheet, sheet_id, AdventureSheet.id == sheet_id):
+        if not delete_cascade(db, ArchivedSheet, sheet_id, false(), ArchivedSheet.id == sheet_id):
+            raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
     return {"message": "Feuille d'aventure supprimée avec succès"}
 
 
+# Journal des événements d'une feuille
+def archived_sheet_events(payload: dict) -> list[SheetEvent]:
+    """Événements d'une feuille archivée, ordonnés par numéro (objets non rattachés à la session)."""
+    table = SheetEvent.__table__
+    events = [SheetEvent(**table_row_from_json(table, row)) for row in payload.get("sheet_events", [])]
+    return sorted(events, key=lambda event: event.sequence)
+
+
+@app.get("/api/adventure-sheets/{sheet_id}/events", response_model=list[SheetEventResponse])
+def get_sheet_events(
+    sheet_id: int,
+    kind: str | None = None,
+    field: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+    cache_headers: dict[str, str] = events_cache,
+) -> JSONResponse:
+    """Récupère le journal d'une feuille d'aventure (courante ou archivée), dans l'ordre des événements.
+
+    Filtres optionnels par type d'événement et par champ modifié (voir `list_page` pour la pagination).
+    """
+    filters = [SheetEvent.sheet_id == sheet_id]
+    if kind:
+        filters.append(SheetEvent.kind == kind)
+    if field:
+        filters.append(SheetEvent.field == field)
+
+    if db.query(SheetEvent.id).filter(SheetEvent.sheet_id == sheet_id).first() is None:
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is not None:
+            events = [
+                SheetEventResponse.model_validate(event).model_dump(mode="json")
+                for event in archived_sheet_events(payload)
+                if (not kind or event.kind == kind) and (not field or event.field == field)
+            ]
+            return JSONResponse(content=events, headers=cache_headers)
+
+    return list_page(
+        db, SheetEvent, SheetEventResponse, [SheetEvent.sequence], filters, limit, cursor, None, cache_headers
+    )
+
+
+@app.get("/api/adventure-sheets/{sheet_id}/state", response_model=SheetStateResponse, dependencies=[events_cache])
+def get_sheet_state(
+    sheet_id: int, sequence: int | None = Query(default=None, ge=1), db: Session = Depends(get_read_db)
+) -> SheetStateResponse:
+    """Reconstruit une feuille d'aventure telle qu'elle était après l'événement `sequence` (défaut: le dernier)."""
+    sheet = db.get(AdventureSheet, sheet_id)
+    if sheet is not None:
+        base = AdventureSheetResponse.model_validate(sheet).model_dump()
+        result = sheet_state_at(db, sheet_id, sequence)
+    else:
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+        base = payload["adventure_sheets"][0]
+        events = archived_sheet_events(payload)
+        result = replay_sheet_events(event for event in events if sequence is None or event.sequence <= sequence)
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Aucun événement enregistré pour cette feuille")
+    state, last_sequence = result
+    return SheetStateResponse.model_validate({**base, **state, "sequence": last_sequence})
+
+
+@app.post("/api/adventure-sheets/{sheet_id}/rebuild", response_model=SheetStateResponse)
+def rebuild_adventure_sheet(sheet_id: int, db: Session = Depends(get_db)) -> SheetStateResponse:
+    """Recalcule une feuille d'aventure et ses instantanés à partir de tout son journal."""
+    if db.get(AdventureSheet, sheet_id) is None:
+        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+
+    sequence = rebuild_sheet(db, sheet_id)
+    if sequence is None:
+        raise HTTPException(status_code=404, detail="Aucun événement enregistré pour cette feuille")
+
+    sheet = db.get(AdventureSheet, sheet_id)
+    return SheetStateResponse.model_validate(
+        {**AdventureSheetResponse.model_validate(sheet).model_dump(), "sequence": sequence}
+    )
+
+
+# Rencontres de monstres
+@app.get(
+    "/api/adventure-sheets/{sheet_id}/encounters",
+    response_model=list[EncounterResponse],
+    dependencies=[encounters_cache],
+)
+def get_encounters(sheet_id: int, db: Session = Depends(get_read_db)) -> list[EncounterResponse]:
+    """Récupère les rencontres de monstres d'une feuille d'aventure (courante ou archivée)."""
+    encounters = db.query(Encounter).filter(Encounter.sheet_id == sheet_id).order_by(Encounter.position).all()
+    if not encounters:
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is not None:
+            return [EncounterResponse.model_validate(row) for row in payload["encounters"]]
+    return encounters
+
+
+@app.post(
+    "/api/adventure-sheets/{sheet_id}/encounters",
+    response_model=EncounterResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_encounter(sheet_id: int, encounter: EncounterCreate, db: Session = Depends(get_db)) -> EncounterResponse:
+    """Ajoute une rencontre de monstre à une feuille d'aventure."""
+    if db.query(AdventureSheet.id).filter(AdventureSheet.id == sheet_id).first() is None:
+        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+
+    position = encounter.position
+    if position is None:
+        last_position = db.query(func.max(Encounter.position)).filter(Encounter.sheet_id == sheet_id).scalar()
+        position = 0 if last_position is None else last_position + 1
+
+    db_encounter = Encounter(sheet_id=sheet_id, **encounter.model_dump(exclude={"position"}), position=position)
+    db.add(db_encounter)
+    record_monster(db, sheet_id, encounter.name, encounter.skill, encounter.stamina, encounter.paragraph)
+    db.commit()
+    db.refresh(db_encounter)
+    return db_encounter
+
+
+@app.put("/api/encounters/{encounter_id}", response_model=EncounterResponse)
+def update_encounter(
+    encounter_id: int, encounter_update: EncounterCreate, db: Session = Depends(get_db)
+) -> EncounterResponse:
+    """Met à jour une rencontre de monstre."""
+    db_encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    if not db_encounter:
+        raise HTTPException(status_code=404, detail="Rencontre non trouvée")
+
+    for field, value in encounter_update.model_dump(exclude_unset=True).items():
+        if field != "position" or value is not None:
+            setattr(db_encounter, field, value)
+
+    # Un monstre nommé ou corrigé rejoint le bestiaire ; le monstre saisi avant y reste
+    if {"name", "skill", "stamina", "paragraph"} & encounter_update.model_fields_set:
+        record_monster(
+            db,
+            db_encounter.sheet_id,
+            db_encounter.name,
+            db_encounter.skill,
+            db_encounter.stamina,
+            db_encounter.paragraph,
+        )
+
+    db.commit()
+    db.refresh(db_encounter)
+    return db_encounter
+
+
+@app.delete("/api/encounters/{encounter_id}")
+def delete_encounter(encounter_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
+    """Supprime une rencontre de monstre."""
+    deleted = db.query(Encounter).filter(Encounter.id == encounter_id).delete(synchronize_session=False)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Rencontre non trouvée")
+
+    db.commit()
+    return {"message": "Rencontre supprimée avec succès"}
+
+
+# Historique des combats
+@app.get("/api/adventure-sheets/{sheet_id}/combats", response_model=list[CombatRecordResponse])
+def get_sheet_combats(
+    sheet_id: int, finished_only: bool = False, db: Session = Depends(get_read_db)
+) -> list[CombatRecordResponse]:
+    """Récupère les combats d'une feuille d'aventure (courante ou archivée), du plus ancien au plus récent."""
+    query = db.query(Combat).filter(Combat.sheet_id == sheet_id)
+    if finished_only:
+        query = query.filter(Combat.winner.isnot(None))
+    combats = query.order_by(Combat.id).all()
+    if not combats:
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is not None:
+            records = [CombatRecordResponse.model_validate(row) for row in payload["combats"]]
+            return [record for record in records if record.winner is not None or not finished_only]
+    return combats
+
+
+@app.get("/api/combats/{combat_record_id}/rounds", response_model=list[CombatRoundResult])
+def get_combat_rounds(combat_record_id: int, db: Session = Depends(get_read_db)) -> list[CombatRoundResult]:
+    """Récupère les rounds d'un combat enregistré."""
+    combat = db.query(Combat).filter(Combat.id == combat_record_id).first()
+    if not combat:
+        raise HTTPException(status_code=404, detail="Combat non trouvé")
+    return [combat_round_from_record(record, combat) for record in combat.rounds]
+
+
+# Graphe des paragraphes d'un livre et parcours des feuilles
+@app.get("/api/books/{book_id}/graph", response_model=BookGraphResponse, dependencies=[graph_cache])
+def get_book_graph(book_id: int, db: Session = Depends(get_read_db)) -> BookGraphResponse:
+    """Récupère les paragraphes et les choix d'un livre."""
+    if catalog.get_book(db, book_id) is None:
+        raise HTTPException(status_code=404, detail="Livre non trouvé")
+    return load_book_graph(db, book_id)
+
+
+@app.put("/api/books/{book_id}/graph", response_model=BookGraphResponse)
+def replace_book_graph_endpoint(
+    book_id: int, graph: BookGraphUpdate, db: Session = Depends(get_db)
+) -> BookGraphResponse:
+    """Remplace le graphe d'un livre ; les paragraphes cités par un choix sont créés s'ils ne sont pas listés."""
+    if catalog.get_book(db, book_id) is None:
+        raise HTTPException(status_code=404, detail="Livre non trouvé")
+
+    try:
+        replace_book_graph(db, book_id, graph)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    book_graphs.invalidate()
+    return load_book_graph(db, book_id)
+
+
+def sheet_journey(db: Session, sheet_id: int) -> tuple[int, list[int]]:
+    """Retourne le livre et les paragraphes visités (dans l'ordre) d'une feuille courante ou archivée."""
+    book_id = db.scalar(select(AdventureSheet.book_id).where(AdventureSheet.id == sheet_id))
+    if book_id is not None:
+        return book_id, [visit.paragraph for visit in sheet_visits(db, sheet_id)]
+
+    payload = load_archived_sheet(db, sheet_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+    visits = sorted(payload.get("paragraph_visits", []), key=lambda visit: visit["position"])
+    return payload["adventure_sheets"][0]["book_id"], [visit["paragraph"] for visit in visits]
+
+
+@app.get(
+    "/api/adventure-sheets/{sheet_id}/visits",
+    response_model=list[ParagraphVisitResponse],
+    dependencies=[visits_cache],
+)
+def get_sheet_visits(sheet_id: int, db: Session = Depends(get_read_db)) -> list[ParagraphVisitResponse]:
+    """Récupère les paragraphes visités par une feuille d'aventure (courante ou archivée), dans l'ordre."""
+    visits = sheet_visits(db, sheet_id)
+    if not visits:
+        payload = load_archived_sheet(db, sheet_id)
+        if payload is not None:
+            rows = sorted(payload.get("paragraph_visits", []), key=lambda visit: visit["position"])
+            return [ParagraphVisitResponse.model_validate(row) for row in rows]
+    return visits
+
+
+@app.post(
+    "/api/adventure-sheets/{sheet_id}/visits",
+    response_model=ParagraphVisitResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_sheet_visit(
+    sheet_id: int, visit: ParagraphVisitCreate, db: Session = Depends(get_db)
+) -> ParagraphVisitResponse:
+    """Note le paragraphe où se trouve maintenant le personnage."""
+    begin_write(db)
+    if db.query(AdventureSheet.id).filter(AdventureSheet.id == sheet_id).first() is None:
+        if db.get(ArchivedSheet, sheet_id) is not None:
+            raise HTTPException(
+                status_code=404, detail="Feuille d'aventure archivée : restaurez-la pour reprendre la partie"
+            )
+        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+
+    previous_paragraph = last_visited_paragraph(db, sheet_id)
+    db_visit = record_visit(db, sheet_id, visit.paragraph)
+    record_visit_after_death(db, sheet_id, previous_paragraph, visit.paragraph)
+    db.commit()
+    return db_visit
+
+
+def journey_start(db: Session, sheet_id: int, from_paragraph: int | None) -> tuple[BookGraph, int, list[int]]:
+    """Graphe du livre d'une feuille, paragraphe de départ et paragraphes visités.
+
+    Le départ est `from_paragraph`, sinon le dernier paragraphe visité, sinon le début du livre.
+    """
+    book_id, visited = sheet_journey(db, sheet_id)
+    source = from_paragraph or (visited[-1] if visited else START_PARAGRAPH)
+    graph = book_graphs.get(db, book_id)
+    if graph.index(source) is None:
+        raise HTTPException(status_code=404, detail=f"Paragraphe {source} absent du graphe du livre")
+    return graph, source, visited
+
+
+@app.get("/api/adventure-sheets/{sheet_id}/route", response_model=ParagraphRoute, dependencies=[journey_cache])
+def get_sheet_route(
+    sheet_id: int,
+    to: int = Query(..., ge=1),
+    from_paragraph: int | None = Query(default=None, alias="from", ge=1),
+    db: Session = Depends(get_read_db),
+) -> ParagraphRoute:
+    """Calcule le plus court chemin du paragraphe courant de la feuille (ou de `from`) jusqu'au paragraphe `to`."""
+    graph, source, _ = journey_start(db, sheet_id, from_paragraph)
+    if graph.index(to) is None:
+        raise HTTPException(status_code=404, detail=f"Paragraphe {to} absent du graphe du livre")
+
+    paragraphs = graph.route(source, to)
+    if paragraphs is None:
+        raise HTTPException(status_code=404, detail=f"Aucun chemin du paragraphe {source} au paragraphe {to}")
+    return ParagraphRoute(source=source, target=to, paragraphs=paragraphs, length=len(paragraphs) - 1)
+
+
+@app.get(
+    "/api/adventure-sheets/{sheet_id}/reachable",
+    response_model=list[ReachableParagraph],
+    dependencies=[journey_cache],
+)
+def get_sheet_reachable(
+    sheet_id: int,
+    from_paragraph: int | None = Query(default=None, alias="from", ge=1),
+    db: Session = Depends(get_read_db),
+) -> list[ReachableParagraph]:
+    """Liste les paragraphes jamais visités par la feuille mais accessibles depuis son paragraphe courant."""
+    graph, source, visited = journey_start(db, sheet_id, from_paragraph)
+    seen = set(visited)
+    return [
+        ReachableParagraph(number=number, distance=distance, ending=graph.endings.get(number))
+        for number, distance in graph.reachable(source)
+        if number not in seen
+    ]
+
+
 # Utilitaires pour les dés
-@app.post("/api/dice/roll")
-async def roll_dice_endpoint(dice_roll: DiceRoll) -> dict:
-    """Lance des dés selon la configuration spécifiée."""
-    from .utils import roll_dice
+def get_dice_stream(sheet_id: int | None = None) -> DiceStream:
+    """Dépendance : flux de dés de la feuille demandée, ou flux global."""
+    return sheet_stream(sheet_id) if sheet_id is not None else default_stream()
 
-    result = roll_dice(dice_roll.dice_count, dice_roll.sides)
-    return {
+
+@app.post("/api/dice/roll")
+def roll_dice_endpoint(dice_roll: DiceRoll, stream: DiceStream = Depends(get_dice_stream)) -> dict:
+    """Lance des dés selon la configuration ou l'expression spécifiée."""
+    try:
+        compiled = compile_expression(dice_roll.expression or f"{dice_roll.dice_count}d{dice_roll.sides}")
+        with stream.reserve() as offset:
+            totals, term_rolls = evaluate(compiled, dice_roll.times, stream)
+        outcome_distribution = dice_distribution(compiled) if dice_roll.distribution else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    response = {
+        "expression": str(compiled),
         "dice_count": dice_roll.dice_count,
         "sides": dice_roll.sides,
-        "result": result,
-        "rolls": [roll_dice(1, dice_roll.sides) for _ in range(dice_roll.dice_count)],
+        "result": int(totals[0]),
+        "rolls": [value for rolls in term_rolls for value in rolls[0].tolist()],
+        "terms": [
+            {"dice": str(term), "sign": term.sign, "rolls": rolls[0].tolist()}
+            for term, rolls in zip(compiled.terms, term_rolls, strict=True)
+        ],
+        "seed": stream.seed,
+        "offset": offset,
     }
+    if dice_roll.times > 1:
+        response["results"] = totals.tolist()
+    if outcome_distribution is not None:
+        response["distribution"] = outcome_distribution
+    return response
+
+
+@app.post("/api/dice/bulk")
+def bulk_dice_endpoint(bulk: DiceBulkRequest) -> StreamingResponse:
+    """Génère un grand nombre de tirages en flux NDJSON (valeurs brutes ou histogramme cumulé).
+
+    Sans expression, tire les statistiques initiales (habileté, endurance, chance).
+    """
+    try:
+        if bulk.expression is not None:
+            expressions = {"result": compile_expression(bulk.expression)}
+        else:
+            expressions = {name: compile_expression(text) for name, text in INITIAL_STATS_EXPRESSIONS.items()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    stream = DiceStream(bulk.seed if bulk.seed is not None else default_stream().derive_seed())
+    lines = iter_bulk_samples(expressions, bulk.samples, bulk.chunk_size, stream, histogram=bulk.output == "histogram")
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers={"X-Dice-Seed": str(stream.seed)})
 
 
 @app.post("/api/dice/1d6")
-async def roll_1d6_endpoint() -> dict:
+def roll_1d6_endpoint(stream: DiceStream = Depends(get_dice_stream)) -> dict:
     """Lance 1d6."""
-    result = roll_1d6()
-    return {"dice": "1d6", "result": result}
+    with stream.reserve() as offset:
+        result = roll_1d6(stream)
+    return {"dice": "1d6", "result": result, "seed": stream.seed, "offset": offset}
 
 
 @app.post("/api/dice/2d6")
-async def roll_2d6_endpoint() -> dict:
+def roll_2d6_endpoint(stream: DiceStream = Depends(get_dice_stream)) -> dict:
     """Lance 2d6."""
-    result = roll_2d6()
-    rolls = [roll_1d6() for _ in range(2)]
-    return {"dice": "2d6", "result": result, "rolls": rolls}
+    with stream.reserve() as offset:
+        rolls = roll_dice_list(2, 6, stream)
+    return {"dice": "2d6", "result": sum(rolls), "rolls": rolls, "seed": stream.seed, "offset": offset}
 
 
 @app.post("/api/dice/calculate-stats")
-async def calculate_stats_endpoint() -> dict:
+def calculate_stats_endpoint(stream: DiceStream = Depends(get_dice_stream)) -> dict:
     """Calcule les statistiques initiales d'un personnage."""
-    skill, stamina, luck = calculate_initial_stats()
+    with stream.reserve() as offset:
+        skill, stamina, luck = calculate_initial_stats(stream)
     return {
         "skill": skill,
         "stamina": stamina,
@@ -412,12 +1213,14 @@ async def calculate_stats_endpoint() -> dict:
         "skill_roll": skill - 6,
         "stamina_roll": stamina - 12,
         "luck_roll": luck - 6,
+        "seed": stream.seed,
+        "offset": offset,
     }
 
 
 # Endpoints pour le système de combat
 @app.post("/api/combat/start", response_model=CombatState)
-async def start_combat_endpoint(combat_start: CombatStart, sheet_id: int, db: Session = Depends(get_db)) -> CombatState:
+def start_combat_endpoint(combat_start: CombatStart, sheet_id: int, db: Session = Depends(get_db)) -> CombatState:
     """Commence un nouveau combat avec un monstre."""
     # Récupérer la feuille d'aventure pour obtenir les stats du joueur
     sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
@@ -432,39 +1235,375 @@ async def start_combat_endpoint(combat_start: CombatStart, sheet_id: int, db: Se
         player_skill=sheet.current_skill,
         player_stamina=sheet.current_stamina,
         player_luck=sheet.current_luck,
+        stream=sheet_stream(sheet_id),
     )
 
+    combat_state = combat_state.model_copy(update={"combat_id": new_combat_id()})
+    db.add(
+        Combat(
+            sheet_id=sheet_id,
+            session_id=combat_state.combat_id,
+            monster_name=combat_state.monster_name,
+            monster_skill=combat_state.monster_skill,
+            monster_max_stamina=combat_state.monster_max_stamina,
+            rng_seed=combat_state.rng_seed,
+        )
+    )
+    record_monster(
+        db, sheet_id, combat_state.monster_name, combat_state.monster_skill, combat_state.monster_max_stamina
+    )
+    db.commit()
+
+    # Conserver l'état côté serveur, une fois le combat enregistré : le client ne garde que son identifiant
+    combat_store.save(sheet_id, combat_state)
+
     return combat_state
 
 
+@app.get("/api/combat/{combat_id}", response_model=CombatState)
+def get_combat_endpoint(combat_id: str) -> CombatState:
+    """Récupère l'état d'un combat en cours."""
+    stored = combat_store.get(combat_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Combat non trouvé ou expiré")
+    return stored[1]
+
+
+@app.delete("/api/combat/{combat_id}")
+def delete_combat_endpoint(combat_id: str, db: Session = Depends(get_db)) -> dict[str, str]:
+    """Abandonne un combat en cours."""
+    combat_store.delete(combat_id)
+
+    db.query(Combat).filter(Combat.session_id == combat_id, Combat.is_active.is_(True)).update(
+        {Combat.is_active: False, Combat.completed_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+    return {"message": "Combat arrêté"}
+
+
 @app.post("/api/combat/round")
-async def execute_combat_round_endpoint(
-    combat_state: CombatState, action: CombatAction, sheet_id: int, db: Session = Depends(get_db)
+def execute_combat_round_endpoint(
+    combat_round: CombatRoundRequest,
+    rounds: int = Query(default=1, ge=1, le=MAX_COMBAT_ROUNDS_PER_REQUEST),
+    until: Literal["end"] | None = None,
+    db: Session = Depends(get_db),
 ) -> dict:
-    """Exécute un round de combat."""
+    """Exécute un ou plusieurs rounds d'un combat stocké côté serveur.
+
+    `rounds=N` résout jusqu'à N rounds, `until=end` résout le combat jusqu'à sa fin.
+    """
+    stored = combat_store.get(combat_round.combat_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Combat non trouvé ou expiré")
+    sheet_id, combat_state = stored
+
     # Vérifier que la feuille d'aventure existe
     sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
     if not sheet:
         raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
 
-    # Exécuter le round de combat
-    round_result, new_combat_state = execute_combat_round(combat_state=combat_state, attempt_luck=action.attempt_luck)
+    if not combat_state.is_active:
+        raise HTTPException(status_code=400, detail="Le combat est déjà terminé")
 
-    # Mettre à jour les statistiques du joueur dans la base de données
+    # Exécuter les rounds de combat
+    action = combat_round.action
+    round_results, new_combat_state = execute_combat_rounds(
+        combat_state=combat_state,
+        max_rounds=MAX_COMBAT_ROUNDS_PER_REQUEST if until == "end" else rounds,
+        attempt_luck=action.attempt_luck,
+        luck_policy=action.luck_policy,
+    )
+    round_result = round_results[-1]
+
+    # Faire avancer le combat seulement s'il en est encore au round lu : une requête concurrente
+    # partie du même état échoue ici (le verrou d'écriture de la base est pris avant la mise à jour)
+    begin_write(db)
+    advanced = db.execute(
+        update(Combat)
+        .where(
+            Combat.session_id == combat_state.combat_id,
+            Combat.is_active.is_(True),
+            Combat.rounds_fought == combat_state.round_number - 1,
+        )
+        .values(rounds_fought=new_combat_state.round_number - 1)
+        .returning(Combat.id)
+    ).scalar()
+    combat = db.get(Combat, advanced) if advanced is not None else None
+    if combat is None and db.scalar(select(Combat.id).where(Combat.session_id == combat_state.combat_id)):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Le combat a été modifié par une autre requête")
+
+    # Ajouter les rounds joués à l'historique du combat
+    if combat is not None:
+        db.execute(insert(CombatRound), [combat_round_to_record(combat.id, result) for result in round_results])
+
+    # Mettre à jour le combat et les statistiques du joueur dans la base de données, une seule fois
     if round_result.combat_ended:
+        if combat is not None:
+            combat.is_active = False
+            combat.winner = round_result.combat_winner
+            combat.final_player_stamina = round_result.player_stamina_after
+            combat.final_monster_stamina = round_result.monster_stamina_after
+            combat.final_player_luck = round_result.player_luck_after
+            combat.completed_at = datetime.utcnow()
+            record_combat_end(db, combat)
+
+        # Relire la feuille sous le verrou d'écriture : une autre requête a pu la modifier depuis la première lecture
+        db.refresh(sheet)
+        record_sheet_change(
+            db,
+            sheet.id,
+            sheet.book_id,
+            sheet.attempt_number,
+            (sheet.is_active, sheet.current_stamina),
+            (sheet.is_active, round_result.player_stamina_after),
+        )
         sheet.current_stamina = round_result.player_stamina_after
         sheet.current_luck = round_result.player_luck_after
-        db.commit()
-        db.refresh(sheet)
+        record_sheet_events(
+            db,
+            sheet_id,
+            [
+                {
+                    "kind": "combat",
+                    "value": {"current_stamina": sheet.current_stamina, "current_luck": sheet.current_luck},
+                    "combat_id": combat.id if combat is not None else None,
+                }
+            ],
+        )
 
-    return {"round_result": round_result, "new_combat_state": new_combat_state}
+    db.commit()
+
+    # L'état côté serveur suit la base, après le commit
+    if new_combat_state.is_active:
+        saved = combat_store.save(sheet_id, new_combat_state, expected_round=combat_state.round_number)
+    else:
+        combat_store.delete(new_combat_state.combat_id)
+        saved = True
+    if not saved:
+        raise HTTPException(status_code=409, detail="Le combat a été modifié par une autre requête")
+
+    return {"round_result": round_result, "round_results": round_results, "new_combat_state": new_combat_state}
+
+
+@app.post("/api/combat/simulate", response_model=CombatSimulationResult)
+def simulate_combat_endpoint(
+    simulation: CombatSimulationRequest, sheet_id: int, db: Session = Depends(get_read_db)
+) -> CombatSimulationResult:
+    """Estime les chances de victoire contre un monstre par simulation de Monte-Carlo."""
+    sheet = db.query(AdventureSheet).filter(AdventureSheet.id == sheet_id).first()
+    if not sheet:
+        raise HTTPException(status_code=404, detail="Feuille d'aventure non trouvée")
+
+    try:
+        return simulate_combats(
+            player_skill=sheet.current_skill,
+            player_stamina=sheet.current_stamina,
+            player_luck=sheet.current_luck,
+            monster_skill=simulation.monster_skill,
+            monster_stamina=simulation.monster_stamina,
+            luck_policy=simulation.luck_policy,
+            simulations=simulation.simulations,
+            max_rounds=simulation.max_rounds,
+            rng=np.random.default_rng(simulation.seed),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@app.post("/api/combat/replay")
+def replay_combat_endpoint(replay: CombatReplayRequest) -> dict:
+    """Rejoue un combat à l'identique à partir de sa graine et des actions de chaque round."""
+    try:
+        round_results, final_state = replay_combat(replay.initial_state, replay.actions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return {"round_results": round_results, "final_state": final_state}
+
+
+@app.post("/api/combat/odds", response_model=CombatOdds)
+def combat_odds_endpoint(combat_state: CombatState) -> CombatOdds:
+    """Calcule les chances exactes de victoire et la recommandation de chance pour le prochain round."""
+    try:
+        return combat_odds(
+            player_skill=combat_state.player_skill,
+            player_stamina=combat_state.player_stamina,
+            player_luck=combat_state.player_luck,
+            monster_skill=combat_state.monster_skill,
+            monster_stamina=combat_state.monster_stamina,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+# Statistiques par livre et par monstre
+@app.get("/api/analytics/books/{book_id}", response_model=BookAnalytics, dependencies=[analytics_cache])
+def get_book_analytics(book_id: int, db: Session = Depends(get_read_db)) -> BookAnalytics:
+    """Récupère les statistiques des parties d'un livre : morts, parties réussies, tentatives."""
+    if catalog.get_book(db, book_id) is None:
+        raise HTTPException(status_code=404, detail="Livre non trouvé")
+    return book_analytics(db, book_id)
+
+
+@app.get("/api/analytics/books/{book_id}/deaths", response_model=list[DeathLocation], dependencies=[analytics_cache])
+def get_book_deaths(
+    book_id: int, limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_read_db)
+) -> list[DeathLocation]:
+    """Récupère les paragraphes où les parties d'un livre se sont le plus souvent terminées par une mort."""
+    if catalog.get_book(db, book_id) is None:
+        raise HTTPException(status_code=404, detail="Livre non trouvé")
+    return death_locations(db, book_id, limit)
+
+
+@app.get("/api/analytics/monsters", response_model=list[MonsterAnalytics], dependencies=[analytics_cache])
+def get_monster_analytics(
+    sort: Literal["kills", "lethality", "combats"] = "kills",
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+) -> list[MonsterAnalytics]:
+    """Récupère les monstres les plus meurtriers (`sort=kills`, `lethality`) ou les plus combattus (`combats`)."""
+    return monster_analytics(db, sort, limit)
+
+
+# Bestiaire
+@app.get("/api/monsters/suggest", response_model=list[MonsterSuggestion], dependencies=[monsters_cache])
+def suggest_monsters_endpoint(
+    prefix: str,
+    book_id: int | None = None,
+    limit: int = Query(default=10, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_read_db),
+) -> list[MonsterSuggestion]:
+    """Propose les monstres déjà rencontrés dont le nom commence par `prefix` (casse et accents ignorés).
+
+    Les monstres les plus souvent saisis sont proposés en premier ; `book_id` limite
+    les suggestions au bestiaire d'un livre.
+    """
+    if not normalize_monster_name(prefix):
+        raise HTTPException(status_code=400, detail="Le préfixe ne peut pas être vide")
+    return suggest_monsters(db, prefix, book_id, limit)
+
+
+# Recherche plein texte
+@app.get("/api/search", response_model=list[SearchHit])
+def search_endpoint(
+    q: str,
+    kind: str | None = None,
+    limit: int = Query(default=20, ge=1, le=MAX_SEARCH_RESULTS),
+    cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+) -> JSONResponse:
+    """Recherche dans les livres, les feuilles (inventaire et notes), les rencontres et les combats.
+
+    Les résultats sont classés par pertinence. `kind=book,sheet` restreint les types
+    de documents ; l'en-tête `X-Next-Cursor` donne le curseur de la page suivante.
+    """
+    try:
+        kinds = parse_fields(kind, SEARCH_SOURCES, "kind")
+        offset = decode_cursor(cursor, 1)[0] if cursor else 0
+        hits, has_more = search(db, q, kinds, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except OperationalError as e:
+        raise HTTPException(status_code=503, detail="Recherche plein texte indisponible") from e
+
+    headers = {"X-Next-Cursor": encode_cursor([offset + limit])} if has_more else {}
+    return JSONResponse(content=[hit.model_dump(mode="json") for hit in hits], headers=headers)
+
+
+# Archivage des feuilles terminées
+@app.post("/api/archive", response_model=ArchiveResult)
+def archive_sheets(
+    older_than_days: int = Query(default=settings.archive_after_days, ge=0),
+    vacuum: bool = False,
+    db: Session = Depends(get_db),
+) -> ArchiveResult:
+    """Archive les feuilles terminées depuis plus de `older_than_days` jours (voir archive.py).
+
+    `vacuum=true` compacte ensuite le fichier de la base (bloque les écritures pendant l'opération).
+    """
+    try:
+        archived = archive_finished_sheets(db, older_than_days)
+        codec = resolve_codec()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    if vacuum:
+        vacuum_database(engine)
+    return ArchiveResult(archived=archived, codec=codec, older_than_days=older_than_days, vacuumed=vacuum)
+
+
+@app.post("/api/adventure-sheets/{sheet_id}/restore", response_model=AdventureSheetResponse)
+def restore_adventure_sheet(sheet_id: int, db: Session = Depends(get_db)) -> AdventureSheetResponse:
+    """Remet une feuille archivée dans les feuilles courantes, avec ses rencontres et ses combats."""
+    try:
+        restored = restore_archived_sheet(db, sheet_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Archive illisible : {e}") from e
+    if not restored:
+        raise HTTPException(status_code=404, detail="Feuille d'aventure archivée non trouvée")
+    return db.get(AdventureSheet, sheet_id)
+
+
+# Export et import en masse
+@app.get("/api/export")
+def export_data() -> StreamingResponse:
+    """Exporte séries, livres, feuilles, rencontres et combats en NDJSON (voir transfer.py).
+
+    Les lignes sont lues et envoyées par lots, sans construire l'export en mémoire.
+    """
+    return StreamingResponse(
+        export_lines(read_engine),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="ldvh-companion-export.ndjson"'},
+    )
+
+
+def run_import(source: tempfile.SpooledTemporaryFile, mode: ImportMode) -> dict[str, int]:
+    """Importe un flux NDJSON dans une seule transaction (exécutée dans le pool de threads)."""
+    db = SessionLocal()
+    try:
+        counts = import_lines(db, source, mode)
+        rebuild_analytics(db)
+        rebuild_bestiary(db)
+        return counts
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except IntegrityError as e:
+        raise HTTPException(
+            status_code=409, detail="Import annulé : un identifiant ou un numéro existe déjà (essayez mode=remap)"
+        ) from e
+    finally:
+        db.close()
+        catalog.invalidate()
+
+
+@app.post("/api/import", response_model=ImportResult)
+async def import_data(request: Request, mode: ImportMode = "keep") -> ImportResult:
+    """Importe un export NDJSON (corps de la requête), tout ou rien.
+
+    `mode=keep` conserve les identifiants (restauration dans une base vide) ;
+    `mode=remap` attribue de nouveaux identifiants et traduit les références.
+    La route est asynchrone pour lire le corps en streaming ; l'insertion est
+    exécutée dans le pool de threads.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_SIZE) as source:
+        async for chunk in request.stream():
+            source.write(chunk)
+        source.seek(0)
+        counts = await to_thread.run_sync(run_import, source, mode)
+    return ImportResult(mode=mode, counts=counts)
 
 
 # Initialisation de la base de données
 @app.on_event("startup")
 async def startup_event() -> None:
     """Événement de démarrage de l'application."""
+    # Les routes qui accèdent à la base sont synchrones et exécutées dans ce pool de threads
+    to_thread.current_default_thread_limiter().total_tokens = settings.thread_pool_size
+
     create_tables()
+    run_migrations()
     init_db()
 
 
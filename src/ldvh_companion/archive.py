@@ -0,0 +1,335 @@
+"""Archivage des feuilles d'aventure terminées.
+
+Une feuille terminée depuis plus de `archive_after_days` jours quitte la table
+`adventure_sheets`, et ses rencontres, combats, rounds, événements et
+paragraphes visités quittent leurs tables (les instantanés du journal, recalculables, sont supprimés) :
+elle devient une ligne de `archived_sheets` dont le contenu complet est un JSON
+compressé (zstd si le paquet `zstandard` est installé, sinon zlib). Les tables
+lues par le jeu et par les listes restent petites ; les routes GET relisent une
+feuille archivée de façon transparente, et une feuille peut être restaurée.
+
+Une feuille archivée garde son ID : les tables archivées sont en AUTOINCREMENT,
+SQLite ne réattribue donc jamais ces IDs.
+
+Usage (par exemple depuis une tâche planifiée) :
+    uv run python -m ldvh_companion.archive --older-than-days 30 --vacuum
+"""
+
+import argparse
+import json
+import zlib
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, Connection, Engine, Table, delete, exists, insert, select, true
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import AdventureSheet, ArchivedSheet, Combat, CombatRound, Encounter, ParagraphVisit, SheetEvent
+from .utils import json_default, table_row_from_json
+
+try:
+    import zstandard
+except ImportError:  # Dépendance optionnelle (extra "zstd")
+    zstandard = None
+
+# Nombre de feuilles archivées par transaction
+ARCHIVE_BATCH_SIZE = 200
+
+# Tables dont les lignes sont déplacées dans l'archive d'une feuille, dans l'ordre des dépendances
+ARCHIVED_TABLES: dict[str, Table] = {
+    "adventure_sheets": AdventureSheet.__table__,
+    "encounters": Encounter.__table__,
+    "combats": Combat.__table__,
+    "combat_rounds": CombatRound.__table__,
+    "sheet_events": SheetEvent.__table__,
+    "paragraph_visits": ParagraphVisit.__table__,
+}
+
+# Colonnes non archivées : anciens champs JSON (vidés par les migrations) et session de combat
+ARCHIVE_EXCLUDED_COLUMNS = {
+    "adventure_sheets": {"monster_encounters", "active_combats", "combat_history"},
+    "combats": {"session_id"},
+}
+
+
+def resolve_codec(codec: str | None = None) -> str:
+    """Retourne le codec de compression à utiliser ("zstd" ou "zlib").
+
+    Args:
+        codec: "auto", "zlib" ou "zstd" (défaut: `settings.archive_codec`)
+
+    Raises:
+        ValueError: Si zstd est demandé sans le paquet zstandard
+    """
+    codec = codec or settings.archive_codec
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("Le codec zstd nécessite le paquet zstandard")
+    return codec
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compresse des données avec le codec donné."""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, level=9)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Décompresse des données compressées par `compress`."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Cette archive est compressée en zstd : installez le paquet zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def archived_columns(name: str) -> list[Column]:
+    """Colonnes d'une table conservées dans l'archive."""
+    excluded = ARCHIVE_EXCLUDED_COLUMNS.get(name, set())
+    return [column for column in ARCHIVED_TABLES[name].columns if column.name not in excluded]
+
+
+def _collect_payloads(db: Session, sheet_ids: list[int]) -> dict[int, dict[str, list[dict]]]:
+    """Lit les lignes de chaque feuille et de ses dépendances, regroupées par feuille puis par table."""
+    payloads: dict[int, dict[str, list[dict]]] = {
+        sheet_id: {name: [] for name in ARCHIVED_TABLES} for sheet_id in sheet_ids
+    }
+    conditions = {
+        "adventure_sheets": AdventureSheet.id.in_(sheet_ids),
+        "encounters": Encounter.sheet_id.in_(sheet_ids),
+        "combats": Combat.sheet_id.in_(sheet_ids),
+        "sheet_events": SheetEvent.sheet_id.in_(sheet_ids),
+        "paragraph_visits": ParagraphVisit.sheet_id.in_(sheet_ids),
+    }
+
+    for name, table in ARCHIVED_TABLES.items():
+        if name == "combat_rounds":
+            query = (
+                select(*archived_columns(name), Combat.sheet_id.label("_sheet_id"))
+                .join(Combat, Combat.id == CombatRound.combat_id)
+                .where(Combat.sheet_id.in_(sheet_ids))
+            )
+        else:
+            query = select(*archived_columns(name)).where(conditions[name])
+
+        for row in db.execute(query.order_by(table.c.id)).mappings():
+            values = dict(row)
+            if name == "adventure_sheets":
+                sheet_id = values["id"]
+            elif name == "combat_rounds":
+                sheet_id = values.pop("_sheet_id")
+            else:
+                sheet_id = values["sheet_id"]
+            payloads[sheet_id][name].append(values)
+
+    return payloads
+
+
+def archive_finished_sheets(db: Session, older_than_days: int | None = None, codec: str | None = None) -> int:
+    """Archive les feuilles terminées dont la dernière modification date de plus de `older_than_days` jours.
+
+    Les feuilles avec un combat en cours côté serveur ne sont pas archivées. Chaque
+    lot est archivé dans sa propre transaction ; une feuille modifiée pendant
+    l'archivage (date de mise à jour plus récente) est ignorée.
+
+    Args:
+        db: Session de base de données
+        older_than_days: Âge minimal en jours (défaut: `settings.archive_after_days`)
+        codec: Codec de compression (défaut: `settings.archive_codec`)
+
+    Returns:
+        Nombre de feuilles archivées
+    """
+    if older_than_days is None:
+        older_than_days = settings.archive_after_days
+    codec = resolve_codec(codec)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    eligible = (
+        AdventureSheet.is_active.is_(False),
+        AdventureSheet.updated_at < cutoff,
+        ~exists().where(
+            Combat.sheet_id == AdventureSheet.id, Combat.is_active.is_(True), Combat.session_id.isnot(None)
+        ),
+    )
+
+    archived = 0
+    last_id = 0
+    try:
+        while True:
+            sheet_ids = db.scalars(
+                select(AdventureSheet.id)
+                .where(AdventureSheet.id > last_id, *eligible)
+                .order_by(AdventureSheet.id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            ).all()
+            if not sheet_ids:
+                break
+            last_id = sheet_ids[-1]
+
+            payloads = _collect_payloads(db, sheet_ids)
+
+            # La suppression revérifie les conditions : une feuille modifiée entre-temps reste en place.
+            # Les rencontres, combats et rounds sont supprimés en cascade.
+            deleted = db.scalars(
+                delete(AdventureSheet).where(AdventureSheet.id.in_(sheet_ids), *eligible).returning(AdventureSheet.id)
+            ).all()
+            if deleted:
+                now = datetime.utcnow()
+                rows = []
+                for sheet_id in deleted:
+                    payload = payloads[sheet_id]
+                    sheet = payload["adventure_sheets"][0]
+                    data = json.dumps(payload, default=json_default, ensure_ascii=False).encode()
+                    rows.append(
+                        {
+                            "id": sheet_id,
+                            "book_id": sheet["book_id"],
+                            "attempt_number": sheet["attempt_number"],
+                            "character_name": sheet["character_name"],
+                            "codec": codec,
+                            "payload": compress(data, codec),
+                            "created_at": sheet["created_at"],
+                            "updated_at": sheet["updated_at"],
+                            "archived_at": now,
+                        }
+                    )
+                db.execute(insert(ArchivedSheet), rows)
+            db.commit()
+            archived += len(deleted)
+    except Exception:
+        db.rollback()
+        raise
+
+    return archived
+
+
+def decode_archive(archive: ArchivedSheet) -> dict[str, list[dict]]:
+    """Décompresse le contenu d'une feuille archivée : lignes JSON par table."""
+    return json.loads(decompress(archive.payload, archive.codec))
+
+
+def load_archived_sheet(db: Session, sheet_id: int) -> dict[str, list[dict]] | None:
+    """Retourne le contenu d'une feuille archivée, ou None si elle n'est pas dans l'archive."""
+    archive = db.get(ArchivedSheet, sheet_id)
+    return decode_archive(archive) if archive is not None else None
+
+
+def restore_archived_sheet(db: Session, sheet_id: int) -> bool:
+    """Remet une feuille archivée (avec ses rencontres, combats et rounds) dans les tables courantes.
+
+    La feuille prend la date de la restauration comme date de mise à jour : elle
+    n'est pas réarchivée avant `archive_after_days` jours. Les colonnes de
+    l'archive qui n'existent plus dans le schéma sont ignorées.
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+
+    Returns:
+        True si la feuille était archivée
+
+    Raises:
+        ValueError: Si l'archive contient une valeur illisible (date invalide)
+    """
+    archive = db.get(ArchivedSheet, sheet_id)
+    if archive is None:
+        return False
+
+    payload = decode_archive(archive)
+    for sheet in payload.get("adventure_sheets", []):
+        sheet["updated_at"] = datetime.utcnow()
+    try:
+        db.delete(archive)
+        db.flush()
+        for name, table in ARCHIVED_TABLES.items():
+            rows = [
+                table_row_from_json(table, {key: value for key, value in row.items() if key in table.c})
+                for row in payload.get(name, [])
+            ]
+            if rows:
+                db.execute(insert(table), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return True
+
+
+def iter_archive_payloads(
+    connection: Connection, batch_size: int = 1000, archive_filter: object = true()
+) -> Iterator[dict[str, list[dict]]]:
+    """Produit le contenu décompressé de chaque archive, une à une, sans tout charger en mémoire.
+
+    Args:
+        connection: Connexion de base de données
+        batch_size: Nombre d'archives lues par lot
+        archive_filter: Condition sur ArchivedSheet sélectionnant les archives lues (toutes par défaut)
+
+    Yields:
+        Lignes JSON par table d'une archive
+    """
+    result = connection.execution_options(yield_per=batch_size).execute(
+        select(ArchivedSheet.codec, ArchivedSheet.payload).where(archive_filter).order_by(ArchivedSheet.id)
+    )
+    for codec, data in result:
+        yield json.loads(decompress(data, codec))
+
+
+def iter_archived_rows(
+    connection: Connection, name: str, batch_size: int = 1000, archive_filter: object = true()
+) -> Iterator[dict]:
+    """Produit les lignes d'une table contenues dans l'archive, sans tout charger en mémoire.
+
+    Args:
+        connection: Connexion de base de données
+        name: Nom d'une table de ARCHIVED_TABLES
+        batch_size: Nombre d'archives lues par lot
+        archive_filter: Condition sur ArchivedSheet sélectionnant les archives lues (toutes par défaut)
+
+    Yields:
+        Lignes JSON de la table
+    """
+    for payload in iter_archive_payloads(connection, batch_size, archive_filter):
+        yield from payload.get(name, [])
+
+
+def vacuum_database(engine: Engine) -> None:
+    """Reconstruit le fichier SQLite pour rendre au système la place libérée par l'archivage."""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+        if engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def main() -> None:
+    """Point d'entrée en ligne de commande."""
+    from .database import SessionLocal, create_tables, engine
+    from .migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Archive les feuilles d'aventure terminées")
+    parser.add_argument("--older-than-days", type=int, default=settings.archive_after_days)
+    parser.add_argument("--codec", choices=["auto", "zlib", "zstd"], default=settings.archive_codec)
+    parser.add_argument("--vacuum", action="store_true", help="Réduit le fichier de la base après l'archivage")
+    args = parser.parse_args()
+
+    create_tables()
+    run_migrations()
+
+    db = SessionLocal()
+    try:
+        archived = archive_finished_sheets(db, args.older_than_days, args.codec)
+    finally:
+        db.close()
+    print(f"{archived} feuille(s) archivée(s) ({resolve_codec(args.codec)})")
+
+    if args.vacuum:
+        vacuum_database(engine)
+        print("Base de données compactée")
+
+
+if __name__ == "__main__":
+    main()
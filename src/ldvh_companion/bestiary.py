@@ -0,0 +1,201 @@
+"""Bestiaire : monstres déjà rencontrés dans chaque livre, proposés pendant la saisie.
+
+Chaque rencontre ou combat saisi ajoute son monstre (nom, Habileté, Endurance,
+paragraphe) au bestiaire du livre, ou incrémente son compteur s'il y est déjà :
+les entrées sont dédoublonnées par un index unique sur le nom normalisé et les
+statistiques. La suggestion pendant la saisie est un parcours de plage de cet
+index (`name_key` entre le préfixe et le préfixe suivant), sans lire le reste
+du bestiaire.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .archive import iter_archived_rows
+from .models import AdventureSheet, ArchivedSheet, Combat, Encounter, Monster, MonsterSuggestion
+from .utils import normalize_monster_name
+
+# Colonnes de l'index unique uq_monsters_signature (cible du ON CONFLICT)
+MONSTER_SIGNATURE = (
+    Monster.book_id,
+    Monster.name_key,
+    func.coalesce(Monster.skill, literal_column("-1")),
+    func.coalesce(Monster.stamina, literal_column("-1")),
+    func.coalesce(Monster.paragraph, literal_column("-1")),
+)
+
+# Nombre maximal de suggestions
+MAX_SUGGESTIONS = 50
+
+Signature = tuple[int, str, int | None, int | None, int | None]
+
+
+def _signature(
+    book_id: int, name: str | None, skill: int | None, stamina: int | None, paragraph: int | None
+) -> Signature | None:
+    """Clé de dédoublonnage d'un monstre, ou None si le nom est vide."""
+    name = " ".join((name or "").split())
+    if not name:
+        return None
+    return book_id, name, skill, stamina, paragraph
+
+
+def _row(signature: Signature, use_count: int, now: datetime) -> dict:
+    """Ligne de la table monsters pour une clé de dédoublonnage."""
+    book_id, name, skill, stamina, paragraph = signature
+    return {
+        "book_id": book_id,
+        "name": name,
+        "name_key": normalize_monster_name(name),
+        "skill": skill,
+        "stamina": stamina,
+        "paragraph": paragraph,
+        "use_count": use_count,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def record_monster(
+    db: Session,
+    sheet_id: int,
+    name: str | None,
+    skill: int | None = None,
+    stamina: int | None = None,
+    paragraph: int | None = None,
+) -> None:
+    """Ajoute un monstre saisi sur une feuille au bestiaire de son livre (sans valider la transaction).
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille où le monstre a été saisi
+        name: Nom du monstre (ignoré s'il est vide)
+        skill: Habileté
+        stamina: Endurance
+        paragraph: Paragraphe de la rencontre
+    """
+    book_id = db.scalar(select(AdventureSheet.book_id).where(AdventureSheet.id == sheet_id))
+    signature = _signature(book_id, name, skill, stamina, paragraph) if book_id is not None else None
+    if signature is None:
+        return
+
+    now = datetime.utcnow()
+    statement = sqlite_insert(Monster).values(_row(signature, 1, now))
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=list(MONSTER_SIGNATURE),
+            set_={"use_count": Monster.use_count + 1, "updated_at": now},
+        )
+    )
+
+
+def rebuild_bestiary(db: Session) -> int:
+    """Reconstruit le bestiaire en dédoublonnant les rencontres et les combats, courants et archivés.
+
+    Le nom gardé pour un monstre est celui de sa première saisie.
+
+    Args:
+        db: Session de base de données (validée en cas de succès, annulée sinon)
+
+    Returns:
+        Nombre de monstres du bestiaire
+    """
+    counts: Counter[tuple] = Counter()
+    names: dict[tuple, Signature] = {}
+
+    def add(signature: Signature | None) -> None:
+        if signature is None:
+            return
+        book_id, name, *stats = signature
+        key = (book_id, normalize_monster_name(name), *stats)
+        names.setdefault(key, signature)
+        counts[key] += 1
+
+    try:
+        encounters = db.execute(
+            select(AdventureSheet.book_id, Encounter.name, Encounter.skill, Encounter.stamina, Encounter.paragraph)
+            .join(AdventureSheet, AdventureSheet.id == Encounter.sheet_id)
+            .order_by(Encounter.id)
+        )
+        for row in encounters:
+            add(_signature(*row))
+
+        combats = db.execute(
+            select(AdventureSheet.book_id, Combat.monster_name, Combat.monster_skill, Combat.monster_max_stamina)
+            .join(AdventureSheet, AdventureSheet.id == Combat.sheet_id)
+            .order_by(Combat.id)
+        )
+        for book_id, name, skill, stamina in combats:
+            add(_signature(book_id, name, skill, stamina, None))
+
+        # Feuilles archivées : livre de chaque feuille, puis ses rencontres et ses combats
+        connection = db.connection()
+        sheet_books = {sheet["id"]: sheet["book_id"] for sheet in iter_archived_rows(connection, "adventure_sheets")}
+        for encounter in iter_archived_rows(connection, "encounters"):
+            add(
+                _signature(
+                    sheet_books[encounter["sheet_id"]],
+                    encounter["name"],
+                    encounter["skill"],
+                    encounter["stamina"],
+                    encounter["paragraph"],
+                )
+            )
+        for combat in iter_archived_rows(connection, "combats"):
+            add(
+                _signature(
+                    sheet_books[combat["sheet_id"]],
+                    combat["monster_name"],
+                    combat["monster_skill"],
+                    combat["monster_max_stamina"],
+                    None,
+                )
+            )
+
+        now = datetime.utcnow()
+        db.execute(delete(Monster))
+        if counts:
+            db.execute(insert(Monster), [_row(names[key], count, now) for key, count in counts.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(counts)
+
+
+def bestiary_empty(db: Session) -> bool:
+    """Indique si le bestiaire n'a jamais été rempli alors que des rencontres, des combats ou des archives existent."""
+    if db.scalar(select(Monster.id).limit(1)) is not None:
+        return False
+    sources = select(Encounter.id).union_all(select(Combat.id), select(ArchivedSheet.id))
+    return db.scalar(sources.limit(1)) is not None
+
+
+def suggest_monsters(db: Session, prefix: str, book_id: int | None = None, limit: int = 10) -> list[MonsterSuggestion]:
+    """Propose les monstres dont le nom commence par un préfixe, les plus saisis d'abord.
+
+    Args:
+        db: Session de base de données
+        prefix: Début du nom (casse et accents ignorés)
+        book_id: Livre du bestiaire (tous les livres par défaut)
+        limit: Nombre maximal de suggestions
+
+    Returns:
+        Monstres correspondants
+    """
+    key = normalize_monster_name(prefix)
+    query = select(Monster)
+    if key:
+        # Plage [préfixe, préfixe suivant) : parcours de l'index sur name_key
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        query = query.where(Monster.name_key >= key, Monster.name_key < upper)
+    if book_id is not None:
+        query = query.where(Monster.book_id == book_id)
+
+    rows = db.scalars(query.order_by(Monster.use_count.desc(), Monster.name_key, Monster.id).limit(limit))
+    return [MonsterSuggestion.model_validate(row) for row in rows]
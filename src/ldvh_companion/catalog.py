@@ -0,0 +1,108 @@
+"""Cache en mémoire du catalogue (séries et livres), en lecture traversante.
+
+Le catalogue change rarement mais est consulté à chaque validation (la série
+d'un livre existe-t-elle ?) et à chaque affichage de la page de jeu. Il est
+chargé en entier à la première lecture, puis servi depuis la mémoire tant que
+les versions des tables `series` et `books` (table `data_versions`, tenue à
+jour par des triggers) n'ont pas changé : une écriture faite par un autre
+worker est donc vue dès la lecture suivante. Les routes d'écriture du
+catalogue invalident en plus le cache local après leur commit.
+"""
+
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Book, BookResponse, CatalogCacheStats, Series, SeriesResponse
+from .stats import data_versions
+
+# Tables dont le catalogue est une copie
+CATALOG_TABLES = ("series", "books")
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Copie du catalogue à une version donnée des tables."""
+
+    versions: tuple[int, ...]
+    series: dict[int, SeriesResponse] = field(default_factory=dict)
+    books: dict[int, BookResponse] = field(default_factory=dict)
+    books_by_number: dict[tuple[int, int], BookResponse] = field(default_factory=dict)
+
+
+class CatalogCache:
+    """Cache des séries et des livres, validé par les versions stockées en base."""
+
+    def __init__(self) -> None:
+        """Initialise un cache vide ; il sera chargé à la première lecture."""
+        self._lock = threading.Lock()
+        self._snapshot: CatalogSnapshot | None = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _load(self, db: Session, versions: tuple[int, ...]) -> CatalogSnapshot:
+        """Lit tout le catalogue ; les versions ont été lues avant les données."""
+        series = {row.id: SeriesResponse.model_validate(row) for row in db.scalars(select(Series))}
+        books = {row.id: BookResponse.model_validate(row) for row in db.scalars(select(Book))}
+        books_by_number = {(book.series_id, book.book_number): book for book in books.values()}
+        return CatalogSnapshot(versions, series, books, books_by_number)
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        """Retourne la copie courante du catalogue, rechargée si les tables ont changé.
+
+        Args:
+            db: Session de base de données
+
+        Returns:
+            Copie du catalogue à jour
+        """
+        versions = data_versions(db, CATALOG_TABLES)
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.versions == versions:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+
+        snapshot = self._load(db, versions)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def get_series(self, db: Session, series_id: int) -> SeriesResponse | None:
+        """Retourne une série par son ID, ou None si elle n'existe pas."""
+        return self.snapshot(db).series.get(series_id)
+
+    def get_book(self, db: Session, book_id: int) -> BookResponse | None:
+        """Retourne un livre par son ID, ou None s'il n'existe pas."""
+        return self.snapshot(db).books.get(book_id)
+
+    def get_book_by_number(self, db: Session, series_id: int, book_number: int) -> BookResponse | None:
+        """Retourne le livre d'une série portant un numéro de tome, ou None."""
+        return self.snapshot(db).books_by_number.get((series_id, book_number))
+
+    def invalidate(self) -> None:
+        """Oublie la copie locale ; appelée après un commit qui modifie le catalogue."""
+        with self._lock:
+            self._snapshot = None
+            self.invalidations += 1
+
+    def stats(self) -> CatalogCacheStats:
+        """Retourne les compteurs du cache et la taille de la copie courante."""
+        with self._lock:
+            snapshot = self._snapshot
+            return CatalogCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                invalidations=self.invalidations,
+                loaded=snapshot is not None,
+                series_count=len(snapshot.series) if snapshot else 0,
+                book_count=len(snapshot.books) if snapshot else 0,
+            )
+
+
+# Instance globale du cache
+catalog = CatalogCache()
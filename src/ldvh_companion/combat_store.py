@@ -0,0 +1,168 @@
+"""Stockage côté serveur des combats en cours.
+
+Le client ne conserve qu'un identifiant de combat : l'état complet reste sur le
+serveur, ce qui allège les requêtes et empêche de falsifier l'état. Chaque
+enregistrement peut être conditionné au numéro de round de l'état remplacé :
+deux requêtes concurrentes sur le même combat ne peuvent pas toutes les deux
+faire avancer le combat depuis le même état. Deux modes sont disponibles :
+
+- "memory" : dictionnaire en mémoire du processus, avec éviction LRU et TTL
+- "database" : table `combat_sessions`, partagée entre les workers uvicorn
+"""
+
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+
+from .config import settings
+from .database import SessionLocal
+from .models import CombatSession, CombatState
+
+
+def new_combat_id() -> str:
+    """Génère un identifiant de combat aléatoire et difficile à deviner."""
+    return secrets.token_hex(16)
+
+
+class CombatStore(ABC):
+    """Interface commune des stockages de combats."""
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, combat_id: str) -> tuple[int, CombatState] | None:
+        """Retourne (id de la feuille, état du combat), ou None si absent ou expiré."""
+
+    @abstractmethod
+    def save(self, sheet_id: int, state: CombatState, expected_round: int | None = None) -> bool:
+        """Enregistre l'état d'un combat et repousse son expiration.
+
+        Args:
+            sheet_id: ID de la feuille du combat
+            state: Nouvel état du combat
+            expected_round: Si fourni, n'enregistre l'état que si le combat stocké en est à ce round
+
+        Returns:
+            False si le combat stocké a changé (ou a disparu) depuis sa lecture
+        """
+
+    @abstractmethod
+    def delete(self, combat_id: str) -> None:
+        """Supprime un combat."""
+
+
+class MemoryCombatStore(CombatStore):
+    """Stockage en mémoire du processus, borné en taille (LRU) et en durée (TTL)."""
+
+    def __init__(self, ttl_seconds: int, max_count: int) -> None:
+        super().__init__(ttl_seconds)
+        self.max_count = max_count
+        self._combats: OrderedDict[str, tuple[int, CombatState, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, combat_id: str) -> tuple[int, CombatState] | None:
+        with self._lock:
+            entry = self._combats.get(combat_id)
+            if entry is None:
+                return None
+
+            sheet_id, state, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._combats[combat_id]
+                return None
+
+            self._combats.move_to_end(combat_id)
+            return sheet_id, state
+
+    def save(self, sheet_id: int, state: CombatState, expected_round: int | None = None) -> bool:
+        with self._lock:
+            if expected_round is not None:
+                entry = self._combats.get(state.combat_id)
+                if entry is None or entry[1].round_number != expected_round:
+                    return False
+
+            self._combats[state.combat_id] = (sheet_id, state, time.monotonic() + self.ttl_seconds)
+            self._combats.move_to_end(state.combat_id)
+
+            # Éviction des combats les moins récemment utilisés
+            while len(self._combats) > self.max_count:
+                self._combats.popitem(last=False)
+            return True
+
+    def delete(self, combat_id: str) -> None:
+        with self._lock:
+            self._combats.pop(combat_id, None)
+
+
+class DatabaseCombatStore(CombatStore):
+    """Stockage dans la table `combat_sessions`, partagé entre les workers."""
+
+    def get(self, combat_id: str) -> tuple[int, CombatState] | None:
+        db = SessionLocal()
+        try:
+            session = (
+                db.query(CombatSession)
+                .filter(CombatSession.id == combat_id, CombatSession.expires_at >= datetime.utcnow())
+                .first()
+            )
+            if session is None:
+                return None
+            return session.sheet_id, CombatState.model_validate_json(session.state)
+        finally:
+            db.close()
+
+    def save(self, sheet_id: int, state: CombatState, expected_round: int | None = None) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        db = SessionLocal()
+        try:
+            # Purger les combats expirés au passage
+            db.query(CombatSession).filter(CombatSession.expires_at < now).delete(synchronize_session=False)
+            if expected_round is None:
+                db.merge(
+                    CombatSession(
+                        id=state.combat_id, sheet_id=sheet_id, state=state.model_dump_json(), expires_at=expires_at
+                    )
+                )
+            else:
+                # Comparaison et remplacement en une seule requête
+                replaced = db.execute(
+                    update(CombatSession)
+                    .where(
+                        CombatSession.id == state.combat_id,
+                        func.json_extract(CombatSession.state, "$.round_number") == expected_round,
+                    )
+                    .values(state=state.model_dump_json(), expires_at=expires_at)
+                ).rowcount
+                if not replaced:
+                    db.rollback()
+                    return False
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    def delete(self, combat_id: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(CombatSession).filter(CombatSession.id == combat_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_combat_store() -> CombatStore:
+    """Crée le stockage de combats selon la configuration."""
+    if settings.combat_store == "database":
+        return DatabaseCombatStore(settings.combat_session_ttl_seconds)
+    return MemoryCombatStore(settings.combat_session_ttl_seconds, settings.combat_session_max_count)
+
+
+# Instance globale du stockage des combats
+combat_store = create_combat_store()
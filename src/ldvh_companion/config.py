@@ -1,5 +1,7 @@
 """Configuration de l'application LDVH Companion."""
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -14,10 +16,59 @@ class Settings(BaseSettings):
     # Configuration de la base de données
     database_url: str = "sqlite:///./ldvh_companion.db"
 
+    # Pools de connexions : chacun doit pouvoir servir thread_pool_size connexions
+    # (taille + débordement), sinon les threads qui attendent une connexion empêchent
+    # la fermeture des sessions qui la libéreraient.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+
+    # Pool en lecture seule des routes GET (même débordement), 0 pour utiliser le pool principal
+    db_read_pool_size: int = 5
+
+    # Réglages SQLite appliqués à chaque connexion
+    sqlite_journal_mode: Literal["wal", "delete", "truncate", "persist", "memory"] = "wal"
+    sqlite_synchronous: Literal["off", "normal", "full", "extra"] = "normal"
+    sqlite_busy_timeout_ms: int = 5000
+    # Cache de pages par connexion : multiplié par le nombre de connexions des deux pools
+    sqlite_cache_size_kib: int = 4096
+    sqlite_mmap_size_bytes: int = 268435456
+
+    # Sessions de combat côté serveur ("memory" ou "database" pour partager entre workers)
+    combat_store: str = "memory"
+    combat_session_ttl_seconds: int = 3600
+    combat_session_max_count: int = 10000
+
+    # Cache HTTP : durée (secondes) pendant laquelle le navigateur réutilise séries et
+    # livres sans revalider ; 0 pour revalider à chaque lecture (réponse 304 si inchangé)
+    catalog_cache_max_age: int = 0
+
+    # Catalogue de départ (série "Défis fantastiques", tomes 1 à 3) créé au démarrage dans une base vide ;
+    # à désactiver avant de restaurer un export avec les identifiants d'origine (import mode=keep)
+    seed_catalog: bool = True
+
+    # Archivage des feuilles terminées depuis plus de archive_after_days jours
+    # (codec "auto" : zstd si le paquet zstandard est installé, sinon zlib)
+    archive_after_days: int = 30
+    archive_codec: Literal["auto", "zlib", "zstd"] = "auto"
+
+    # Journal des feuilles d'aventure : un instantané de la feuille tous les N événements
+    sheet_snapshot_interval: int = 50
+
+    # Dés : graine maîtresse des flux des feuilles et du flux global, dont les combats tirent leur graine
+    # (mêlée à un nonce propre au processus : chaque lancer se rejoue par sa graine et sa position ;
+    # aléatoire si absente)
+    dice_seed: int | None = None
+
     # Configuration du serveur
     host: str = "0.0.0.0"
     port: int = 8000
 
+    # Nombre de threads exécutant les routes synchrones (accès à la base de données).
+    # Au plus db_pool_size + db_max_overflow : au-delà, les requêtes attendraient
+    # une connexion au lieu d'attendre un thread.
+    thread_pool_size: int = 15
+
     # Sécurité
     secret_key: str | None = None
     environment: str = "development"
@@ -1,20 +1,115 @@
 """Configuration de la base de données et gestion des sessions."""
 
-import os
 from collections.abc import Generator
+from typing import Any
+from urllib.parse import quote
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
 
-# Configuration de la base de données
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ldvh_companion.db")
-
-# Création du moteur de base de données
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+from .config import settings
 
-# Création de la session
+# Configuration de la base de données
+DATABASE_URL = settings.database_url
+
+
+def _is_file_sqlite(url: str) -> bool:
+    """Indique si l'URL désigne une base SQLite stockée dans un fichier."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _read_only_url(url: str) -> URL:
+    """URL SQLite ouvrant le même fichier en lecture seule (URI `mode=ro`).
+
+    Le chemin est encodé pour l'URI `file:` : un espace, `?`, `#` ou `%` dans le nom
+    du fichier ne sont pas lus comme des séparateurs.
+    """
+    parsed = make_url(url)
+    return parsed.set(database=f"file:{quote(parsed.database)}", query={"mode": "ro", "uri": "true"})
+
+
+def _apply_sqlite_pragmas(engine: Engine, read_only: bool) -> None:
+    """Applique les réglages SQLite à chaque nouvelle connexion du moteur."""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # WAL : les lectures ne bloquent plus les écritures (réglage persistant dans le fichier)
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_bytes)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+def _enable_foreign_keys(engine: Engine) -> None:
+    """Active les clés étrangères SQLite (suppressions en cascade) sur chaque nouvelle connexion."""
+
+    @event.listens_for(engine, "connect")
+    def set_foreign_keys(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def create_db_engine(url: str | None = None, read_only: bool = False) -> Engine:
+    """Crée un moteur de base de données selon la configuration.
+
+    Pour SQLite, les clés étrangères sont activées sur chaque connexion. Pour
+    une base dans un fichier, les pragmas de production (WAL, busy_timeout,
+    synchronous, cache, mmap) sont aussi appliqués et le pool de connexions est
+    dimensionné par les paramètres `db_*`.
+
+    Args:
+        url: URL de la base de données (défaut: `settings.database_url`)
+        read_only: Ouvrir la base en lecture seule (SQLite dans un fichier uniquement)
+
+    Returns:
+        Moteur SQLAlchemy
+    """
+    url = url or settings.database_url
+    pool_options = {
+        "pool_size": settings.db_read_pool_size if read_only else settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url, **pool_options)
+
+    if not _is_file_sqlite(url):
+        # Base en mémoire : propre à une connexion, pas de pool ni de lecture seule
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        _enable_foreign_keys(engine)
+        return engine
+
+    engine = create_engine(
+        _read_only_url(url) if read_only else url, connect_args={"check_same_thread": False}, **pool_options
+    )
+    _enable_foreign_keys(engine)
+    _apply_sqlite_pragmas(engine, read_only)
+    return engine
+
+
+# Création du moteur de base de données (lectures et écritures)
+engine = create_db_engine(DATABASE_URL)
+
+# Moteur dédié aux lectures, avec son propre pool de connexions
+read_engine = (
+    create_db_engine(DATABASE_URL, read_only=True)
+    if settings.db_read_pool_size > 0 and _is_file_sqlite(DATABASE_URL)
+    else engine
+)
+
+# Création des sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Base pour les modèles
 Base = declarative_base()
@@ -29,6 +124,26 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_read_db() -> Generator[Session, None, None]:
+    """Générateur pour obtenir une session en lecture seule, servie par le pool de lecture."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def begin_write(db: Session) -> None:
+    """Ouvre la transaction de la session en prenant tout de suite le verrou d'écriture (BEGIN IMMEDIATE).
+
+    Les lectures faites ensuite dans la transaction voient un état qu'aucun autre
+    writer ne peut modifier avant le commit : une décision prise d'après ces
+    lectures (lot à migrer, compteurs à corriger) n'est pas prise deux fois.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+
 def create_tables() -> None:
     """Crée toutes les tables de la base de données."""
     from .models import Base
@@ -37,9 +152,12 @@ def create_tables() -> None:
 
 
 def init_db() -> None:
-    """Initialise la base de données avec des données de base."""
+    """Initialise la base de données avec des données de base (sauf si SEED_CATALOG=false)."""
     from .models import Book, Series
 
+    if not settings.seed_catalog:
+        return
+
     db = SessionLocal()
     try:
         # Vérifier si des séries existent déjà
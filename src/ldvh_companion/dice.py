@@ -0,0 +1,191 @@
+"""Service de dés à flux déterministes et rejouables.
+
+Chaque feuille d'aventure ou combat dispose de son propre flux de dés, défini
+par une graine. Les tirages sont pré-calculés par blocs : le bloc n d'un flux
+est produit par un générateur NumPy initialisé avec (graine, n), ce qui permet
+de se repositionner à n'importe quelle position sans rejouer les tirages
+précédents. La graine et la position suffisent donc à rejouer exactement
+n'importe quelle séquence de lancers (litiges, débogage).
+
+Chaque flux a son propre verrou : des requêtes concurrentes sur des flux
+différents ne se bloquent pas mutuellement. Une requête qui lance plusieurs
+séries de dés réserve le flux le temps de ses lancers (`reserve`) : ils sont
+contigus et la position retournée est bien celle du premier.
+
+Les flux dérivés (combats) tirent leur graine dans le flux de leur feuille. Avec
+une graine maîtresse (DICE_SEED), les graines des flux nommés en sont dérivées,
+mêlées à un nonce propre au processus et au rang de création du flux : la
+position d'un flux n'est gardée qu'en mémoire, et un flux recréé (après éviction
+du cache, redémarrage, ou dans un autre worker) ne doit pas rejouer les tirages
+déjà donnés. Un lancer se rejoue toujours par sa graine et sa position.
+"""
+
+import logging
+import secrets
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Nombre de tirages pré-calculés par bloc (fait partie du format de rejeu : ne pas modifier)
+DICE_BLOCK_SIZE = 1024
+
+# Nombre maximal de flux gardés en mémoire
+MAX_CACHED_STREAMS = 4096
+
+# Les graines tiennent sur 53 bits pour rester exactes dans les nombres JavaScript
+SEED_BITS = 53
+
+
+def new_seed() -> int:
+    """Génère une graine aléatoire."""
+    return secrets.randbits(SEED_BITS)
+
+
+class DiceStream:
+    """Flux de dés déterministe, identifié par une graine et une position."""
+
+    def __init__(self, seed: int, offset: int = 0) -> None:
+        self.seed = seed
+        self.offset = offset  # Nombre de tirages déjà consommés
+        self._lock = threading.RLock()  # Réentrant : `reserve` englobe des appels à `roll_array`
+        self._block_index = -1
+        self._buffer = np.empty(0)
+
+    def _load_block(self, block_index: int) -> None:
+        """Remplit le tampon avec le bloc de tirages demandé."""
+        generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence([self.seed, block_index])))
+        self._buffer = generator.random(DICE_BLOCK_SIZE)
+        self._block_index = block_index
+
+    def _draw(self, count: int) -> np.ndarray:
+        """Consomme `count` tirages uniformes dans [0, 1)."""
+        values = np.empty(count)
+        filled = 0
+        while filled < count:
+            block_index, position = divmod(self.offset, DICE_BLOCK_SIZE)
+            if block_index != self._block_index:
+                self._load_block(block_index)
+
+            taken = min(count - filled, DICE_BLOCK_SIZE - position)
+            values[filled : filled + taken] = self._buffer[position : position + taken]
+            filled += taken
+            self.offset += taken
+        return values
+
+    def roll_array(self, dice_count: int, sides: int = 6) -> np.ndarray:
+        """Lance des dés en bloc et retourne les résultats dans un tableau NumPy.
+
+        Args:
+            dice_count: Nombre de dés à lancer
+            sides: Nombre de faces par dé
+
+        Returns:
+            Tableau des résultats des dés
+        """
+        with self._lock:
+            offset = self.offset
+            rolls = (self._draw(dice_count) * sides).astype(np.int64) + 1
+
+        logger.debug("Dés %dd%d seed=%d offset=%d", dice_count, sides, self.seed, offset)
+        return rolls
+
+    @contextmanager
+    def reserve(self) -> Iterator[int]:
+        """Réserve le flux pour une suite de lancers contigus.
+
+        Returns:
+            Position du premier tirage de la suite
+        """
+        with self._lock:
+            yield self.offset
+
+    def derive_seed(self) -> int:
+        """Tire dans ce flux la graine d'un flux dérivé, reproductible si ce flux l'est."""
+        with self._lock:
+            return int(self._draw(1)[0] * (1 << SEED_BITS))
+
+    def roll(self, dice_count: int, sides: int = 6) -> list[int]:
+        """Lance des dés et retourne chaque résultat.
+
+        Args:
+            dice_count: Nombre de dés à lancer
+            sides: Nombre de faces par dé
+
+        Returns:
+            Liste des résultats des dés
+        """
+        return self.roll_array(dice_count, sides).tolist()
+
+
+class DiceService:
+    """Registre des flux de dés nommés ("sheet:12", "combat:<id>", ...)."""
+
+    def __init__(self, master_seed: int | None = None, nonce: int | None = None) -> None:
+        """Initialise un registre vide.
+
+        Args:
+            master_seed: Graine maîtresse (graines aléatoires si absente)
+            nonce: Nonce mêlé à la graine maîtresse (aléatoire par défaut, donc propre au processus)
+        """
+        self.master_seed = master_seed
+        self.nonce = nonce if nonce is not None else new_seed()
+        self._streams: OrderedDict[str, DiceStream] = OrderedDict()
+        self._created = 0  # Nombre de flux créés par ce registre
+        self._lock = threading.Lock()
+
+    def _seed_for(self, name: str) -> int:
+        """Graine d'un nouveau flux : dérivée de la graine maîtresse si configurée, aléatoire sinon."""
+        if self.master_seed is None:
+            return new_seed()
+        self._created += 1
+        sequence = np.random.SeedSequence([self.master_seed, zlib.crc32(name.encode()), self.nonce, self._created])
+        return int(sequence.generate_state(1, np.uint64)[0] >> (64 - SEED_BITS))
+
+    def stream(self, name: str, seed: int | None = None, offset: int = 0) -> DiceStream:
+        """Retourne le flux nommé, en le créant si besoin.
+
+        Args:
+            name: Nom du flux
+            seed: Graine imposée (ex. stockée dans un combat), sinon graine du registre
+            offset: Position imposée, utilisée avec `seed`
+
+        Returns:
+            Flux de dés positionné
+        """
+        with self._lock:
+            stream = self._streams.get(name)
+            if stream is not None and (seed is None or (stream.seed == seed and stream.offset == offset)):
+                self._streams.move_to_end(name)
+                return stream
+
+            if seed is None:
+                seed = self._seed_for(name)
+                logger.info("Nouveau flux de dés %s seed=%d", name, seed)
+            stream = DiceStream(seed, offset)
+            self._streams[name] = stream
+
+            while len(self._streams) > MAX_CACHED_STREAMS:
+                self._streams.popitem(last=False)
+            return stream
+
+
+# Instance globale du service de dés
+dice_service = DiceService(settings.dice_seed)
+
+
+def default_stream() -> DiceStream:
+    """Flux utilisé quand aucun flux particulier n'est demandé."""
+    return dice_service.stream("global")
+
+
+def sheet_stream(sheet_id: int) -> DiceStream:
+    """Flux de dés propre à une feuille d'aventure."""
+    return dice_service.stream(f"sheet:{sheet_id}")
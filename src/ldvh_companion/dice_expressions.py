@@ -0,0 +1,339 @@
+"""Expressions de dés : analyse, évaluation en bloc et distributions exactes.
+
+Syntaxe acceptée : des termes séparés par `+` ou `-`, chaque terme étant une
+constante (`2`), un groupe de dés (`3d6`, `d20`) ou un groupe de dés dont on
+ne garde que les meilleurs ou les pires (`4d6kh3`, `2d20kl1`).
+Exemples : `3d6+2`, `4d6kh3`, `2d6-1d6`.
+
+Une expression est analysée une seule fois (cache LRU) en une forme compilée,
+dont la distribution exacte est elle aussi mise en cache.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+from .dice import DiceStream
+
+# Limites pour éviter les expressions démesurées
+MAX_TERMS = 10
+MAX_DICE_PER_TERM = 100
+MAX_SIDES = 1000
+MAX_CONSTANT = 10**9
+
+# Nombre maximal de dés lancés par bloc d'un tirage massif (mémoire d'un bloc : ~16 octets par dé)
+MAX_BULK_DICE_PER_CHUNK = 2_000_000
+
+# Travail maximal (états examinés × faces, environ 1 µs chacun) pour le calcul exact
+# des termes "garder les meilleurs/pires" d'une expression
+MAX_KEEP_WORK = 1_000_000
+
+# Travail maximal (produits des convolutions, environ 0,2 ns chacun) pour le calcul exact
+# d'une distribution
+MAX_CONVOLUTION_WORK = 500_000_000
+
+_TERM_PATTERN = re.compile(r"([+-])?(?:(\d*)d(\d+)(?:(kh|kl)(\d+))?|(\d+))")
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    """Groupe de dés d'une expression."""
+
+    sign: int  # 1 ou -1
+    count: int
+    sides: int
+    keep: int | None = None  # Nombre de dés gardés, None pour tous
+    keep_highest: bool = True
+
+    def __str__(self) -> str:
+        text = f"{self.count}d{self.sides}"
+        if self.keep is not None:
+            text += f"{'kh' if self.keep_highest else 'kl'}{self.keep}"
+        return text
+
+
+@dataclass(frozen=True)
+class CompiledDiceExpression:
+    """Forme compilée d'une expression de dés."""
+
+    terms: tuple[DiceTerm, ...]
+    constant: int
+
+    def __str__(self) -> str:
+        parts = []
+        for term in self.terms:
+            parts.append(("-" if term.sign < 0 else "+") + str(term))
+        if self.constant or not parts:
+            parts.append(f"{self.constant:+d}")
+        return "".join(parts).lstrip("+")
+
+    @property
+    def minimum(self) -> int:
+        """Plus petit résultat possible."""
+        low = self.constant
+        for term in self.terms:
+            kept = term.keep if term.keep is not None else term.count
+            low += kept if term.sign > 0 else -kept * term.sides
+        return low
+
+    @property
+    def maximum(self) -> int:
+        """Plus grand résultat possible."""
+        high = self.constant
+        for term in self.terms:
+            kept = term.keep if term.keep is not None else term.count
+            high += kept * term.sides if term.sign > 0 else -kept
+        return high
+
+
+def compile_expression(expression: str) -> CompiledDiceExpression:
+    """Analyse une expression de dés (résultat mis en cache).
+
+    Args:
+        expression: Expression telle que "3d6+2" ou "4d6kh3"
+
+    Returns:
+        Expression compilée
+
+    Raises:
+        ValueError: Si l'expression est invalide ou dépasse les limites
+    """
+    return _compile_normalized("".join(expression.lower().split()))
+
+
+@lru_cache(maxsize=256)
+def _compile_normalized(expression: str) -> CompiledDiceExpression:
+    """Analyse une expression déjà normalisée (minuscules, sans espaces)."""
+    if not expression:
+        raise ValueError("Expression de dés vide")
+
+    terms = []
+    constant = 0
+    position = 0
+    while position < len(expression):
+        match = _TERM_PATTERN.match(expression, position)
+        if match is None or match.end() == position or (position > 0 and match.group(1) is None):
+            raise ValueError(f"Expression de dés invalide : {expression!r}")
+        position = match.end()
+
+        sign_text, count_text, sides_text, keep_mode, keep_text, constant_text = match.groups()
+        sign = -1 if sign_text == "-" else 1
+
+        if constant_text is not None:
+            constant += sign * int(constant_text)
+            if abs(constant) > MAX_CONSTANT:
+                raise ValueError(f"Les constantes doivent être comprises entre -{MAX_CONSTANT} et {MAX_CONSTANT}")
+            continue
+
+        count = int(count_text) if count_text else 1
+        sides = int(sides_text)
+        keep = int(keep_text) if keep_text else None
+
+        if not 1 <= count <= MAX_DICE_PER_TERM:
+            raise ValueError(f"Le nombre de dés doit être compris entre 1 et {MAX_DICE_PER_TERM}")
+        if not 2 <= sides <= MAX_SIDES:
+            raise ValueError(f"Le nombre de faces doit être compris entre 2 et {MAX_SIDES}")
+        if keep is not None and not 1 <= keep <= count:
+            raise ValueError("Le nombre de dés gardés doit être compris entre 1 et le nombre de dés")
+
+        terms.append(DiceTerm(sign, count, sides, keep, keep_mode != "kl"))
+
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f"Une expression ne peut pas contenir plus de {MAX_TERMS} groupes de dés")
+
+    return CompiledDiceExpression(tuple(terms), constant)
+
+
+def _kept_sum(rolls: np.ndarray, term: DiceTerm) -> np.ndarray:
+    """Somme des dés gardés pour chaque ligne d'un tableau (lancers, dés)."""
+    if not _keeps_subset(term):
+        return rolls.sum(axis=1)
+
+    ordered = np.sort(rolls, axis=1)
+    kept = ordered[:, -term.keep :] if term.keep_highest else ordered[:, : term.keep]
+    return kept.sum(axis=1)
+
+
+def evaluate(compiled: CompiledDiceExpression, times: int, stream: DiceStream) -> tuple[np.ndarray, list[np.ndarray]]:
+    """Évalue une expression plusieurs fois en bloc.
+
+    Args:
+        compiled: Expression compilée
+        times: Nombre d'évaluations
+        stream: Flux de dés à utiliser
+
+    Returns:
+        Tuple (totaux de chaque évaluation, dés lancés pour chaque terme sous forme (évaluations, dés))
+    """
+    totals = np.full(times, compiled.constant, dtype=np.int64)
+    term_rolls = []
+    for term in compiled.terms:
+        rolls = stream.roll_array(term.count * times, term.sides).reshape(times, term.count)
+        totals += term.sign * _kept_sum(rolls, term)
+        term_rolls.append(rolls)
+
+    return totals, term_rolls
+
+
+def _keeps_subset(term: DiceTerm) -> bool:
+    """Indique si un terme ne garde qu'une partie de ses dés."""
+    return term.keep is not None and term.keep != term.count
+
+
+def _keep_work(term: DiceTerm) -> int:
+    """Travail de `_keep_counts` : pour chaque dé, états possibles (multi-ensembles des dés gardés) × faces."""
+    states = (comb(term.sides + min(dice, term.keep) - 1, min(dice, term.keep)) for dice in range(term.count))
+    return sum(states) * term.sides
+
+
+def _convolution_work(compiled: CompiledDiceExpression) -> int:
+    """Travail des convolutions de `distribution` : produit des longueurs des tableaux convolués."""
+    work = 0
+    length = 1
+    for term in compiled.terms:
+        if not _keeps_subset(term):
+            # Un dé de plus à chaque convolution du terme
+            work += sum((dice * (term.sides - 1) + 1) * term.sides for dice in range(term.count))
+        kept = term.keep if term.keep is not None else term.count
+        term_length = kept * (term.sides - 1) + 1
+        work += length * term_length
+        length += term_length - 1
+    return work
+
+
+def _keep_counts(term: DiceTerm) -> dict[int, int]:
+    """Nombre de combinaisons pour chaque somme d'un terme "garder K dés".
+
+    Programmation dynamique sur les K meilleurs (ou pires) dés vus jusqu'ici. Le
+    travail est borné avant de commencer, par MAX_KEEP_WORK.
+    """
+    if _keep_work(term) > MAX_KEEP_WORK:
+        raise ValueError(f"Distribution trop coûteuse à calculer pour {term}")
+
+    states: dict[tuple[int, ...], int] = {(): 1}
+    for _ in range(term.count):
+        next_states: dict[tuple[int, ...], int] = {}
+        for kept, ways in states.items():
+            for face in range(1, term.sides + 1):
+                candidate = sorted((*kept, face), reverse=term.keep_highest)[: term.keep]
+                key = tuple(candidate)
+                next_states[key] = next_states.get(key, 0) + ways
+        states = next_states
+
+    counts: dict[int, int] = {}
+    for kept, ways in states.items():
+        counts[sum(kept)] = counts.get(sum(kept), 0) + ways
+    return counts
+
+
+@lru_cache(maxsize=256)
+def _term_distribution(term: DiceTerm) -> tuple[int, np.ndarray]:
+    """Distribution d'un terme positif : (plus petite valeur, probabilités)."""
+    if not _keeps_subset(term):
+        single = np.full(term.sides, 1 / term.sides)
+        probabilities = np.ones(1)
+        for _ in range(term.count):
+            probabilities = np.convolve(probabilities, single)
+        return term.count, probabilities
+
+    counts = _keep_counts(term)
+    low = min(counts)
+    total = term.sides**term.count
+    probabilities = np.zeros(max(counts) - low + 1)
+    for value, ways in counts.items():
+        probabilities[value - low] = ways / total
+    return low, probabilities
+
+
+@lru_cache(maxsize=256)
+def distribution(compiled: CompiledDiceExpression) -> dict[int, float]:
+    """Distribution exacte des résultats d'une expression, par convolution.
+
+    Args:
+        compiled: Expression compilée
+
+    Returns:
+        Probabilité de chaque résultat possible
+
+    Raises:
+        ValueError: Si la distribution est trop coûteuse à calculer (travail borné avant de commencer)
+    """
+    keep_work = sum(_keep_work(term) for term in compiled.terms if _keeps_subset(term))
+    if keep_work > MAX_KEEP_WORK or _convolution_work(compiled) > MAX_CONVOLUTION_WORK:
+        raise ValueError(f"Distribution trop coûteuse à calculer pour {compiled}")
+
+    low = compiled.constant
+    probabilities = np.ones(1)
+    for term in compiled.terms:
+        term_low, term_probabilities = _term_distribution(term)
+        if term.sign < 0:
+            # Soustraire un terme revient à ajouter son opposé : on inverse sa distribution
+            term_low = -(term_low + len(term_probabilities) - 1)
+            term_probabilities = term_probabilities[::-1]
+        low += term_low
+        probabilities = np.convolve(probabilities, term_probabilities)
+
+    return {low + index: float(p) for index, p in enumerate(probabilities) if p > 0}
+
+
+def iter_bulk_samples(
+    expressions: dict[str, CompiledDiceExpression],
+    samples: int,
+    chunk_size: int,
+    stream: DiceStream,
+    histogram: bool = False,
+) -> Iterator[str]:
+    """Génère des échantillons en NDJSON, par blocs vectorisés et en mémoire constante.
+
+    Args:
+        expressions: Expressions compilées, par nom de colonne
+        samples: Nombre total d'échantillons
+        chunk_size: Nombre d'échantillons générés par bloc, réduit pour lancer au plus MAX_BULK_DICE_PER_CHUNK dés
+        stream: Flux de dés à utiliser
+        histogram: Émettre un histogramme cumulé après chaque bloc plutôt que les valeurs brutes
+
+    Yields:
+        Lignes NDJSON : une valeur (ou un objet par nom) par échantillon, ou un histogramme par bloc
+    """
+    counts = {
+        name: np.zeros(compiled.maximum - compiled.minimum + 1, dtype=np.int64)
+        for name, compiled in expressions.items()
+    }
+    single = len(expressions) == 1
+    generated = 0
+
+    dice_per_sample = sum(term.count for compiled in expressions.values() for term in compiled.terms)
+    chunk_size = max(1, min(chunk_size, MAX_BULK_DICE_PER_CHUNK // max(1, dice_per_sample)))
+
+    while generated < samples:
+        size = min(chunk_size, samples - generated)
+        totals = {name: evaluate(compiled, size, stream)[0] for name, compiled in expressions.items()}
+        generated += size
+
+        if not histogram:
+            if single:
+                yield "\n".join(map(str, next(iter(totals.values())).tolist())) + "\n"
+            else:
+                columns = [values.tolist() for values in totals.values()]
+                rows = zip(*columns, strict=True)
+                yield "".join(json.dumps(dict(zip(totals, row, strict=True))) + "\n" for row in rows)
+            continue
+
+        histograms = {}
+        for name, compiled in expressions.items():
+            counts[name] += np.bincount(totals[name] - compiled.minimum, minlength=counts[name].size)
+            histograms[name] = {
+                compiled.minimum + index: count for index, count in enumerate(counts[name].tolist()) if count
+            }
+
+        line = {"samples": generated, "done": generated == samples}
+        if single:
+            line["histogram"] = next(iter(histograms.values()))
+        else:
+            line["histograms"] = histograms
+        yield json.dumps(line) + "\n"
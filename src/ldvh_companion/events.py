@@ -0,0 +1,245 @@
+"""Journal des modifications des feuilles d'aventure.
+
+Chaque modification d'une feuille ajoute une ou plusieurs lignes à la table
+`sheet_events` : création, champ remplacé, statistique incrémentée, objet ou
+note ajouté, fin de combat. La ligne de `adventure_sheets` reste l'état courant
+de la feuille : c'est la projection du journal, mise à jour dans la même
+transaction que l'ajout des événements, et lue telle quelle par toutes les
+routes. Tous les `sheet_snapshot_interval` événements, l'état de la feuille est
+enregistré dans `sheet_snapshots` : l'état à un événement donné est reconstruit
+à partir de l'instantané précédent, sans rejouer tout le journal.
+
+Les rounds de combat sont déjà journalisés dans `combat_rounds` ; la feuille
+n'est modifiée qu'à la fin du combat, par un événement "combat" qui référence
+le combat.
+"""
+
+import json
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .analytics import count_sheets, forget_sheets
+from .config import settings
+from .database import begin_write
+from .models import AdventureSheet, AdventureSheetPatchOps, AdventureSheetUpdate, SheetEvent, SheetSnapshot
+from .utils import PATCH_APPEND_SEPARATORS, json_default
+
+# Champs de la feuille reconstruits à partir du journal (les autres ne changent jamais)
+SHEET_STATE_FIELDS = tuple(AdventureSheetUpdate.model_fields)
+
+
+def _dump(value: object) -> str:
+    """Sérialise une valeur d'événement ou d'instantané en JSON."""
+    return json.dumps(value, default=json_default, ensure_ascii=False)
+
+
+def current_sheet_state(db: Session, sheet_id: int) -> dict | None:
+    """Retourne les champs journalisés de la feuille telle qu'elle est en base, ou None si elle n'existe pas."""
+    columns = [getattr(AdventureSheet, field) for field in SHEET_STATE_FIELDS]
+    row = db.execute(select(*columns, AdventureSheet.updated_at).where(AdventureSheet.id == sheet_id)).first()
+    return row._asdict() if row is not None else None
+
+
+def is_snapshot_sequence(sequence: int) -> bool:
+    """Indique si l'état de la feuille est enregistré après l'événement de ce numéro (un tous les N événements)."""
+    interval = settings.sheet_snapshot_interval
+    return interval > 0 and sequence % interval == 0
+
+
+def record_sheet_events(db: Session, sheet_id: int, events: list[dict]) -> int:
+    """Ajoute des événements au journal d'une feuille, sans valider la transaction.
+
+    À appeler après la mise à jour de la feuille, dans la même transaction : la
+    feuille est alors verrouillée en écriture et l'instantané éventuel est pris
+    sur son état à jour.
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+        events: Événements {"kind", "field", "delta", "value", "combat_id"} (clés facultatives sauf "kind")
+
+    Returns:
+        Numéro du dernier événement de la feuille
+    """
+    # Les sessions n'écrivent pas automatiquement les modifications en attente (autoflush=False)
+    db.flush()
+    last_sequence = (
+        select(func.coalesce(func.max(SheetEvent.sequence), 0)).where(SheetEvent.sheet_id == sheet_id).scalar_subquery()
+    )
+    updated_at, last = db.execute(
+        select(AdventureSheet.updated_at, last_sequence).where(AdventureSheet.id == sheet_id)
+    ).one()
+    if not events:
+        return last
+
+    # Les événements portent la date de mise à jour de la feuille qu'ils ont produite
+    now = updated_at or datetime.utcnow()
+    rows = [
+        {
+            "sheet_id": sheet_id,
+            "sequence": last + position,
+            "kind": event["kind"],
+            "field": event.get("field"),
+            "delta": event.get("delta"),
+            "value": _dump(event["value"]) if "value" in event else None,
+            "combat_id": event.get("combat_id"),
+            "created_at": now,
+        }
+        for position, event in enumerate(events, start=1)
+    ]
+    db.execute(insert(SheetEvent), rows)
+
+    sequence = last + len(events)
+    for snapshot_sequence in range(last + 1, sequence + 1):
+        if not is_snapshot_sequence(snapshot_sequence):
+            continue
+        if snapshot_sequence == sequence:
+            state = current_sheet_state(db, sheet_id)
+        else:
+            # Instantané au milieu des événements ajoutés : état rejoué jusqu'à lui
+            state, _ = sheet_state_at(db, sheet_id, snapshot_sequence)
+        db.execute(
+            insert(SheetSnapshot).values(
+                sheet_id=sheet_id, sequence=snapshot_sequence, state=_dump(state), created_at=now
+            )
+        )
+    return sequence
+
+
+def created_event(db: Session, sheet_id: int) -> dict:
+    """Événement de création : l'état initial complet de la feuille."""
+    state = current_sheet_state(db, sheet_id)
+    state.pop("updated_at")
+    return {"kind": "created", "value": state}
+
+
+def patch_events(patch: AdventureSheetUpdate | AdventureSheetPatchOps) -> list[dict]:
+    """Traduit un patch (déjà validé par `sheet_patch_values`) en événements, dans l'ordre des opérations."""
+    if not isinstance(patch, AdventureSheetPatchOps):
+        return [
+            {"kind": "set", "field": field, "value": value}
+            for field, value in patch.model_dump(exclude_unset=True).items()
+        ]
+
+    events = []
+    for operation in patch.ops:
+        if operation.op == "inc":
+            events.append({"kind": "inc", "field": operation.field, "delta": operation.value})
+        elif operation.op == "set":
+            value = getattr(AdventureSheetUpdate.model_validate({operation.field: operation.value}), operation.field)
+            events.append({"kind": "set", "field": operation.field, "value": value})
+        else:
+            events.append({"kind": "append", "field": operation.field, "value": operation.value})
+    return events
+
+
+def apply_sheet_event(state: dict, event: SheetEvent) -> None:
+    """Applique un événement à un état de feuille, comme la requête UPDATE correspondante."""
+    value = json.loads(event.value) if event.value is not None else None
+    if event.kind in ("created", "combat"):
+        state.update(value)
+    elif event.kind == "set":
+        state[event.field] = value
+    elif event.kind == "inc":
+        current = state.get(event.field)
+        # Comme max(champ + incrément, 0) en SQL : une valeur NULL reste NULL
+        state[event.field] = None if current is None else max(current + event.delta, 0)
+    elif event.kind == "append":
+        current = state.get(event.field)
+        state[event.field] = value if not current else current + PATCH_APPEND_SEPARATORS[event.field] + value
+    state["updated_at"] = event.created_at
+
+
+def replay_sheet_events(
+    events: Iterable[SheetEvent], state: dict | None = None, sequence: int = 0
+) -> tuple[dict, int] | None:
+    """Rejoue des événements, ordonnés par numéro, à partir d'un état (vide par défaut).
+
+    Args:
+        events: Événements à appliquer
+        state: État de départ (instantané), modifié sur place
+        sequence: Numéro de l'événement qui a produit l'état de départ
+
+    Returns:
+        (état, numéro du dernier événement appliqué), ou None si aucun événement ni état de départ
+    """
+    for event in events:
+        if state is None:
+            state = {}
+        apply_sheet_event(state, event)
+        sequence = event.sequence
+    return (state, sequence) if state is not None else None
+
+
+def sheet_state_at(db: Session, sheet_id: int, sequence: int | None = None) -> tuple[dict, int] | None:
+    """Reconstruit l'état d'une feuille après un événement, à partir de l'instantané précédent.
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+        sequence: Numéro de l'événement (défaut: le dernier)
+
+    Returns:
+        (état, numéro du dernier événement appliqué), ou None si la feuille n'a aucun événement jusque-là
+    """
+    snapshot_query = select(SheetSnapshot).where(SheetSnapshot.sheet_id == sheet_id)
+    event_query = select(SheetEvent).where(SheetEvent.sheet_id == sheet_id)
+    if sequence is not None:
+        snapshot_query = snapshot_query.where(SheetSnapshot.sequence <= sequence)
+        event_query = event_query.where(SheetEvent.sequence <= sequence)
+
+    snapshot = db.scalars(snapshot_query.order_by(SheetSnapshot.sequence.desc()).limit(1)).first()
+    if snapshot is not None:
+        event_query = event_query.where(SheetEvent.sequence > snapshot.sequence)
+
+    events = db.scalars(event_query.order_by(SheetEvent.sequence))
+    if snapshot is None:
+        return replay_sheet_events(events)
+    return replay_sheet_events(events, json.loads(snapshot.state), snapshot.sequence)
+
+
+def rebuild_sheet(db: Session, sheet_id: int) -> int | None:
+    """Recalcule une feuille et ses instantanés en rejouant tout son journal, puis valide la transaction.
+
+    Le journal est relu sous le verrou d'écriture, les instantanés sont placés
+    comme lors de l'enregistrement (`is_snapshot_sequence`) et les statistiques
+    suivent l'état recalculé.
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+
+    Returns:
+        Numéro du dernier événement rejoué, ou None si la feuille n'a aucun événement
+    """
+    try:
+        begin_write(db)
+        state: dict = {}
+        snapshots = []
+        sequence = 0
+        events = db.scalars(select(SheetEvent).where(SheetEvent.sheet_id == sheet_id).order_by(SheetEvent.sequence))
+        for event in events:
+            apply_sheet_event(state, event)
+            sequence = event.sequence
+            if is_snapshot_sequence(sequence):
+                snapshots.append({"sheet_id": sheet_id, "sequence": sequence, "state": _dump(state)})
+        if not sequence:
+            db.rollback()
+            return None
+
+        # Contribution de la feuille aux statistiques retirée avant la réécriture, rajoutée après
+        sheet_filter = AdventureSheet.id == sheet_id
+        forget_sheets(db, sheet_filter)
+        db.execute(delete(SheetSnapshot).where(SheetSnapshot.sheet_id == sheet_id))
+        if snapshots:
+            db.execute(insert(SheetSnapshot), snapshots)
+        db.execute(update(AdventureSheet).where(sheet_filter).values(state))
+        count_sheets(db, sheet_filter)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return sequence
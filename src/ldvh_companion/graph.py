@@ -0,0 +1,304 @@
+"""Graphe des paragraphes d'un livre et parcours des feuilles d'aventure.
+
+Un livre est un graphe orienté : les paragraphes (`paragraphs`) sont reliés par
+les choix proposés au lecteur (`paragraph_edges`). Chaque feuille note les
+paragraphes qu'elle visite (`paragraph_visits`), dans l'ordre ; le dernier est
+le paragraphe courant.
+
+Les requêtes de parcours (plus court chemin, paragraphes encore accessibles) ne
+lisent pas les arêtes en base : le graphe d'un livre est gardé en mémoire au
+format CSR (numéros des paragraphes triés, et pour chacun la plage de ses
+successeurs dans un seul tableau), et parcouru en largeur avec NumPy, un niveau
+à la fois. Comme le catalogue, la copie en mémoire est validée par les versions
+des tables `paragraphs` et `paragraph_edges` : une modification du graphe d'un
+livre, même faite par un autre worker, est vue dès la lecture suivante.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from .models import (
+    BookGraphResponse,
+    BookGraphUpdate,
+    Paragraph,
+    ParagraphCreate,
+    ParagraphEdge,
+    ParagraphEdgeCreate,
+    ParagraphVisit,
+)
+from .stats import data_versions
+
+# Tables dont les graphes en mémoire sont une copie
+GRAPH_TABLES = ("paragraphs", "paragraph_edges")
+
+# Paragraphe de départ d'une feuille qui n'a encore rien visité
+START_PARAGRAPH = 1
+
+
+@dataclass(frozen=True)
+class BookGraph:
+    """Graphe d'un livre au format CSR : les successeurs du paragraphe i sont `targets[offsets[i]:offsets[i + 1]]`.
+
+    Les indices sont les positions des paragraphes dans `numbers`.
+    """
+
+    versions: tuple[int, ...]
+    numbers: np.ndarray  # Numéros des paragraphes, triés
+    offsets: np.ndarray  # Début des successeurs de chaque paragraphe (taille len(numbers) + 1)
+    targets: np.ndarray  # Indices des successeurs, regroupés par paragraphe source
+    endings: dict[int, str] = field(default_factory=dict)  # Numéro -> "death" ou "victory"
+
+    def index(self, number: int) -> int | None:
+        """Retourne l'indice d'un paragraphe, ou None s'il n'est pas dans le graphe."""
+        position = int(np.searchsorted(self.numbers, number))
+        if position < len(self.numbers) and self.numbers[position] == number:
+            return position
+        return None
+
+    def breadth_first(self, source: int, target: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Parcourt le graphe en largeur depuis l'indice `source`, jusqu'à l'indice `target` s'il est donné.
+
+        Returns:
+            (distance de chaque paragraphe, -1 s'il est inaccessible ;
+             prédécesseur de chaque paragraphe sur un plus court chemin, -1 sinon)
+        """
+        distances = np.full(len(self.numbers), -1, dtype=np.int32)
+        parents = np.full(len(self.numbers), -1, dtype=np.int32)
+        distances[source] = 0
+        frontier = np.array([source], dtype=np.int32)
+        level = 0
+        while frontier.size and (target is None or distances[target] < 0):
+            level += 1
+            # Toutes les arêtes sortant de la frontière, en une seule opération
+            starts = self.offsets[frontier]
+            counts = self.offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+            successors = self.targets[edges]
+            sources = np.repeat(frontier, counts)
+
+            new = distances[successors] == -1
+            frontier, first = np.unique(successors[new], return_index=True)
+            distances[frontier] = level
+            parents[frontier] = sources[new][first]
+        return distances, parents
+
+    def route(self, source: int, target: int) -> list[int] | None:
+        """Retourne les numéros des paragraphes d'un plus court chemin, ou None si `target` est inaccessible."""
+        start, end = self.index(source), self.index(target)
+        if start is None or end is None:
+            return None
+        distances, parents = self.breadth_first(start, end)
+        if distances[end] < 0:
+            return None
+
+        path = [end]
+        while path[-1] != start:
+            path.append(int(parents[path[-1]]))
+        return [int(self.numbers[position]) for position in reversed(path)]
+
+    def reachable(self, source: int) -> list[tuple[int, int]]:
+        """Paragraphes accessibles depuis `source` (exclu), par distance croissante : (numéro, distance)."""
+        start = self.index(source)
+        if start is None:
+            return []
+        distances, _ = self.breadth_first(start)
+        positions = np.flatnonzero(distances > 0)
+        positions = positions[np.argsort(distances[positions], kind="stable")]
+        return [(int(self.numbers[position]), int(distances[position])) for position in positions]
+
+
+class GraphCache:
+    """Cache des graphes des livres, validé par les versions stockées en base."""
+
+    def __init__(self) -> None:
+        """Initialise un cache vide ; chaque graphe est chargé à sa première lecture."""
+        self._lock = threading.Lock()
+        self._graphs: dict[int, BookGraph] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, db: Session, book_id: int, versions: tuple[int, ...]) -> BookGraph:
+        """Lit les paragraphes et les choix d'un livre ; les versions ont été lues avant les données."""
+        rows = db.execute(
+            select(Paragraph.id, Paragraph.number, Paragraph.ending)
+            .where(Paragraph.book_id == book_id)
+            .order_by(Paragraph.number)
+        ).all()
+        positions = {row.id: position for position, row in enumerate(rows)}
+        numbers = np.array([row.number for row in rows], dtype=np.int32)
+        endings = {row.number: row.ending for row in rows if row.ending}
+
+        edges = np.array(
+            db.execute(
+                select(ParagraphEdge.source_id, ParagraphEdge.target_id)
+                .join(Paragraph, Paragraph.id == ParagraphEdge.source_id)
+                .where(Paragraph.book_id == book_id)
+            ).all(),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        sources = np.array([positions[source_id] for source_id in edges[:, 0]], dtype=np.int32)
+        targets = np.array([positions[target_id] for target_id in edges[:, 1]], dtype=np.int32)
+
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(len(numbers) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=len(numbers)), out=offsets[1:])
+        return BookGraph(versions, numbers, offsets, targets[order], endings)
+
+    def get(self, db: Session, book_id: int) -> BookGraph:
+        """Retourne le graphe d'un livre (vide s'il n'a pas été saisi), rechargé si les tables ont changé.
+
+        Args:
+            db: Session de base de données
+            book_id: ID du livre
+
+        Returns:
+            Graphe à jour
+        """
+        versions = data_versions(db, GRAPH_TABLES)
+        with self._lock:
+            graph = self._graphs.get(book_id)
+            if graph is not None and graph.versions == versions:
+                self.hits += 1
+                return graph
+            self.misses += 1
+
+        graph = self._load(db, book_id, versions)
+        with self._lock:
+            self._graphs[book_id] = graph
+        return graph
+
+    def invalidate(self) -> None:
+        """Oublie les graphes en mémoire ; appelée après un commit qui modifie un graphe."""
+        with self._lock:
+            self._graphs.clear()
+
+
+# Instance globale du cache
+book_graphs = GraphCache()
+
+
+def replace_book_graph(db: Session, book_id: int, graph: BookGraphUpdate) -> tuple[int, int]:
+    """Remplace le graphe d'un livre ; les paragraphes cités par un choix sans être listés sont créés.
+
+    Args:
+        db: Session de base de données (validée en cas de succès, annulée sinon)
+        book_id: ID du livre
+        graph: Paragraphes et choix du livre
+
+    Returns:
+        (nombre de paragraphes, nombre de choix)
+
+    Raises:
+        ValueError: Si un paragraphe ou un choix est en double
+    """
+    endings: dict[int, str | None] = {}
+    for paragraph in graph.paragraphs:
+        if paragraph.number in endings:
+            raise ValueError(f"Paragraphe {paragraph.number} en double")
+        endings[paragraph.number] = paragraph.ending
+
+    edges: dict[tuple[int, int], str | None] = {}
+    for edge in graph.edges:
+        if (edge.source, edge.target) in edges:
+            raise ValueError(f"Choix {edge.source} -> {edge.target} en double")
+        edges[edge.source, edge.target] = edge.label
+        endings.setdefault(edge.source, None)
+        endings.setdefault(edge.target, None)
+
+    try:
+        # Les choix de l'ancien graphe sont supprimés en cascade avec ses paragraphes
+        db.execute(delete(Paragraph).where(Paragraph.book_id == book_id))
+        ids: dict[int, int] = {}
+        if endings:
+            rows = [{"book_id": book_id, "number": number, "ending": ending} for number, ending in endings.items()]
+            statement = insert(Paragraph).returning(Paragraph.id, sort_by_parameter_order=True)
+            ids = dict(zip(endings, db.execute(statement, rows).scalars(), strict=True))
+        if edges:
+            db.execute(
+                insert(ParagraphEdge),
+                [
+                    {"source_id": ids[source], "target_id": ids[target], "label": label}
+                    for (source, target), label in edges.items()
+                ],
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(endings), len(edges)
+
+
+def load_book_graph(db: Session, book_id: int) -> BookGraphResponse:
+    """Retourne le graphe d'un livre tel qu'il a été saisi, paragraphes et choix triés par numéro."""
+    paragraphs = db.execute(
+        select(Paragraph.number, Paragraph.ending).where(Paragraph.book_id == book_id).order_by(Paragraph.number)
+    )
+    source, target = aliased(Paragraph), aliased(Paragraph)
+    edges = db.execute(
+        select(source.number.label("source"), target.number.label("target"), ParagraphEdge.label)
+        .join(source, source.id == ParagraphEdge.source_id)
+        .join(target, target.id == ParagraphEdge.target_id)
+        .where(source.book_id == book_id)
+        .order_by(source.number, target.number)
+    )
+    return BookGraphResponse(
+        book_id=book_id,
+        paragraphs=[ParagraphCreate.model_validate(row._asdict()) for row in paragraphs],
+        edges=[ParagraphEdgeCreate.model_validate(row._asdict()) for row in edges],
+    )
+
+
+def record_visit(db: Session, sheet_id: int, paragraph: int) -> ParagraphVisit:
+    """Ajoute un paragraphe au parcours d'une feuille (sans valider la transaction).
+
+    Le rang de la visite est calculé dans la requête d'insertion : deux visites
+    concurrentes ne peuvent pas recevoir le même rang.
+
+    Args:
+        db: Session de base de données
+        sheet_id: ID de la feuille
+        paragraph: Numéro du paragraphe
+
+    Returns:
+        Visite enregistrée
+    """
+    now = datetime.utcnow()
+    next_position = func.coalesce(func.max(ParagraphVisit.position), 0) + 1
+    statement = (
+        insert(ParagraphVisit)
+        .from_select(
+            ["sheet_id", "position", "paragraph", "created_at"],
+            select(literal(sheet_id), next_position, literal(paragraph), literal(now)).where(
+                ParagraphVisit.sheet_id == sheet_id
+            ),
+        )
+        .returning(ParagraphVisit.position)
+    )
+    position = db.scalar(statement)
+    return ParagraphVisit(sheet_id=sheet_id, position=position, paragraph=paragraph, created_at=now)
+
+
+def sheet_visits(db: Session, sheet_id: int) -> list[ParagraphVisit]:
+    """Retourne le parcours d'une feuille, dans l'ordre des visites."""
+    return list(
+        db.scalars(select(ParagraphVisit).where(ParagraphVisit.sheet_id == sheet_id).order_by(ParagraphVisit.position))
+    )
+
+
+def last_visited_paragraph(db: Session, sheet_id: int) -> int | None:
+    """Retourne le dernier paragraphe visité par une feuille, ou None si elle n'en a visité aucun."""
+    return db.scalar(
+        select(ParagraphVisit.paragraph)
+        .where(ParagraphVisit.sheet_id == sheet_id)
+        .order_by(ParagraphVisit.position.desc())
+        .limit(1)
+    )
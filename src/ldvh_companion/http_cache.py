@@ -0,0 +1,84 @@
+"""Cache HTTP des routes GET : ETags dérivés des versions des tables et requêtes conditionnelles.
+
+L'ETag d'une réponse est calculé à partir de l'URL demandée et des versions
+(table `data_versions`) des tables dont elle dépend : il change dès qu'une de
+ces tables est modifiée. Un client qui renvoie l'ETag dans `If-None-Match`
+reçoit un 304 sans que la route ne soit exécutée, ce qui ne coûte que la
+lecture des versions.
+"""
+
+import hashlib
+from collections.abc import Callable
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import get_read_db
+from .stats import data_versions
+
+# En-têtes Cache-Control : le catalogue peut être gardé max-age secondes par le
+# navigateur, les feuilles d'aventure sont revalidées à chaque lecture.
+CATALOG_CACHE_CONTROL = f"max-age={settings.catalog_cache_max_age}, must-revalidate"
+SHEET_CACHE_CONTROL = "private, no-cache"
+
+
+class NotModifiedError(Exception):
+    """Levée quand la représentation connue du client est à jour (réponse 304)."""
+
+    def __init__(self, headers: dict[str, str]) -> None:
+        super().__init__("Not Modified")
+        self.headers = headers
+
+
+def compute_etag(request: Request, versions: tuple[int, ...]) -> str:
+    """Calcule un ETag fort pour une URL et des versions de tables.
+
+    Args:
+        request: Requête HTTP (chemin et paramètres font partie de la clé)
+        versions: Versions des tables dont dépend la réponse
+
+    Returns:
+        ETag entre guillemets
+    """
+    key = f"{request.url.path}?{request.url.query}|{','.join(map(str, versions))}"
+    return f'"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Indique si l'en-tête `If-None-Match` désigne l'ETag (comparaison faible, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag in candidates
+
+
+def conditional_get(tables: tuple[str, ...], cache_control: str) -> Callable[..., dict[str, str]]:
+    """Crée une dépendance qui gère l'ETag et le Cache-Control d'une route GET.
+
+    Les versions sont lues avant les données : si une écriture a lieu entre les
+    deux, la réponse porte l'ancien ETag et sera simplement renvoyée en entier à
+    la prochaine lecture.
+
+    Args:
+        tables: Tables dont dépend la réponse
+        cache_control: Valeur de l'en-tête Cache-Control
+
+    Returns:
+        Dépendance FastAPI retournant les en-têtes de cache, à reprendre par les
+        routes qui construisent elles-mêmes leur réponse
+
+    Raises:
+        NotModifiedError: Si le client a déjà la version courante
+    """
+
+    def dependency(request: Request, response: Response, db: Session = Depends(get_read_db)) -> dict[str, str]:
+        headers = {"ETag": compute_etag(request, data_versions(db, tables)), "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            raise NotModifiedError(headers)
+        response.headers.update(headers)
+        return headers
+
+    return dependency
@@ -0,0 +1,433 @@
+"""Migrations de la base de données, appliquées au démarrage de l'application.
+
+Chaque étape est idempotente : elle peut être rejouée sans effet sur une base
+déjà à jour. Plusieurs workers peuvent démarrer en même temps : les étapes qui
+décident de leurs écritures d'après une lecture la font sous le verrou
+d'écriture (`begin_write`).
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import Connection, Table, exists, func, or_, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable
+
+from .analytics import analytics_empty, rebuild_analytics
+from .bestiary import bestiary_empty, rebuild_bestiary
+from .database import SessionLocal, begin_write, engine
+from .events import created_event, record_sheet_events
+from .models import AdventureSheet, ArchivedSheet, Book, Combat, CombatRound, Encounter, MonsterStats, SheetEvent
+from .search import create_search_index
+from .stats import VERSIONED_TABLES
+from .utils import decode_monster_encounters
+
+# Nombre de feuilles migrées par transaction
+MIGRATION_BATCH_SIZE = 100
+
+# Tables dont la définition (cascades, AUTOINCREMENT) peut imposer une reconstruction, dans l'ordre des dépendances
+REBUILT_TABLES = (
+    Book.__table__,
+    AdventureSheet.__table__,
+    Encounter.__table__,
+    Combat.__table__,
+    CombatRound.__table__,
+    ArchivedSheet.__table__,
+)
+
+
+def _parse_datetime(value: object) -> datetime | None:
+    """Convertit une date ISO 8601 (éventuellement suffixée par Z) en datetime naïf UTC."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _decode_combat_history(text: str | None) -> list[dict]:
+    """Décode l'ancien historique des combats (liste JSON), en ignorant les entrées invalides."""
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(data, list):
+        return []
+    return [entry for entry in data if isinstance(entry, dict) and entry.get("monster_name")]
+
+
+def migrate_sheet_json_blobs() -> int:
+    """Déplace les rencontres et l'historique des combats des colonnes JSON vers leurs tables.
+
+    Les anciens combats actifs n'étaient conservés que côté client et ne peuvent pas être
+    repris sans session serveur : ils sont abandonnés.
+
+    Returns:
+        Nombre de feuilles migrées
+    """
+    db = SessionLocal()
+    migrated = 0
+    try:
+        blob_filter = or_(
+            AdventureSheet.monster_encounters.isnot(None),
+            AdventureSheet.active_combats.isnot(None),
+            AdventureSheet.combat_history.isnot(None),
+        )
+        while True:
+            begin_write(db)
+            sheets = db.query(AdventureSheet).filter(blob_filter).limit(MIGRATION_BATCH_SIZE).all()
+            if not sheets:
+                db.commit()
+                break
+
+            for sheet in sheets:
+                for position, encounter in enumerate(decode_monster_encounters(sheet.monster_encounters)):
+                    db.add(Encounter(sheet_id=sheet.id, position=position, **encounter))
+
+                for entry in _decode_combat_history(sheet.combat_history):
+                    completed_at = _parse_datetime(entry.get("completed_at"))
+                    db.add(
+                        Combat(
+                            sheet_id=sheet.id,
+                            monster_name=str(entry["monster_name"])[:100],
+                            monster_skill=entry.get("monster_skill") or 0,
+                            monster_max_stamina=entry.get("monster_max_stamina") or 0,
+                            is_active=False,
+                            winner=entry.get("winner"),
+                            rounds_fought=entry.get("rounds_fought") or 0,
+                            final_player_stamina=entry.get("final_player_stamina"),
+                            final_monster_stamina=entry.get("final_monster_stamina"),
+                            final_player_luck=entry.get("final_player_luck"),
+                            started_at=completed_at,
+                            completed_at=completed_at,
+                        )
+                    )
+
+            # Vider les anciennes colonnes sans toucher à la date de mise à jour des feuilles
+            db.query(AdventureSheet).filter(AdventureSheet.id.in_([sheet.id for sheet in sheets])).update(
+                {
+                    AdventureSheet.monster_encounters: None,
+                    AdventureSheet.active_combats: None,
+                    AdventureSheet.combat_history: None,
+                    AdventureSheet.updated_at: AdventureSheet.updated_at,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            migrated += len(sheets)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return migrated
+
+
+def _renumber_duplicates(connection: Connection, table: Table, group_column: str, number_column: str) -> int:
+    """Renumérote les doublons (groupe, numéro) : chaque doublon prend le prochain numéro libre du groupe.
+
+    La ligne la plus ancienne (plus petit id) garde son numéro.
+
+    Returns:
+        Nombre de lignes renumérotées
+    """
+    earlier = table.alias("earlier")
+    duplicates = connection.execute(
+        select(table.c.id, table.c[group_column])
+        .where(
+            exists().where(
+                earlier.c[group_column] == table.c[group_column],
+                earlier.c[number_column] == table.c[number_column],
+                earlier.c.id < table.c.id,
+            )
+        )
+        .order_by(table.c.id)
+    ).all()
+
+    for row_id, group in duplicates:
+        next_number = (
+            select(func.coalesce(func.max(table.c[number_column]), 0) + 1)
+            .where(table.c[group_column] == group)
+            .scalar_subquery()
+        )
+        connection.execute(
+            update(table)
+            .where(table.c.id == row_id)
+            .values({number_column: next_number, "updated_at": table.c.updated_at})
+        )
+
+    return len(duplicates)
+
+
+def create_unique_indexes() -> int:
+    """Crée les index uniques (book_id, attempt_number) et (series_id, book_number) sur une base existante.
+
+    Les doublons créés avant l'ajout des index sont d'abord renumérotés, sous le
+    verrou d'écriture : un autre worker attend, puis ne trouve plus de doublons.
+
+    Returns:
+        Nombre de lignes renumérotées
+    """
+    db = SessionLocal()
+    renumbered = 0
+    try:
+        begin_write(db)
+        connection = db.connection()
+        for table, group_column, number_column in (
+            (AdventureSheet.__table__, "book_id", "attempt_number"),
+            (Book.__table__, "series_id", "book_number"),
+        ):
+            renumbered += _renumber_duplicates(connection, table, group_column, number_column)
+            for index in table.indexes:
+                if index.unique:
+                    index.create(connection, checkfirst=True)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return renumbered
+
+
+def _is_outdated(connection: Connection, table: Table) -> bool:
+    """Indique si une table existante a été créée sans les ON DELETE CASCADE ou l'AUTOINCREMENT du modèle."""
+    expected = {key.parent.name for key in table.foreign_keys if key.ondelete == "CASCADE"}
+    existing = connection.exec_driver_sql(f"PRAGMA foreign_key_list({table.name})").mappings().all()
+    cascading = {row["from"] for row in existing if row["on_delete"] == "CASCADE"}
+    if not expected <= cascading:
+        return True
+
+    if table.dialect_options["sqlite"]["autoincrement"]:
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        return "AUTOINCREMENT" not in (sql or "").upper()
+    return False
+
+
+def _rebuild_table(connection: Connection, table: Table) -> None:
+    """Recrée une table à partir de son modèle en conservant ses lignes, puis recrée ses index."""
+    temporary = f"{table.name}__rebuild"
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+    connection.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {temporary} (", 1))
+
+    existing = {row["name"] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})").mappings()}
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    connection.exec_driver_sql(f"INSERT INTO {temporary} ({columns}) SELECT {columns} FROM {table.name}")
+    connection.exec_driver_sql(f"DROP TABLE {table.name}")
+    connection.exec_driver_sql(f"ALTER TABLE {temporary} RENAME TO {table.name}")
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def rebuild_outdated_tables() -> list[str]:
+    """Reconstruit les tables créées sans ON DELETE CASCADE sur leurs clés étrangères ou sans AUTOINCREMENT.
+
+    SQLite ne sait pas modifier une contrainte : chaque table concernée est
+    recréée et ses lignes copiées, clés étrangères désactivées, dans une seule
+    transaction (procédure recommandée par SQLite). Les triggers de
+    `data_versions`, supprimés avec les anciennes tables, sont recréés ensuite
+    par `create_data_version_triggers`.
+
+    Returns:
+        Noms des tables reconstruites
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+
+    with engine.connect() as connection:
+        tables = [table for table in REBUILT_TABLES if _is_outdated(connection, table)]
+        if not tables:
+            return []
+
+        # Le pragma est sans effet dans une transaction : il est appliqué avant BEGIN
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.commit()
+        try:
+            connection.exec_driver_sql("BEGIN")
+            for table in tables:
+                _rebuild_table(connection, table)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+            connection.commit()
+
+    return [table.name for table in tables]
+
+
+def backfill_sheet_events() -> int:
+    """Ouvre le journal des feuilles qui n'en ont pas encore, par un événement de création.
+
+    L'événement enregistre l'état courant de la feuille : les modifications
+    antérieures au journal ne sont pas connues.
+
+    Returns:
+        Nombre de feuilles traitées
+    """
+    db = SessionLocal()
+    backfilled = 0
+    try:
+        while True:
+            # Lot choisi et journal ouvert sous le même verrou d'écriture
+            begin_write(db)
+            sheet_ids = db.scalars(
+                select(AdventureSheet.id)
+                .where(~exists().where(SheetEvent.sheet_id == AdventureSheet.id))
+                .limit(MIGRATION_BATCH_SIZE)
+            ).all()
+            if not sheet_ids:
+                db.commit()
+                break
+
+            for sheet_id in sheet_ids:
+                record_sheet_events(db, sheet_id, [created_event(db, sheet_id)])
+            db.commit()
+            backfilled += len(sheet_ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return backfilled
+
+
+def rekey_monster_stats() -> bool:
+    """Recrée `monster_stats` si elle regroupe encore les combats par nom saisi plutôt que par nom normalisé.
+
+    La table ne contient que des compteurs : elle est recréée vide puis
+    recalculée avec toutes les statistiques (`rebuild_analytics`), sous le
+    verrou d'écriture.
+
+    Returns:
+        True si la table a été recréée
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    table = MonsterStats.__table__
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        connection = db.connection()
+        columns = {row["name"] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})").mappings()}
+        if "name_key" in columns:
+            db.rollback()
+            return False
+
+        table.drop(connection)
+        table.create(connection)
+        rebuild_analytics(db)
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def create_data_version_triggers() -> None:
+    """Crée les compteurs de `data_versions` et les triggers qui les incrémentent à chaque écriture."""
+    with engine.begin() as connection:
+        for table in VERSIONED_TABLES:
+            connection.execute(
+                text("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (:table, 0)"),
+                {"table": table},
+            )
+            for operation in ("INSERT", "UPDATE", "DELETE"):
+                connection.execute(
+                    text(
+                        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version "
+                        f"AFTER {operation} ON {table} FOR EACH ROW BEGIN "
+                        f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}'; "
+                        "END"
+                    )
+                )
+
+
+def create_full_text_index() -> bool:
+    """Crée l'index de recherche plein texte et ses triggers (voir search.py).
+
+    Returns:
+        True si l'index vient d'être créé et rempli
+    """
+    try:
+        with engine.begin() as connection:
+            return create_search_index(connection)
+    except OperationalError as e:
+        print(f"Recherche plein texte indisponible (SQLite sans FTS5) : {e}")
+        return False
+
+
+def backfill_analytics() -> bool:
+    """Calcule les statistiques par livre et par monstre si elles ne l'ont jamais été.
+
+    Returns:
+        True si les statistiques ont été calculées
+    """
+    db = SessionLocal()
+    try:
+        if not analytics_empty(db):
+            return False
+        rebuild_analytics(db)
+        return True
+    finally:
+        db.close()
+
+
+def seed_bestiary() -> int | None:
+    """Remplit le bestiaire à partir des rencontres et des combats s'il ne l'a jamais été.
+
+    Returns:
+        Nombre de monstres du bestiaire, ou None s'il était déjà rempli
+    """
+    db = SessionLocal()
+    try:
+        if not bestiary_empty(db):
+            return None
+        return rebuild_bestiary(db)
+    finally:
+        db.close()
+
+
+def run_migrations() -> None:
+    """Applique toutes les migrations, dans l'ordre."""
+    migrated = migrate_sheet_json_blobs()
+    if migrated:
+        print(f"Rencontres et historiques de combats migrés pour {migrated} feuille(s)")
+
+    renumbered = create_unique_indexes()
+    if renumbered:
+        print(f"{renumbered} numéro(s) de tentative ou de tome en double renuméroté(s)")
+
+    rebuilt = rebuild_outdated_tables()
+    if rebuilt:
+        print(f"Tables reconstruites (suppressions en cascade, AUTOINCREMENT) : {', '.join(rebuilt)}")
+
+    backfilled = backfill_sheet_events()
+    if backfilled:
+        print(f"Journal des événements ouvert pour {backfilled} feuille(s)")
+
+    if rekey_monster_stats():
+        print("Statistiques des monstres regroupées par nom normalisé")
+
+    create_data_version_triggers()
+
+    if backfill_analytics():
+        print("Statistiques par livre et par monstre calculées")
+
+    monsters = seed_bestiary()
+    if monsters is not None:
+        print(f"Bestiaire rempli : {monsters} monstre(s)")
+
+    if create_full_text_index():
+        print("Index de recherche plein texte créé")
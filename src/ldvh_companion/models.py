@@ -1,9 +1,25 @@
 """Modèles de données pour l'application LDVH Companion."""
 
+import json
 from datetime import datetime
-
-from pydantic import BaseModel, Field
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from enum import StrEnum
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    func,
+    literal_column,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -22,17 +38,18 @@ class Series(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relations
-    books = relationship("Book", back_populates="series", cascade="all, delete-orphan")
+    books = relationship("Book", back_populates="series", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Book(Base):
     """Modèle pour un tome de la série."""
 
     __tablename__ = "books"
+    __table_args__ = (Index("uq_books_series_id_book_number", "series_id", "book_number", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
-    series_id = Column(Integer, ForeignKey("series.id"), nullable=False)
+    series_id = Column(Integer, ForeignKey("series.id", ondelete="CASCADE"), nullable=False)
     book_number = Column(Integer, nullable=False)  # Numéro du tome dans la série
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -40,16 +57,23 @@ class Book(Base):
 
     # Relations
     series = relationship("Series", back_populates="books")
-    adventure_sheets = relationship("AdventureSheet", back_populates="book", cascade="all, delete-orphan")
+    adventure_sheets = relationship(
+        "AdventureSheet", back_populates="book", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class AdventureSheet(Base):
     """Modèle pour une feuille d'aventure."""
 
     __tablename__ = "adventure_sheets"
+    # AUTOINCREMENT : l'ID d'une feuille archivée n'est jamais réattribué
+    __table_args__ = (
+        Index("uq_adventure_sheets_book_id_attempt_number", "book_id", "attempt_number", unique=True),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
     attempt_number = Column(Integer, nullable=False)  # Numéro de la tentative
     character_name = Column(String(100), nullable=True)
 
@@ -70,13 +94,9 @@ class AdventureSheet(Base):
     provisions = Column(Text, nullable=True)
     equipment = Column(Text, nullable=True)
 
-    # Monstres rencontrés (JSON stocké en texte)
+    # Anciens champs JSON, migrés vers les tables encounters et combats (vidés par la migration)
     monster_encounters = Column(Text, nullable=True)
-
-    # États des combats actifs (JSON stocké en texte)
     active_combats = Column(Text, nullable=True)
-
-    # Historique des combats terminés (JSON stocké en texte)
     combat_history = Column(Text, nullable=True)
 
     # Métadonnées
@@ -87,6 +107,290 @@ class AdventureSheet(Base):
 
     # Relations
     book = relationship("Book", back_populates="adventure_sheets")
+    encounters = relationship(
+        "Encounter",
+        back_populates="sheet",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Encounter.position",
+    )
+    combats = relationship("Combat", back_populates="sheet", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class Encounter(Base):
+    """Modèle pour une rencontre de monstre notée sur une feuille d'aventure."""
+
+    __tablename__ = "encounters"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    sheet_id = Column(Integer, ForeignKey("adventure_sheets.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # Ordre d'affichage sur la feuille
+    name = Column(String(100), nullable=True)
+    paragraph = Column(Integer, nullable=True)
+    skill = Column(Integer, nullable=True)
+    stamina = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relations
+    sheet = relationship("AdventureSheet", back_populates="encounters")
+
+
+class Combat(Base):
+    """Modèle pour un combat, en cours ou terminé."""
+
+    __tablename__ = "combats"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    sheet_id = Column(Integer, ForeignKey("adventure_sheets.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_id = Column(String(32), nullable=True, unique=True)  # Identifiant de la session de combat
+
+    monster_name = Column(String(100), nullable=False)
+    monster_skill = Column(Integer, nullable=False)
+    monster_max_stamina = Column(Integer, nullable=False)
+
+    is_active = Column(Boolean, default=True)
+    winner = Column(String(10), nullable=True)  # "player", "monster", "draw" ; None si en cours ou abandonné
+    rounds_fought = Column(Integer, default=0)
+    final_player_stamina = Column(Integer, nullable=True)
+    final_monster_stamina = Column(Integer, nullable=True)
+    final_player_luck = Column(Integer, nullable=True)
+    rng_seed = Column(BigInteger, nullable=True)  # Graine des dés, pour rejouer le combat
+
+    started_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Relations
+    sheet = relationship("AdventureSheet", back_populates="combats")
+    rounds = relationship(
+        "CombatRound",
+        back_populates="combat",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="CombatRound.round_number",
+    )
+
+
+class CombatRound(Base):
+    """Modèle pour un round de combat (ajouté, jamais réécrit)."""
+
+    __tablename__ = "combat_rounds"
+    __table_args__ = (
+        Index("ix_combat_rounds_combat_id_round_number", "combat_id", "round_number"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    combat_id = Column(Integer, ForeignKey("combats.id", ondelete="CASCADE"), nullable=False)
+    round_number = Column(Integer, nullable=False)
+
+    player_dice = Column(String(16), nullable=False)  # JSON, ex. "[3, 5]"
+    monster_dice = Column(String(16), nullable=False)
+    player_attack_strength = Column(Integer, nullable=False)
+    monster_attack_strength = Column(Integer, nullable=False)
+    winner = Column(String(10), nullable=False)
+
+    luck_attempted = Column(Boolean, default=False)
+    luck_dice = Column(String(16), nullable=True)
+    luck_success = Column(Boolean, nullable=True)
+
+    damage_to_player = Column(Integer, default=0)
+    damage_to_monster = Column(Integer, default=0)
+    player_stamina_after = Column(Integer, nullable=False)
+    monster_stamina_after = Column(Integer, nullable=False)
+    player_luck_after = Column(Integer, nullable=False)
+
+    # Relations
+    combat = relationship("Combat", back_populates="rounds")
+
+
+class ArchivedSheet(Base):
+    """Modèle pour une feuille d'aventure terminée, archivée avec ses rencontres et ses combats.
+
+    La feuille garde son ID ; son contenu complet est stocké en JSON compressé.
+    """
+
+    __tablename__ = "archived_sheets"
+    __table_args__ = (Index("uq_archived_sheets_book_id_attempt_number", "book_id", "attempt_number", unique=True),)
+
+    id = Column(Integer, primary_key=True)  # ID d'origine de la feuille
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    attempt_number = Column(Integer, nullable=False)
+    character_name = Column(String(100), nullable=True)
+    codec = Column(String(8), nullable=False)  # "zlib" ou "zstd"
+    payload = Column(LargeBinary, nullable=False)  # Feuille, rencontres, combats et rounds
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SheetEvent(Base):
+    """Modèle pour une modification d'une feuille d'aventure (journal ajouté, jamais réécrit).
+
+    La ligne de `adventure_sheets` est la projection de ces événements, tenue à jour
+    à chaque écriture : le journal permet de reconstruire la feuille à tout instant.
+    """
+
+    __tablename__ = "sheet_events"
+    __table_args__ = (
+        Index("uq_sheet_events_sheet_id_sequence", "sheet_id", "sequence", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    sheet_id = Column(Integer, ForeignKey("adventure_sheets.id", ondelete="CASCADE"), nullable=False)
+    sequence = Column(Integer, nullable=False)  # Numéro de l'événement dans la feuille, à partir de 1
+    kind = Column(String(10), nullable=False)  # "created", "set", "inc", "append" ou "combat"
+    field = Column(String(50), nullable=True)  # Champ modifié ("set", "inc", "append")
+    delta = Column(Integer, nullable=True)  # Incrément ("inc")
+    value = Column(Text, nullable=True)  # Valeur JSON ("created" et "combat" : champs de la feuille)
+    combat_id = Column(Integer, ForeignKey("combats.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SheetSnapshot(Base):
+    """Modèle pour l'état d'une feuille d'aventure après un événement, enregistré périodiquement."""
+
+    __tablename__ = "sheet_snapshots"
+
+    sheet_id = Column(Integer, ForeignKey("adventure_sheets.id", ondelete="CASCADE"), primary_key=True)
+    sequence = Column(Integer, primary_key=True)
+    state = Column(Text, nullable=False)  # Champs de la feuille, en JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Monster(Base):
+    """Modèle pour un monstre du bestiaire d'un livre (dédoublonné, alimenté par les rencontres et les combats)."""
+
+    __tablename__ = "monsters"
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(100), nullable=False)
+    name_key = Column(String(100), nullable=False)  # Nom normalisé (minuscules, sans accents) pour la recherche
+    skill = Column(Integer, nullable=True)
+    stamina = Column(Integer, nullable=True)
+    paragraph = Column(Integer, nullable=True)
+    use_count = Column(Integer, nullable=False, default=1)  # Nombre de fois où le monstre a été saisi
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Un monstre par livre, nom normalisé et statistiques (NULL compte comme une valeur)
+    __table_args__ = (
+        Index(
+            "uq_monsters_signature",
+            book_id,
+            name_key,
+            func.coalesce(skill, literal_column("-1")),
+            func.coalesce(stamina, literal_column("-1")),
+            func.coalesce(paragraph, literal_column("-1")),
+            unique=True,
+        ),
+        Index("ix_monsters_name_key", name_key),
+    )
+
+
+class Paragraph(Base):
+    """Modèle pour un paragraphe numéroté d'un livre : un nœud de son graphe (voir graph.py)."""
+
+    __tablename__ = "paragraphs"
+    __table_args__ = (Index("uq_paragraphs_book_id_number", "book_id", "number", unique=True),)
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    number = Column(Integer, nullable=False)  # Numéro du paragraphe dans le livre
+    ending = Column(String(10), nullable=True)  # "death" ou "victory" pour un paragraphe de fin
+
+
+class ParagraphEdge(Base):
+    """Modèle pour un choix menant d'un paragraphe à un autre : une arête du graphe d'un livre."""
+
+    __tablename__ = "paragraph_edges"
+    __table_args__ = (Index("uq_paragraph_edges_source_id_target_id", "source_id", "target_id", unique=True),)
+
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Integer, ForeignKey("paragraphs.id", ondelete="CASCADE"), nullable=False)
+    target_id = Column(Integer, ForeignKey("paragraphs.id", ondelete="CASCADE"), nullable=False, index=True)
+    label = Column(String(200), nullable=True)  # Texte du choix ("Si vous ouvrez la porte…")
+
+
+class ParagraphVisit(Base):
+    """Modèle pour un paragraphe lu pendant une partie, dans l'ordre du parcours de la feuille."""
+
+    __tablename__ = "paragraph_visits"
+    __table_args__ = (
+        Index("uq_paragraph_visits_sheet_id_position", "sheet_id", "position", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    sheet_id = Column(Integer, ForeignKey("adventure_sheets.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Rang de la visite dans le parcours, à partir de 1
+    paragraph = Column(Integer, nullable=False)  # Numéro du paragraphe (pas forcément présent dans le graphe)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BookStats(Base):
+    """Statistiques d'un livre, mises à jour à chaque fin de partie (voir analytics.py)."""
+
+    __tablename__ = "book_stats"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    attempt_count = Column(Integer, nullable=False, default=0)  # Feuilles créées
+    finished_count = Column(Integer, nullable=False, default=0)  # Feuilles terminées
+    death_count = Column(Integer, nullable=False, default=0)  # Feuilles terminées sans Endurance
+    completed_count = Column(Integer, nullable=False, default=0)  # Feuilles terminées en vie
+    completed_attempt_sum = Column(Integer, nullable=False, default=0)  # Somme de leurs numéros de tentative
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class MonsterStats(Base):
+    """Statistiques des combats contre un monstre, mises à jour à chaque fin de combat (voir analytics.py)."""
+
+    __tablename__ = "monster_stats"
+    __table_args__ = (Index("ix_monster_stats_monster_win_count", "monster_win_count"),)
+
+    name_key = Column(String(100), primary_key=True)  # Nom normalisé, comme dans le bestiaire
+    monster_name = Column(String(100), nullable=False)  # Nom du premier combat compté
+    combat_count = Column(Integer, nullable=False, default=0)
+    player_win_count = Column(Integer, nullable=False, default=0)
+    monster_win_count = Column(Integer, nullable=False, default=0)  # Combats perdus par le joueur
+    draw_count = Column(Integer, nullable=False, default=0)
+    rounds_total = Column(Integer, nullable=False, default=0)
+    damage_to_player_total = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DeathStats(Base):
+    """Nombre de parties d'un livre terminées par une mort à un paragraphe (voir analytics.py)."""
+
+    __tablename__ = "death_stats"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    paragraph = Column(Integer, primary_key=True)  # Dernier paragraphe visité par la feuille
+    death_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CombatSession(Base):
+    """Modèle pour un combat en cours conservé côté serveur."""
+
+    __tablename__ = "combat_sessions"
+
+    id = Column(String(32), primary_key=True)
+    sheet_id = Column(Integer, nullable=False)
+    state = Column(Text, nullable=False)  # CombatState sérialisé en JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class DataVersion(Base):
+    """Compteur de modifications d'une table, incrémenté par des triggers SQLite à chaque écriture."""
+
+    __tablename__ = "data_versions"
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
 
 
 # Modèles Pydantic pour l'API
@@ -157,12 +461,36 @@ class AdventureSheetUpdate(BaseModel):
     potions: str | None = None
     provisions: str | None = None
     equipment: str | None = None
-    monster_encounters: str | None = None
-    active_combats: str | None = None
-    combat_history: str | None = None
     is_active: bool | None = None
     notes: str | None = None
 
+    @field_validator("current_skill", "current_stamina", "current_luck", "is_active")
+    @classmethod
+    def reject_null(cls, value: object) -> object:
+        """Refuse null pour les champs obligatoires : un champ absent n'est pas modifié, null ne l'efface pas."""
+        if value is None:
+            raise ValueError("Ce champ ne peut pas être null")
+        return value
+
+
+class SheetPatchOperation(BaseModel):
+    """Opération élémentaire sur un champ d'une feuille d'aventure.
+
+    - "set" : remplace la valeur du champ
+    - "inc" : ajoute `value` (négatif pour retirer) à un champ numérique, sans descendre sous 0
+    - "append" : ajoute `value` à la fin d'un champ texte
+    """
+
+    op: Literal["set", "inc", "append"]
+    field: str
+    value: int | bool | str | None = None
+
+
+class AdventureSheetPatchOps(BaseModel):
+    """Modèle pour modifier une feuille d'aventure par une liste d'opérations."""
+
+    ops: list[SheetPatchOperation] = Field(min_length=1, max_length=50)
+
 
 class AdventureSheetResponse(BaseModel):
     """Modèle de réponse pour une feuille d'aventure."""
@@ -182,9 +510,6 @@ class AdventureSheetResponse(BaseModel):
     potions: str | None = None
     provisions: str | None = None
     equipment: str | None = None
-    monster_encounters: str | None = None
-    active_combats: str | None = None
-    combat_history: str | None = None
     is_active: bool
     notes: str | None = None
     created_at: datetime
@@ -194,14 +519,303 @@ class AdventureSheetResponse(BaseModel):
         from_attributes = True
 
 
+class AdventureSheetDetailResponse(AdventureSheetResponse):
+    """Feuille d'aventure avec les objets liés demandés par `include=`."""
+
+    book: BookResponse | None = None
+    series: SeriesResponse | None = None
+    encounters: list["EncounterResponse"] | None = None
+
+
+class SheetStateResponse(AdventureSheetResponse):
+    """État d'une feuille d'aventure reconstruit à partir de son journal d'événements."""
+
+    sequence: int  # Dernier événement appliqué
+
+
+class SheetEventResponse(BaseModel):
+    """Modèle de réponse pour un événement d'une feuille d'aventure."""
+
+    id: int
+    sheet_id: int
+    sequence: int
+    kind: str
+    field: str | None = None
+    delta: int | None = None
+    value: Any = None
+    combat_id: int | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("value", mode="before")
+    @classmethod
+    def decode_value(cls, value: object) -> object:
+        """Décode la valeur JSON stockée en base."""
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class EncounterCreate(BaseModel):
+    """Modèle pour créer ou modifier une rencontre de monstre."""
+
+    name: str | None = Field(default=None, max_length=100)
+    paragraph: int | None = None
+    skill: int | None = None
+    stamina: int | None = None
+    position: int | None = None  # Si None, ajoutée en fin de liste
+
+
+class EncounterResponse(BaseModel):
+    """Modèle de réponse pour une rencontre de monstre."""
+
+    id: int
+    sheet_id: int
+    position: int
+    name: str | None = None
+    paragraph: int | None = None
+    skill: int | None = None
+    stamina: int | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class CombatRecordResponse(BaseModel):
+    """Modèle de réponse pour un combat enregistré."""
+
+    id: int
+    sheet_id: int
+    monster_name: str
+    monster_skill: int
+    monster_max_stamina: int
+    is_active: bool
+    winner: str | None = None
+    rounds_fought: int
+    final_player_stamina: int | None = None
+    final_monster_stamina: int | None = None
+    final_player_luck: int | None = None
+    rng_seed: int | None = None
+    started_at: datetime
+    completed_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class SeriesStats(BaseModel):
+    """Statistiques d'une série pour le tableau de bord."""
+
+    id: int
+    name: str
+    description: str | None = None
+    created_at: datetime
+    book_count: int
+    sheet_count: int
+    active_sheet_count: int
+    finished_sheet_count: int
+
+
+class DashboardStats(BaseModel):
+    """Statistiques globales pour le tableau de bord."""
+
+    series_count: int
+    book_count: int
+    sheet_count: int
+    active_sheet_count: int
+    finished_sheet_count: int
+    series: list[SeriesStats]  # Triées par nombre de feuilles décroissant
+
+
+class BookAnalytics(BaseModel):
+    """Statistiques des parties jouées dans un livre."""
+
+    book_id: int
+    attempt_count: int
+    finished_count: int
+    death_count: int
+    completed_count: int
+    death_rate: float | None = None  # Part des feuilles terminées par une mort
+    average_attempts_to_complete: float | None = None  # Numéro de tentative moyen des parties terminées en vie
+
+
+class MonsterAnalytics(BaseModel):
+    """Statistiques des combats contre un monstre."""
+
+    monster_name: str
+    combat_count: int
+    player_win_count: int
+    monster_win_count: int
+    draw_count: int
+    lethality: float  # Part des combats perdus par le joueur
+    average_rounds: float
+    average_damage_to_player: float
+
+
+class MonsterSuggestion(BaseModel):
+    """Monstre du bestiaire proposé pendant la saisie."""
+
+    id: int
+    book_id: int
+    name: str
+    skill: int | None = None
+    stamina: int | None = None
+    paragraph: int | None = None
+    use_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class DeathLocation(BaseModel):
+    """Paragraphe où des parties d'un livre se sont terminées par une mort."""
+
+    paragraph: int
+    death_count: int
+    share: float  # Part des morts du livre survenues à ce paragraphe
+
+
+class ParagraphCreate(BaseModel):
+    """Modèle pour un paragraphe du graphe d'un livre."""
+
+    number: int = Field(..., ge=1)
+    ending: Literal["death", "victory"] | None = None
+
+
+class ParagraphEdgeCreate(BaseModel):
+    """Modèle pour un choix du graphe d'un livre, entre deux numéros de paragraphe."""
+
+    source: int = Field(..., ge=1)
+    target: int = Field(..., ge=1)
+    label: str | None = Field(default=None, max_length=200)
+
+
+class BookGraphUpdate(BaseModel):
+    """Modèle pour remplacer le graphe d'un livre (les paragraphes cités par un choix sont créés)."""
+
+    paragraphs: list[ParagraphCreate] = Field(default_factory=list)
+    edges: list[ParagraphEdgeCreate] = Field(default_factory=list)
+
+
+class BookGraphResponse(BookGraphUpdate):
+    """Modèle de réponse pour le graphe d'un livre."""
+
+    book_id: int
+
+
+class ParagraphVisitCreate(BaseModel):
+    """Modèle pour noter le paragraphe où se trouve le personnage."""
+
+    paragraph: int = Field(..., ge=1)
+
+
+class ParagraphVisitResponse(BaseModel):
+    """Modèle de réponse pour un paragraphe visité."""
+
+    position: int
+    paragraph: int
+    created_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class ParagraphRoute(BaseModel):
+    """Plus court chemin entre deux paragraphes du graphe d'un livre."""
+
+    source: int
+    target: int
+    paragraphs: list[int]  # Paragraphes du chemin, départ et arrivée compris
+    length: int  # Nombre de choix à faire
+
+
+class ReachableParagraph(BaseModel):
+    """Paragraphe accessible depuis le paragraphe courant."""
+
+    number: int
+    distance: int  # Nombre minimal de choix pour l'atteindre
+    ending: Literal["death", "victory"] | None = None
+
+
+class SearchHit(BaseModel):
+    """Résultat d'une recherche plein texte."""
+
+    kind: Literal["book", "sheet", "encounter", "combat"]
+    id: int  # ID du livre, de la feuille, de la rencontre ou du combat
+    sheet_id: int | None = None  # Feuille concernée (None pour un livre)
+    title: str
+    snippet: str  # Extrait du texte, termes trouvés entre crochets
+    score: float  # Pertinence (bm25), la plus élevée en premier
+
+
+class ArchiveResult(BaseModel):
+    """Résultat d'un archivage des feuilles terminées."""
+
+    archived: int  # Nombre de feuilles archivées
+    codec: str
+    older_than_days: int
+    vacuumed: bool
+
+
+class ImportResult(BaseModel):
+    """Résultat d'un import en masse."""
+
+    mode: Literal["keep", "remap"]
+    counts: dict[str, int]  # Nombre d'enregistrements importés par table
+
+
+class CatalogCacheStats(BaseModel):
+    """Compteurs du cache du catalogue (séries et livres)."""
+
+    hits: int  # Lectures servies par la copie en mémoire
+    misses: int  # Lectures qui ont rechargé le catalogue
+    invalidations: int  # Invalidations après une écriture locale
+    loaded: bool
+    series_count: int
+    book_count: int
+
+
 class DiceRoll(BaseModel):
-    """Modèle pour un lancer de dés."""
+    """Modèle pour un lancer de dés.
+
+    Soit `dice_count` dés identiques, soit une expression comme "3d6+2" ou "4d6kh3".
+    """
 
-    dice_count: int = Field(..., ge=1, le=10)
+    dice_count: int | None = Field(default=None, ge=1, le=10)
     sides: int = Field(default=6, ge=2, le=100)
+    expression: str | None = Field(default=None, max_length=100)
+    times: int = Field(default=1, ge=1, le=10_000)  # Nombre d'évaluations de l'expression
+    distribution: bool = False  # Inclure la distribution exacte des résultats
+
+    @model_validator(mode="after")
+    def check_dice(self) -> "DiceRoll":
+        """Vérifie qu'un nombre de dés ou une expression est fourni."""
+        if self.dice_count is None and self.expression is None:
+            raise ValueError("dice_count ou expression est requis")
+        return self
+
+
+class DiceBulkRequest(BaseModel):
+    """Modèle pour un tirage massif de dés renvoyé en flux."""
+
+    expression: str | None = Field(default=None, max_length=100)  # Si absente : statistiques initiales
+    samples: int = Field(..., ge=1, le=100_000_000)
+    output: Literal["ndjson", "histogram"] = "ndjson"
+    chunk_size: int = Field(default=100_000, ge=1, le=1_000_000)
+    seed: int | None = Field(default=None, ge=0)
 
 
 # Modèles pour le système de combat
+class LuckPolicy(StrEnum):
+    """Stratégie de test de chance appliquée à chaque round de combat."""
+
+    NEVER = "never"  # Ne jamais tenter sa chance
+    ALWAYS = "always"  # Tenter sa chance à chaque round, tant qu'il reste de la chance
+    ON_WIN = "on_win"  # Tenter sa chance uniquement quand le joueur remporte le round
+    ON_LOSS = "on_loss"  # Tenter sa chance uniquement quand le joueur perd le round
+    OPTIMAL = "optimal"  # Décision optimale calculée par le solveur exact
+
+
 class CombatState(BaseModel):
     """État d'un combat en cours."""
 
@@ -219,6 +833,12 @@ class CombatState(BaseModel):
     is_active: bool = True
     winner: str | None = None  # "player", "monster", ou None si combat en cours
 
+    combat_id: str | None = None  # Identifiant de la session de combat côté serveur
+
+    # Flux de dés du combat : la graine et la position permettent de rejouer le combat
+    rng_seed: int | None = None
+    rng_offset: int = 0
+
 
 class CombatRoundResult(BaseModel):
     """Résultat d'un round de combat."""
@@ -259,11 +879,71 @@ class CombatAction(BaseModel):
     """Action du joueur pour un round de combat."""
 
     attempt_luck: bool = False
+    luck_policy: LuckPolicy | None = None  # Si fournie, remplace `attempt_luck` à chaque round
+
+
+class CombatRoundRequest(BaseModel):
+    """Requête d'exécution de rounds pour un combat stocké côté serveur."""
+
+    combat_id: str
+    action: CombatAction = Field(default_factory=CombatAction)
+
+
+class CombatReplayRequest(BaseModel):
+    """Données pour rejouer un combat à l'identique."""
+
+    initial_state: CombatState  # État au début du combat (avec sa graine)
+    actions: list[CombatAction] = Field(..., max_length=1000)  # Action de chaque round
+
+
+# Caractéristiques maximales acceptées pour un monstre ou un joueur en combat
+MAX_COMBAT_SKILL = 99
+MAX_COMBAT_STAMINA = 999
+MAX_COMBAT_LUCK = 99
 
 
 class CombatStart(BaseModel):
     """Données pour commencer un combat."""
 
     monster_name: str
-    monster_skill: int
-    monster_stamina: int
+    monster_skill: int = Field(..., ge=0, le=MAX_COMBAT_SKILL)
+    monster_stamina: int = Field(..., ge=0, le=MAX_COMBAT_STAMINA)
+
+
+class CombatSimulationRequest(CombatStart):
+    """Paramètres d'une simulation de Monte-Carlo d'un combat."""
+
+    luck_policy: LuckPolicy = LuckPolicy.NEVER
+    simulations: int = Field(default=100_000, ge=1, le=1_000_000)
+    max_rounds: int = Field(default=200, ge=1, le=1000)
+    seed: int | None = Field(default=None, ge=0)
+
+
+class CombatSimulationResult(BaseModel):
+    """Résultat agrégé d'une simulation de combats."""
+
+    simulations: int
+    luck_policy: LuckPolicy
+
+    win_probability: float
+    loss_probability: float
+    unfinished_probability: float  # Combats interrompus par la limite de rounds
+
+    expected_rounds: float
+    expected_player_luck_after: float
+
+    # Probabilité de chaque valeur d'endurance restante du joueur (0 = défaite)
+    player_stamina_distribution: dict[int, float]
+
+
+class CombatOdds(BaseModel):
+    """Chances exactes de victoire pour un état de combat."""
+
+    win_probability: float  # Avec la stratégie de chance optimale
+    win_probability_without_luck: float  # Sans jamais tenter sa chance
+    attempt_luck: bool  # Recommandation pour le prochain round
+
+    # Probabilités du prochain assaut
+    round_win_probability: float
+    round_loss_probability: float
+    round_draw_probability: float
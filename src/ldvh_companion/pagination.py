@@ -0,0 +1,108 @@
+"""Pagination par clé (keyset) et projection de champs pour les routes de liste.
+
+Une page est ordonnée par une clé unique (par exemple `(book_id, attempt_number)`
+pour les feuilles d'aventure). Le curseur de la page suivante encode la clé de
+la dernière ligne renvoyée : la page suivante est lue par un simple parcours
+d'index à partir de cette clé, quelle que soit sa profondeur, là où un OFFSET
+relirait toutes les lignes précédentes.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Iterable
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+# Taille maximale d'une page
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: Iterable[object]) -> str:
+    """Encode une clé de pagination en curseur opaque."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[int]:
+    """Décode un curseur produit par `encode_cursor`.
+
+    Args:
+        cursor: Curseur opaque
+        size: Nombre de colonnes de la clé
+
+    Returns:
+        Valeurs de la clé
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+
+    if not isinstance(values, list) or len(values) != size or not all(type(value) is int for value in values):
+        raise ValueError("Curseur de pagination invalide")
+    return values
+
+
+def parse_fields(fields: str | None, allowed: Iterable[str], parameter: str = "fields") -> list[str] | None:
+    """Analyse un paramètre liste tel que `fields=a,b,c` ou `include=book,series`.
+
+    Args:
+        fields: Valeurs séparées par des virgules, ou None si le paramètre est absent
+        allowed: Valeurs autorisées
+        parameter: Nom du paramètre, pour les messages d'erreur
+
+    Returns:
+        Valeurs demandées, dans l'ordre et sans doublons, ou None si le paramètre est absent
+
+    Raises:
+        ValueError: Si une valeur est inconnue ou si la liste est vide
+    """
+    if fields is None:
+        return None
+
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    if not requested:
+        raise ValueError(f"Le paramètre {parameter} ne contient aucune valeur")
+
+    unknown = [field for field in requested if field not in set(allowed)]
+    if unknown:
+        raise ValueError(f"Valeurs inconnues pour {parameter} : {', '.join(unknown)}")
+    return requested
+
+
+def fetch_page(
+    query: Query, key_columns: list[InstrumentedAttribute], limit: int | None, cursor: str | None
+) -> tuple[list, str | None]:
+    """Applique l'ordre de la clé, le curseur et la limite à une requête.
+
+    Args:
+        query: Requête filtrée ; ses lignes doivent exposer les colonnes de la clé
+        key_columns: Colonnes de la clé de pagination (clé unique)
+        limit: Taille de la page, ou None pour toutes les lignes
+        cursor: Curseur de la page à lire, ou None pour la première
+
+    Returns:
+        Tuple (lignes de la page, curseur de la page suivante ou None si c'est la dernière)
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor, len(key_columns))
+        query = query.filter(tuple_(*key_columns) > tuple_(*values))
+
+    query = query.order_by(*key_columns)
+    if limit is None:
+        return query.all(), None
+
+    # Lire une ligne de plus pour savoir s'il reste une page
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], column.key) for column in key_columns)
@@ -0,0 +1,170 @@
+"""Recherche plein texte (SQLite FTS5) dans les livres, les feuilles, les rencontres et les combats.
+
+La table virtuelle `search_index` contient un document par livre (titre et
+description), par feuille d'aventure (nom du personnage, inventaire et notes),
+par rencontre et par combat (nom du monstre). Elle est tenue à jour par des
+triggers sur les tables sources : une écriture, un import ou une suppression en
+cascade met l'index à jour dans la même transaction.
+
+Le rowid d'un document encode sa source (`id * 4 + code du type`) : un trigger
+retrouve le document à remplacer ou à supprimer sans parcourir l'index. Les
+feuilles archivées ne sont plus indexées.
+"""
+
+import re
+
+from sqlalchemy import Connection, text
+from sqlalchemy.orm import Session
+
+from .models import SearchHit
+
+# Types de documents : table source, colonne de la feuille liée, colonnes du titre et du corps.
+# L'ordre donne le code du type dans le rowid ; ne pas le modifier sans reconstruire l'index.
+SEARCH_SOURCES: dict[str, tuple[str, str | None, tuple[str, ...], tuple[str, ...]]] = {
+    "book": ("books", None, ("title",), ("description",)),
+    "sheet": (
+        "adventure_sheets",
+        "id",
+        ("character_name",),
+        ("notes", "equipment", "potions", "jewelry", "provisions"),
+    ),
+    "encounter": ("encounters", "sheet_id", ("name",), ()),
+    "combat": ("combats", "sheet_id", ("monster_name",), ()),
+}
+SEARCH_KIND_COUNT = 4
+
+# Marqueurs des termes trouvés dans les extraits, et nombre de mots par extrait
+SNIPPET_MARKERS = ("[", "]")
+SNIPPET_TOKENS = 12
+
+# Poids du titre et du corps dans le classement bm25
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+
+def _text_expression(columns: tuple[str, ...], prefix: str) -> str:
+    """Expression SQL qui concatène des colonnes texte (NULL ignoré)."""
+    if not columns:
+        return "''"
+    return "trim(" + " || ' ' || ".join(f"coalesce({prefix}{column}, '')" for column in columns) + ")"
+
+
+def _document_select(kind: str, prefix: str) -> str:
+    """Valeurs (rowid, kind, sheet_id, title, body) du document d'une ligne source."""
+    _, sheet_column, title_columns, body_columns = SEARCH_SOURCES[kind]
+    code = list(SEARCH_SOURCES).index(kind)
+    sheet_id = f"{prefix}{sheet_column}" if sheet_column else "NULL"
+    return (
+        f"{prefix}id * {SEARCH_KIND_COUNT} + {code}, '{kind}', {sheet_id}, "
+        f"{_text_expression(title_columns, prefix)}, {_text_expression(body_columns, prefix)}"
+    )
+
+
+def search_index_exists(connection: Connection) -> bool:
+    """Indique si la table `search_index` existe."""
+    row = connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"))
+    return row.first() is not None
+
+
+def create_search_index(connection: Connection) -> bool:
+    """Crée l'index plein texte (rempli à partir des tables existantes) et ses triggers.
+
+    Args:
+        connection: Connexion dans une transaction
+
+    Returns:
+        True si l'index vient d'être créé
+
+    Raises:
+        OperationalError: Si SQLite a été compilé sans FTS5
+    """
+    created = not search_index_exists(connection)
+    if created:
+        connection.execute(
+            text(
+                "CREATE VIRTUAL TABLE search_index USING fts5("
+                "kind UNINDEXED, sheet_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        )
+
+    for kind, (table, _, title_columns, body_columns) in SEARCH_SOURCES.items():
+        code = list(SEARCH_SOURCES).index(kind)
+        if created:
+            connection.execute(
+                text(
+                    "INSERT INTO search_index (rowid, kind, sheet_id, title, body) "
+                    f"SELECT {_document_select(kind, '')} FROM {table}"
+                )
+            )
+
+        insert_document = (
+            f"INSERT INTO search_index (rowid, kind, sheet_id, title, body) VALUES ({_document_select(kind, 'new.')});"
+        )
+        delete_document = f"DELETE FROM search_index WHERE rowid = old.id * {SEARCH_KIND_COUNT} + {code};"
+        watched = ", ".join(("id", *title_columns, *body_columns))
+        triggers = {
+            "insert": ("INSERT", insert_document),
+            "update": (f"UPDATE OF {watched}", f"{delete_document} {insert_document}"),
+            "delete": ("DELETE", delete_document),
+        }
+        for operation, (event, statements) in triggers.items():
+            connection.execute(
+                text(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation}_search "
+                    f"AFTER {event} ON {table} FOR EACH ROW BEGIN {statements} END"
+                )
+            )
+
+    return created
+
+
+def build_match_query(query: str) -> str:
+    """Traduit une saisie libre en requête FTS5 : tous les mots, chacun comme préfixe.
+
+    Raises:
+        ValueError: Si la saisie ne contient aucun mot
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        raise ValueError("La recherche ne contient aucun mot")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(
+    db: Session, query: str, kinds: list[str] | None = None, limit: int = 20, offset: int = 0
+) -> tuple[list[SearchHit], bool]:
+    """Recherche les documents correspondant à une saisie, du plus au moins pertinent.
+
+    Args:
+        db: Session de base de données
+        query: Saisie libre
+        kinds: Types de documents à retourner (tous par défaut)
+        limit: Nombre maximal de résultats
+        offset: Nombre de résultats à sauter
+
+    Returns:
+        (résultats, True s'il reste des résultats après cette page)
+
+    Raises:
+        ValueError: Si la saisie ne contient aucun mot
+    """
+    parameters = {"match": build_match_query(query), "limit": limit + 1, "offset": offset}
+    kind_filter = ""
+    if kinds:
+        kind_filter = f"AND kind IN ({', '.join(f':kind_{i}' for i in range(len(kinds)))})"
+        parameters.update({f"kind_{i}": kind for i, kind in enumerate(kinds)})
+
+    start, end = SNIPPET_MARKERS
+    rows = db.execute(
+        text(
+            f"SELECT kind, rowid / {SEARCH_KIND_COUNT} AS id, sheet_id, title, "
+            f"snippet(search_index, -1, '{start}', '{end}', '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"-bm25(search_index, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM search_index WHERE search_index MATCH :match {kind_filter} "
+            "ORDER BY score DESC, rowid LIMIT :limit OFFSET :offset"
+        ),
+        parameters,
+    ).mappings()
+
+    hits = [SearchHit.model_validate(row) for row in rows]
+    return hits[:limit], len(hits) > limit
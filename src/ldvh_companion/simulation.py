@@ -0,0 +1,143 @@
+"""Simulation de Monte-Carlo vectorisée des combats.
+
+Les règles sont celles de `utils.execute_combat_round`, mais appliquées à des
+milliers de combats à la fois avec NumPy : chaque itération résout un round
+pour tous les combats encore en cours.
+"""
+
+import numpy as np
+
+from .models import MAX_COMBAT_LUCK, MAX_COMBAT_SKILL, MAX_COMBAT_STAMINA, CombatSimulationResult, LuckPolicy
+from .solver import luck_decision_table
+
+
+def _roll_2d6(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Lance `count` fois 2d6 et retourne les sommes."""
+    dice = rng.integers(1, 7, size=(2, count), dtype=np.int16)
+    return dice[0] + dice[1]
+
+
+def simulate_combats(
+    player_skill: int,
+    player_stamina: int,
+    player_luck: int,
+    monster_skill: int,
+    monster_stamina: int,
+    luck_policy: LuckPolicy = LuckPolicy.NEVER,
+    simulations: int = 100_000,
+    max_rounds: int = 200,
+    rng: np.random.Generator | None = None,
+) -> CombatSimulationResult:
+    """Simule un grand nombre de combats identiques.
+
+    Args:
+        player_skill: Habileté du joueur
+        player_stamina: Endurance actuelle du joueur
+        player_luck: Chance actuelle du joueur
+        monster_skill: Habileté du monstre
+        monster_stamina: Endurance du monstre
+        luck_policy: Stratégie de test de chance
+        simulations: Nombre de combats à simuler
+        max_rounds: Nombre maximal de rounds par combat
+        rng: Générateur NumPy à utiliser (défaut: nouveau générateur)
+
+    Returns:
+        Probabilités de victoire et distribution de l'endurance restante
+
+    Raises:
+        ValueError: Si une caractéristique dépasse les bornes acceptées en combat
+    """
+    limits = {
+        "Habileté": (max(player_skill, monster_skill), MAX_COMBAT_SKILL),
+        "Endurance": (max(player_stamina, monster_stamina), MAX_COMBAT_STAMINA),
+        "Chance": (player_luck, MAX_COMBAT_LUCK),
+    }
+    for label, (value, limit) in limits.items():
+        if value > limit:
+            raise ValueError(f"{label} doit être inférieure ou égale à {limit}")
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    skill_difference = player_skill - monster_skill
+
+    decisions = None
+    if luck_policy == LuckPolicy.OPTIMAL:
+        decisions = luck_decision_table(
+            skill_difference, max(0, player_stamina), max(0, monster_stamina), max(0, player_luck)
+        )
+
+    # États des combats encore en cours (tableaux compacts)
+    player = np.full(simulations, max(0, player_stamina), dtype=np.int32)
+    monster = np.full(simulations, max(0, monster_stamina), dtype=np.int32)
+    luck = np.full(simulations, max(0, player_luck), dtype=np.int32)
+
+    wins = 0
+    losses = 0
+    rounds_total = 0
+    luck_total = 0
+    stamina_counts = np.zeros(max(0, player_stamina) + 1, dtype=np.int64)
+
+    for round_number in range(max_rounds + 1):
+        # Retirer les combats terminés et accumuler leurs résultats
+        ended = (player <= 0) | (monster <= 0)
+        if ended.any():
+            finished_player = player[ended]
+            won = finished_player > 0
+            wins += int(won.sum())
+            losses += int(ended.sum()) - int(won.sum())
+            rounds_total += int(ended.sum()) * round_number
+            luck_total += int(luck[ended].sum())
+            stamina_counts += np.bincount(finished_player, minlength=stamina_counts.size)
+
+            still_active = ~ended
+            player = player[still_active]
+            monster = monster[still_active]
+            luck = luck[still_active]
+
+        if player.size == 0 or round_number == max_rounds:
+            break
+
+        count = player.size
+        attack_difference = skill_difference + _roll_2d6(rng, count) - _roll_2d6(rng, count)
+        player_wins = attack_difference > 0
+        monster_wins = attack_difference < 0
+
+        # Déterminer quels combats tentent leur chance ce round
+        if luck_policy == LuckPolicy.ALWAYS:
+            tested = luck > 0
+        elif luck_policy == LuckPolicy.ON_WIN:
+            tested = player_wins & (luck > 0)
+        elif luck_policy == LuckPolicy.ON_LOSS:
+            tested = monster_wins & (luck > 0)
+        elif decisions is not None:
+            tested = decisions[player, monster, luck]
+        else:
+            tested = np.zeros(count, dtype=bool)
+
+        lucky = tested & (_roll_2d6(rng, count) <= luck)
+        unlucky = tested & ~lucky
+        luck_adjustment = lucky.astype(np.int32) - unlucky.astype(np.int32)
+
+        damage_to_monster = np.where(player_wins, 2 + luck_adjustment, 0)
+        damage_to_player = np.where(monster_wins, 2 - luck_adjustment, 0)
+
+        player = np.maximum(player - damage_to_player, 0).astype(np.int32)
+        monster = np.maximum(monster - damage_to_monster, 0).astype(np.int32)
+        luck = luck - tested
+
+    finished = wins + losses
+    unfinished = simulations - finished
+
+    distribution = {stamina: count / simulations for stamina, count in enumerate(stamina_counts.tolist()) if count > 0}
+
+    return CombatSimulationResult(
+        simulations=simulations,
+        luck_policy=luck_policy,
+        win_probability=wins / simulations,
+        loss_probability=losses / simulations,
+        unfinished_probability=unfinished / simulations,
+        expected_rounds=rounds_total / finished if finished else float(max_rounds),
+        expected_player_luck_after=luck_total / finished if finished else float(player_luck),
+        player_stamina_distribution=distribution,
+    )
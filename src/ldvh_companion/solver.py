@@ -0,0 +1,235 @@
+"""Résolution exacte des combats par chaîne de Markov.
+
+L'état d'un combat est (endurance du joueur, endurance du monstre, chance du
+joueur) pour une différence d'habileté donnée. Les probabilités d'un assaut
+(2d6 contre 2d6) et d'un test de chance (2d6 <= chance) sont connues, ce qui
+permet de calculer par programmation dynamique la probabilité exacte de
+victoire et la meilleure décision "tenter sa chance ou non" pour chaque état,
+avec les mêmes règles que `utils.execute_combat_round` : la décision est prise
+avant le lancer, et un test tenté lors d'une égalité consomme la chance sans
+effet.
+
+Pour un écart d'habileté, tous les états bornés par MAX_SOLVER_STAMINA et
+MAX_SOLVER_LUCK sont résolus d'un coup, de bas en haut avec NumPy, et gardés en
+mémoire : une requête n'est ensuite qu'une lecture dans ces tables.
+"""
+
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
+
+from .models import CombatOdds
+
+# Endurance et chance maximales couvertes par les tables du solveur. Au-delà de 12
+# (son maximum au départ), la chance ne vient que de bonus : 24 laisse de la marge.
+MAX_SOLVER_STAMINA = 99
+MAX_SOLVER_LUCK = 24
+
+# Au-delà de cet écart d'habileté, l'issue d'un assaut est certaine (2 + écart > 12)
+MAX_SKILL_DIFFERENCE = 11
+
+# Nombre de tables gardées en cache : une par écart d'habileté, soit tout l'espace des états
+# (environ 2,3 Mo par table)
+SOLVER_CACHE_SIZE = 2 * MAX_SKILL_DIFFERENCE + 1
+
+
+def _two_dice_counts() -> dict[int, int]:
+    """Nombre de combinaisons pour chaque somme de 2d6."""
+    counts: dict[int, int] = {}
+    for first, second in product(range(1, 7), repeat=2):
+        counts[first + second] = counts.get(first + second, 0) + 1
+    return counts
+
+
+_TWO_DICE = _two_dice_counts()
+
+
+@lru_cache(maxsize=64)
+def round_probabilities(skill_difference: int) -> tuple[float, float, float]:
+    """Probabilités qu'un assaut soit gagné, perdu ou nul pour le joueur.
+
+    Args:
+        skill_difference: Habileté du joueur moins habileté du monstre
+
+    Returns:
+        Tuple (victoire, défaite, égalité)
+    """
+    win = loss = draw = 0
+    for player_roll, player_count in _TWO_DICE.items():
+        for monster_roll, monster_count in _TWO_DICE.items():
+            difference = skill_difference + player_roll - monster_roll
+            combinations = player_count * monster_count
+            if difference > 0:
+                win += combinations
+            elif difference < 0:
+                loss += combinations
+            else:
+                draw += combinations
+    return win / 1296, loss / 1296, draw / 1296
+
+
+def luck_success_probability(luck: int) -> float:
+    """Probabilité de réussir un test de chance (2d6 <= chance)."""
+    return sum(count for total, count in _TWO_DICE.items() if total <= luck) / 36
+
+
+def solver_bounds_exceeded(player_stamina: int, monster_stamina: int, luck: int) -> str | None:
+    """Retourne le motif du refus si un état dépasse les bornes du solveur, None sinon."""
+    if max(player_stamina, monster_stamina) > MAX_SOLVER_STAMINA:
+        return f"L'endurance doit être inférieure ou égale à {MAX_SOLVER_STAMINA}"
+    if luck > MAX_SOLVER_LUCK:
+        return f"La chance doit être inférieure ou égale à {MAX_SOLVER_LUCK}"
+    return None
+
+
+@lru_cache(maxsize=SOLVER_CACHE_SIZE)
+def _solve_tables(skill_difference: int) -> tuple[np.ndarray, np.ndarray]:
+    """Résout tous les états couverts d'un écart d'habileté : tables [endurance joueur, endurance monstre, chance].
+
+    Les tables sont remplies de bas en haut, une chance à la fois : tenter sa chance
+    mène à la couche de chance précédente, déjà calculée, et ne pas la tenter mène
+    à un état de la même couche dont la somme des endurances est plus petite de 2.
+    Une couche est donc parcourue par diagonales (somme des endurances constante),
+    chacune calculée en une seule opération NumPy.
+
+    Args:
+        skill_difference: Habileté du joueur moins habileté du monstre
+
+    Returns:
+        Tuple (probabilité de victoire avec la stratégie optimale, tenter sa chance), en lecture seule
+    """
+    win, loss, draw = round_probabilities(skill_difference)
+    size = MAX_SOLVER_STAMINA + 1
+    values = np.zeros((size, size, MAX_SOLVER_LUCK + 1))
+    decisions = np.zeros(values.shape, dtype=bool)
+    values[1:, 0, :] = 1.0  # Monstre vaincu, joueur vivant
+
+    def minus(indices: np.ndarray, damage: int) -> np.ndarray:
+        return np.maximum(indices - damage, 0)
+
+    # États en cours (endurances >= 1), par diagonale
+    diagonals = []
+    for total in range(2, 2 * MAX_SOLVER_STAMINA + 1):
+        player = np.arange(max(1, total - MAX_SOLVER_STAMINA), min(MAX_SOLVER_STAMINA, total - 1) + 1)
+        diagonals.append((player, total - player))
+    player, monster = np.meshgrid(np.arange(1, size), np.arange(1, size), indexing="ij")
+
+    for luck in range(MAX_SOLVER_LUCK + 1):
+        layer = values[:, :, luck]
+        with_luck = None
+        if luck > 0:
+            # Tenter sa chance : valeurs de la couche précédente, pour tous les états à la fois
+            previous = values[:, :, luck - 1]
+            success = luck_success_probability(luck)
+            with_luck = np.zeros((size, size))
+            with_luck[1:, 1:] = (
+                win
+                * (success * previous[player, minus(monster, 3)] + (1 - success) * previous[player, minus(monster, 1)])
+                + loss
+                * (success * previous[minus(player, 1), monster] + (1 - success) * previous[minus(player, 3), monster])
+                + draw * previous[player, monster]
+            )
+
+        for player_diagonal, monster_diagonal in diagonals:
+            # Sans test de chance, une égalité ramène au même état : on résout la boucle directement
+            without_luck = (
+                win * layer[player_diagonal, minus(monster_diagonal, 2)]
+                + loss * layer[minus(player_diagonal, 2), monster_diagonal]
+            ) / (1 - draw)
+            if with_luck is None:
+                layer[player_diagonal, monster_diagonal] = without_luck
+                continue
+            lucky = with_luck[player_diagonal, monster_diagonal]
+            attempt = lucky > without_luck
+            layer[player_diagonal, monster_diagonal] = np.where(attempt, lucky, without_luck)
+            decisions[player_diagonal, monster_diagonal, luck] = attempt
+
+    values.setflags(write=False)
+    decisions.setflags(write=False)
+    return values, decisions
+
+
+def solve_state(skill_difference: int, player_stamina: int, monster_stamina: int, luck: int) -> tuple[float, bool]:
+    """Résout un état de combat (lecture dans la table de son écart d'habileté).
+
+    Args:
+        skill_difference: Habileté du joueur moins habileté du monstre
+        player_stamina: Endurance du joueur (entre 0 et MAX_SOLVER_STAMINA)
+        monster_stamina: Endurance du monstre (entre 0 et MAX_SOLVER_STAMINA)
+        luck: Chance du joueur (entre 0 et MAX_SOLVER_LUCK)
+
+    Returns:
+        Tuple (probabilité de victoire avec la stratégie optimale, tenter sa chance ce round)
+    """
+    skill_difference = min(max(skill_difference, -MAX_SKILL_DIFFERENCE), MAX_SKILL_DIFFERENCE)
+    values, decisions = _solve_tables(skill_difference)
+    state = (player_stamina, monster_stamina, luck)
+    return float(values[state]), bool(decisions[state])
+
+
+def combat_odds(
+    player_skill: int, player_stamina: int, player_luck: int, monster_skill: int, monster_stamina: int
+) -> CombatOdds:
+    """Calcule les chances exactes de victoire et la recommandation pour le prochain round.
+
+    Args:
+        player_skill: Habileté du joueur
+        player_stamina: Endurance actuelle du joueur
+        player_luck: Chance actuelle du joueur
+        monster_skill: Habileté du monstre
+        monster_stamina: Endurance actuelle du monstre
+
+    Returns:
+        Probabilités exactes de victoire et décision recommandée
+
+    Raises:
+        ValueError: Si une endurance dépasse MAX_SOLVER_STAMINA ou la chance MAX_SOLVER_LUCK
+    """
+    error = solver_bounds_exceeded(player_stamina, monster_stamina, player_luck)
+    if error:
+        raise ValueError(error)
+
+    skill_difference = player_skill - monster_skill
+    player_stamina = max(0, player_stamina)
+    monster_stamina = max(0, monster_stamina)
+    player_luck = max(0, player_luck)
+
+    win_probability, attempt_luck = solve_state(skill_difference, player_stamina, monster_stamina, player_luck)
+    without_luck, _ = solve_state(skill_difference, player_stamina, monster_stamina, 0)
+    win, loss, draw = round_probabilities(skill_difference)
+
+    return CombatOdds(
+        win_probability=win_probability,
+        win_probability_without_luck=without_luck,
+        attempt_luck=attempt_luck,
+        round_win_probability=win,
+        round_loss_probability=loss,
+        round_draw_probability=draw,
+    )
+
+
+def luck_decision_table(
+    skill_difference: int, max_player_stamina: int, max_monster_stamina: int, max_luck: int
+) -> np.ndarray:
+    """Table des décisions optimales, indexée par [endurance joueur, endurance monstre, chance].
+
+    Args:
+        skill_difference: Habileté du joueur moins habileté du monstre
+        max_player_stamina: Endurance maximale du joueur couverte par la table
+        max_monster_stamina: Endurance maximale du monstre couverte par la table
+        max_luck: Chance maximale couverte par la table
+
+    Returns:
+        Tableau booléen en lecture seule, vrai quand il faut tenter sa chance
+
+    Raises:
+        ValueError: Si une endurance dépasse MAX_SOLVER_STAMINA ou la chance MAX_SOLVER_LUCK
+    """
+    error = solver_bounds_exceeded(max_player_stamina, max_monster_stamina, max_luck)
+    if error:
+        raise ValueError(error)
+
+    skill_difference = min(max(skill_difference, -MAX_SKILL_DIFFERENCE), MAX_SKILL_DIFFERENCE)
+    _, decisions = _solve_tables(skill_difference)
+    return decisions[: max_player_stamina + 1, : max_monster_stamina + 1, : max_luck + 1]
@@ -0,0 +1,136 @@
+"""Statistiques du tableau de bord, calculées en SQL et mises en cache.
+
+Les statistiques sont calculées par une seule requête d'agrégation. Le résultat
+est gardé en mémoire avec les versions des tables dont il dépend (table
+`data_versions`, incrémentée par des triggers à chaque écriture) : tant
+qu'aucune de ces tables n'a changé, la requête n'est pas rejouée, y compris
+quand l'écriture vient d'un autre worker.
+"""
+
+import threading
+
+from sqlalchemy import Integer, case, func, select
+from sqlalchemy.orm import Session
+
+from .models import AdventureSheet, ArchivedSheet, Book, DashboardStats, DataVersion, Series, SeriesStats
+
+# Tables suivies par la table data_versions (triggers créés par les migrations)
+VERSIONED_TABLES = (
+    "series",
+    "books",
+    "adventure_sheets",
+    "encounters",
+    "archived_sheets",
+    "sheet_events",
+    "book_stats",
+    "monster_stats",
+    "monsters",
+    "paragraphs",
+    "paragraph_edges",
+    "paragraph_visits",
+    "death_stats",
+)
+
+# Tables dont dépendent les statistiques du tableau de bord
+STATS_TABLES = ("series", "books", "adventure_sheets", "archived_sheets")
+
+_cache_lock = threading.Lock()
+_cached: tuple[tuple[int, ...], DashboardStats] | None = None
+
+
+def data_versions(db: Session, tables: tuple[str, ...] = VERSIONED_TABLES) -> tuple[int, ...]:
+    """Retourne les versions courantes des tables demandées, dans l'ordre.
+
+    Args:
+        db: Session de base de données
+        tables: Noms des tables suivies
+
+    Returns:
+        Versions des tables (0 pour une table sans compteur)
+    """
+    rows = dict(db.execute(select(DataVersion.table_name, DataVersion.version)).all())
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+def compute_dashboard_stats(db: Session) -> DashboardStats:
+    """Calcule les statistiques du tableau de bord par une requête d'agrégation.
+
+    Les feuilles archivées, toutes terminées, sont comptées par une seconde agrégation.
+
+    Args:
+        db: Session de base de données
+
+    Returns:
+        Totaux globaux et par série
+    """
+    active = func.sum(case((AdventureSheet.is_active.is_(True), 1), else_=0), type_=Integer)
+    rows = db.execute(
+        select(
+            Series.id,
+            Series.name,
+            Series.description,
+            Series.created_at,
+            func.count(func.distinct(Book.id)).label("book_count"),
+            func.count(AdventureSheet.id).label("sheet_count"),
+            func.coalesce(active, 0).label("active_sheet_count"),
+        )
+        .outerjoin(Book, Book.series_id == Series.id)
+        .outerjoin(AdventureSheet, AdventureSheet.book_id == Book.id)
+        .group_by(Series.id)
+        .order_by(func.count(AdventureSheet.id).desc(), Series.id)
+    ).all()
+
+    archived = dict(
+        db.execute(
+            select(Book.series_id, func.count(ArchivedSheet.id))
+            .join(Book, Book.id == ArchivedSheet.book_id)
+            .group_by(Book.series_id)
+        ).all()
+    )
+
+    series = [
+        SeriesStats(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            created_at=row.created_at,
+            book_count=row.book_count,
+            sheet_count=row.sheet_count + archived.get(row.id, 0),
+            active_sheet_count=row.active_sheet_count,
+            finished_sheet_count=row.sheet_count + archived.get(row.id, 0) - row.active_sheet_count,
+        )
+        for row in rows
+    ]
+    # L'ordre par nombre de feuilles inclut les feuilles archivées
+    series.sort(key=lambda item: (-item.sheet_count, item.id))
+
+    return DashboardStats(
+        series_count=len(series),
+        book_count=sum(item.book_count for item in series),
+        sheet_count=sum(item.sheet_count for item in series),
+        active_sheet_count=sum(item.active_sheet_count for item in series),
+        finished_sheet_count=sum(item.finished_sheet_count for item in series),
+        series=series,
+    )
+
+
+def get_dashboard_stats(db: Session) -> DashboardStats:
+    """Retourne les statistiques du tableau de bord, recalculées seulement si les données ont changé.
+
+    Args:
+        db: Session de base de données
+
+    Returns:
+        Statistiques du tableau de bord
+    """
+    global _cached
+
+    versions = data_versions(db, STATS_TABLES)
+    with _cache_lock:
+        if _cached is not None and _cached[0] == versions:
+            return _cached[1]
+
+    stats = compute_dashboard_stats(db)
+    with _cache_lock:
+        _cached = (versions, stats)
+    return stats
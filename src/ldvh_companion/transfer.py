@@ -0,0 +1,328 @@
+"""Export et import en masse de toutes les données, au format NDJSON.
+
+Un export est une suite de lignes JSON : une ligne d'en-tête, puis une ligne
+par enregistrement, table par table dans l'ordre des dépendances :
+
+    {"format": "ldvh-companion", "version": 1}
+    {"table": "series", "row": {"id": 1, "name": "...", ...}}
+    {"table": "books", "row": {"id": 1, "series_id": 1, ...}}
+
+L'export est lu par lots (`yield_per`) dans une seule transaction de lecture :
+la mémoire utilisée ne dépend pas du volume et l'instantané est cohérent. Les
+feuilles archivées y figurent décompressées, avec les feuilles courantes : un
+import les remet dans les tables courantes. Chaque archive n'est décompressée
+qu'une fois, ses lignes étant rangées par table dans des fichiers temporaires
+jusqu'à leur tour dans l'export.
+L'import accepte le même flux et l'insère par lots (executemany) dans une
+seule transaction d'écriture (`begin_write`) : tout est importé, ou rien. En
+mode remap, le catalogue déjà présent (séries de même nom, livres de même numéro
+dans la série, paragraphes et choix de leurs graphes) est réutilisé au lieu
+d'être recréé, et une feuille dont le numéro de tentative est déjà pris dans son
+livre reçoit le prochain numéro libre.
+"""
+
+import json
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import islice
+from typing import IO, Literal
+
+from sqlalchemy import Connection, Engine, Table, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from .archive import ARCHIVED_TABLES, iter_archive_payloads
+from .database import begin_write
+from .models import (
+    AdventureSheet,
+    ArchivedSheet,
+    Book,
+    Combat,
+    CombatRound,
+    Encounter,
+    Paragraph,
+    ParagraphEdge,
+    ParagraphVisit,
+    Series,
+    SheetEvent,
+)
+from .utils import json_default, table_row_from_json
+
+EXPORT_FORMAT = "ldvh-companion"
+EXPORT_VERSION = 1
+
+# Tables exportées, dans l'ordre des dépendances, avec leurs clés étrangères (colonne -> table)
+EXPORT_TABLES: dict[str, tuple[Table, dict[str, str]]] = {
+    "series": (Series.__table__, {}),
+    "books": (Book.__table__, {"series_id": "series"}),
+    "adventure_sheets": (AdventureSheet.__table__, {"book_id": "books"}),
+    "encounters": (Encounter.__table__, {"sheet_id": "adventure_sheets"}),
+    "combats": (Combat.__table__, {"sheet_id": "adventure_sheets"}),
+    "combat_rounds": (CombatRound.__table__, {"combat_id": "combats"}),
+    "sheet_events": (SheetEvent.__table__, {"sheet_id": "adventure_sheets", "combat_id": "combats"}),
+    "paragraph_visits": (ParagraphVisit.__table__, {"sheet_id": "adventure_sheets"}),
+    "paragraphs": (Paragraph.__table__, {"book_id": "books"}),
+    "paragraph_edges": (ParagraphEdge.__table__, {"source_id": "paragraphs", "target_id": "paragraphs"}),
+}
+
+# Tables du catalogue rapprochées des enregistrements existants en mode remap, par leur clé naturelle
+MATCHED_COLUMNS = {
+    "series": ("name",),
+    "books": ("series_id", "book_number"),
+    "paragraphs": ("book_id", "number"),
+    "paragraph_edges": ("source_id", "target_id"),
+}
+
+# Colonnes non exportées : les sessions de combat en cours ne survivent pas à un export
+EXCLUDED_COLUMNS = {"combats": {"session_id"}}
+
+# Nombre de lignes lues ou insérées par lot
+TRANSFER_BATCH_SIZE = 1000
+
+# Taille des lignes archivées gardées en mémoire par table pendant l'export, au-delà écrites sur disque (octets)
+ARCHIVE_SPOOL_SIZE = 4 * 1024 * 1024
+
+ImportMode = Literal["keep", "remap"]
+
+
+def _exported_columns(name: str, table: Table) -> list:
+    """Colonnes exportées d'une table."""
+    excluded = EXCLUDED_COLUMNS.get(name, set())
+    return [column for column in table.columns if column.name not in excluded]
+
+
+def _line(name: str, row: Mapping) -> str:
+    """Ligne NDJSON d'un enregistrement."""
+    return json.dumps({"table": name, "row": dict(row)}, default=json_default, ensure_ascii=False) + "\n"
+
+
+def _spool_archived_lines(connection: Connection) -> dict[str, IO[str]]:
+    """Décompresse chaque archive une seule fois et range ses lignes NDJSON par table dans des fichiers temporaires.
+
+    Returns:
+        Fichier temporaire (relu depuis le début) par table de ARCHIVED_TABLES
+    """
+    spools = {
+        name: tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE, mode="w+", encoding="utf-8")
+        for name in ARCHIVED_TABLES
+    }
+    try:
+        for payload in iter_archive_payloads(connection):
+            for name, spool in spools.items():
+                spool.writelines(_line(name, row) for row in payload.get(name, []))
+    except Exception:
+        for spool in spools.values():
+            spool.close()
+        raise
+
+    for spool in spools.values():
+        spool.seek(0)
+    return spools
+
+
+def export_lines(engine: Engine) -> Iterator[str]:
+    """Produit l'export NDJSON de toutes les tables, par blocs de lignes.
+
+    La connexion est ouverte par le générateur lui-même : elle reste valide
+    pendant toute la durée de la réponse en streaming.
+
+    Args:
+        engine: Moteur de base de données utilisé pour la lecture
+
+    Yields:
+        Blocs de lignes NDJSON (au plus TRANSFER_BATCH_SIZE lignes par bloc)
+    """
+    yield json.dumps({"format": EXPORT_FORMAT, "version": EXPORT_VERSION}) + "\n"
+
+    spools: dict[str, IO[str]] = {}
+    with engine.connect() as connection:
+        try:
+            # Une seule transaction de lecture pour un instantané cohérent de toutes les tables
+            connection.exec_driver_sql("BEGIN")
+            for name, (table, _) in EXPORT_TABLES.items():
+                result = connection.execution_options(yield_per=TRANSFER_BATCH_SIZE).execute(
+                    select(*_exported_columns(name, table)).order_by(table.c.id)
+                )
+                for rows in result.mappings().partitions():
+                    yield "".join(_line(name, row) for row in rows)
+
+                if name in ARCHIVED_TABLES:
+                    # Les feuilles archivées sont exportées décompressées, comme les feuilles courantes
+                    if not spools:
+                        spools = _spool_archived_lines(connection)
+                    while lines := list(islice(spools[name], TRANSFER_BATCH_SIZE)):
+                        yield "".join(lines)
+        finally:
+            for spool in spools.values():
+                spool.close()
+
+
+class _Importer:
+    """Insère les enregistrements par lots et, en mode remap, traduit les identifiants."""
+
+    def __init__(self, db: Session, mode: ImportMode) -> None:
+        self.db = db
+        self.mode = mode
+        self.counts = dict.fromkeys(EXPORT_TABLES, 0)
+        # Ancien id -> nouvel id, par table (mode remap)
+        self.id_maps: dict[str, dict[int, int]] = {name: {} for name in EXPORT_TABLES}
+        self.pending: list[tuple[int | None, dict]] = []
+        self.pending_table: str | None = None
+        # Clé naturelle -> id des enregistrements présents, par table de MATCHED_COLUMNS (mode remap)
+        self.existing: dict[str, dict[tuple, int]] = {}
+        # Numéros de tentative déjà pris, par livre (mode remap)
+        self.attempt_numbers: dict[int, set[int]] = {}
+
+    def _existing(self, name: str) -> dict[tuple, int]:
+        """Enregistrements présents d'une table de MATCHED_COLUMNS, lus à la première utilisation."""
+        if name not in self.existing:
+            table = EXPORT_TABLES[name][0]
+            columns = [table.c[column] for column in MATCHED_COLUMNS[name]]
+            self.existing[name] = {tuple(row[1:]): row[0] for row in self.db.execute(select(table.c.id, *columns))}
+        return self.existing[name]
+
+    def _free_attempt_number(self, book_id: int, number: int | None) -> int:
+        """Numéro de tentative d'une feuille importée : le sien s'il est libre dans le livre, sinon le suivant."""
+        if book_id not in self.attempt_numbers:
+            numbers = union_all(
+                select(AdventureSheet.attempt_number).where(AdventureSheet.book_id == book_id),
+                select(ArchivedSheet.attempt_number).where(ArchivedSheet.book_id == book_id),
+            )
+            self.attempt_numbers[book_id] = set(self.db.scalars(numbers))
+
+        used = self.attempt_numbers[book_id]
+        if number is None or number in used:
+            number = max(used, default=0) + 1
+        used.add(number)
+        return number
+
+    def add(self, name: str, values: dict, line_number: int) -> None:
+        """Ajoute un enregistrement au lot en cours, après traduction de ses clés étrangères."""
+        if name != self.pending_table:
+            self.flush()
+            self.pending_table = name
+
+        if self.mode == "remap":
+            for column, parent in EXPORT_TABLES[name][1].items():
+                if values.get(column) is not None:
+                    try:
+                        values[column] = self.id_maps[parent][values[column]]
+                    except (KeyError, TypeError) as e:
+                        raise ValueError(
+                            f"Ligne {line_number} : {column}={values[column]} ne désigne aucun enregistrement importé"
+                        ) from e
+            old_id = values.pop("id", None)
+
+            if name in MATCHED_COLUMNS:
+                existing_id = self._existing(name).get(tuple(values.get(column) for column in MATCHED_COLUMNS[name]))
+                if existing_id is not None:
+                    # Déjà présent dans le catalogue : les références du fichier pointent vers lui
+                    if old_id is not None:
+                        self.id_maps[name][old_id] = existing_id
+                    return
+            if name == "adventure_sheets" and values.get("book_id") is not None:
+                values["attempt_number"] = self._free_attempt_number(values["book_id"], values.get("attempt_number"))
+        else:
+            old_id = None
+
+        self.pending.append((old_id, values))
+        if len(self.pending) >= TRANSFER_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Insère le lot en cours ; les lignes sont regroupées par jeu de colonnes pour executemany."""
+        if not self.pending:
+            return
+
+        name = self.pending_table
+        table = EXPORT_TABLES[name][0]
+        groups: dict[tuple[str, ...], list[tuple[int | None, dict]]] = {}
+        for old_id, values in self.pending:
+            groups.setdefault(tuple(sorted(values)), []).append((old_id, values))
+
+        for entries in groups.values():
+            rows = [values for _, values in entries]
+            if self.mode == "remap":
+                statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+                new_ids = self.db.execute(statement, rows).scalars().all()
+                for (old_id, values), new_id in zip(entries, new_ids, strict=True):
+                    if old_id is not None:
+                        self.id_maps[name][old_id] = new_id
+                    if name in MATCHED_COLUMNS:
+                        self._existing(name)[tuple(values.get(column) for column in MATCHED_COLUMNS[name])] = new_id
+            else:
+                self.db.execute(insert(table), rows)
+
+        self.counts[name] += len(self.pending)
+        self.pending = []
+
+
+def import_lines(db: Session, lines: Iterable[bytes | str], mode: ImportMode = "keep") -> dict[str, int]:
+    """Importe un flux NDJSON produit par `export_lines`, dans une seule transaction.
+
+    En mode `keep`, les identifiants du fichier sont conservés (restauration dans
+    une base vide). En mode `remap`, chaque enregistrement reçoit un nouvel
+    identifiant et les références des tables suivantes sont traduites : le
+    fichier peut alors être importé dans une base qui contient déjà des données.
+    Le catalogue déjà présent (séries, livres, graphes) est alors réutilisé et non
+    compté, et les numéros de tentative déjà pris sont remplacés par les suivants.
+
+    Args:
+        db: Session de base de données (validée en cas de succès, annulée sinon)
+        lines: Lignes NDJSON
+        mode: "keep" ou "remap"
+
+    Returns:
+        Nombre d'enregistrements importés par table
+
+    Raises:
+        ValueError: Si le flux est invalide
+        IntegrityError: Si un enregistrement viole une contrainte (identifiant ou numéro déjà pris)
+    """
+    importer = _Importer(db, mode)
+    order = list(EXPORT_TABLES)
+    current = 0
+    header_seen = False
+
+    try:
+        begin_write(db)
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Ligne {line_number} : JSON invalide") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"Ligne {line_number} : enregistrement invalide")
+
+            if not header_seen:
+                if record.get("format") != EXPORT_FORMAT or record.get("version") != EXPORT_VERSION:
+                    raise ValueError("En-tête d'export absent ou version non prise en charge")
+                header_seen = True
+                continue
+
+            name = record.get("table")
+            if name not in EXPORT_TABLES:
+                raise ValueError(f"Ligne {line_number} : table inconnue {name!r}")
+            if order.index(name) < current:
+                raise ValueError(f"Ligne {line_number} : les tables doivent suivre l'ordre {', '.join(order)}")
+            current = order.index(name)
+
+            table = EXPORT_TABLES[name][0]
+            columns = [column.name for column in _exported_columns(name, table)]
+            try:
+                values = table_row_from_json(table, record.get("row"), columns)
+            except ValueError as e:
+                raise ValueError(f"Ligne {line_number} : {e}") from e
+            importer.add(name, values, line_number)
+
+        if not header_seen:
+            raise ValueError("Flux d'import vide")
+
+        importer.flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return importer.counts
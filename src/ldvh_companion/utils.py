@@ -1,47 +1,106 @@
 """Utilitaires pour l'application LDVH Companion."""
 
-import random
+import json
+import unicodedata
+from collections.abc import Collection
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from .dice import DiceStream, default_stream, dice_service
+
+if TYPE_CHECKING:
+    # Annotations seulement : sqlalchemy et les modèles sont importés dans les fonctions qui s'en servent
+    from sqlalchemy import Table
+    from sqlalchemy.orm import Session
+
+    from .models import (
+        AdventureSheetPatchOps,
+        AdventureSheetUpdate,
+        Combat,
+        CombatAction,
+        CombatRound,
+        CombatRoundResult,
+        CombatState,
+        LuckPolicy,
+    )
 
 
-def roll_dice(dice_count: int, sides: int = 6) -> int:
-    """Lance un nombre donné de dés avec un nombre de faces spécifié.
+def roll_dice_list(dice_count: int, sides: int = 6, stream: DiceStream | None = None) -> list[int]:
+    """Lance un nombre donné de dés et retourne le résultat de chaque dé.
 
     Args:
         dice_count: Nombre de dés à lancer
         sides: Nombre de faces par dé (défaut: 6)
+        stream: Flux de dés à utiliser (défaut: flux global)
 
     Returns:
-        Somme des résultats des dés
+        Résultats des dés
     """
     if dice_count <= 0 or sides < 2:
         raise ValueError("Le nombre de dés doit être positif et le nombre de faces >= 2")
 
-    return sum(random.randint(1, sides) for _ in range(dice_count))
+    if stream is None:
+        stream = default_stream()
+    return stream.roll(dice_count, sides)
+
 
+def roll_dice(dice_count: int, sides: int = 6, stream: DiceStream | None = None) -> int:
+    """Lance un nombre donné de dés avec un nombre de faces spécifié.
 
-def roll_1d6() -> int:
+    Args:
+        dice_count: Nombre de dés à lancer
+        sides: Nombre de faces par dé (défaut: 6)
+        stream: Flux de dés à utiliser (défaut: flux global)
+
+    Returns:
+        Somme des résultats des dés
+    """
+    return sum(roll_dice_list(dice_count, sides, stream))
+
+
+def roll_1d6(stream: DiceStream | None = None) -> int:
     """Lance 1d6."""
-    return roll_dice(1, 6)
+    return roll_dice(1, 6, stream)
 
 
-def roll_2d6() -> int:
+def roll_2d6(stream: DiceStream | None = None) -> int:
     """Lance 2d6."""
-    return roll_dice(2, 6)
+    return roll_dice(2, 6, stream)
+
 
+# Expressions de dés des statistiques initiales d'un personnage
+INITIAL_STATS_EXPRESSIONS = {"skill": "1d6+6", "stamina": "2d6+12", "luck": "1d6+6"}
 
-def calculate_initial_stats() -> tuple[int, int, int]:
+
+def calculate_initial_stats(stream: DiceStream | None = None) -> tuple[int, int, int]:
     """Calcule les statistiques initiales d'un personnage.
 
+    Args:
+        stream: Flux de dés à utiliser (défaut: flux global)
+
     Returns:
         Tuple (skill, stamina, luck) avec les valeurs calculées
     """
-    skill = 6 + roll_1d6()  # 6 + 1d6
-    stamina = 12 + roll_2d6()  # 12 + 2d6
-    luck = 6 + roll_1d6()  # 6 + 1d6
+    skill = 6 + roll_1d6(stream)  # 6 + 1d6
+    stamina = 12 + roll_2d6(stream)  # 12 + 2d6
+    luck = 6 + roll_1d6(stream)  # 6 + 1d6
 
     return skill, stamina, luck
 
 
+def normalize_monster_name(name: str) -> str:
+    """Normalise un nom de monstre pour la recherche : minuscules, sans accents ni espaces superflus.
+
+    Args:
+        name: Nom saisi
+
+    Returns:
+        Nom normalisé ("Orque  Géant" -> "orque geant")
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
 def format_monster_encounters(encounters: list[dict]) -> str:
     """Formate la liste des rencontres de monstres en texte.
 
@@ -97,6 +156,50 @@ def parse_monster_encounters(text: str) -> list[dict]:
     return encounters
 
 
+def _optional_int(value: object) -> int | None:
+    """Convertit une valeur saisie en entier, ou None si elle n'est pas numérique."""
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def decode_monster_encounters(text: str | None) -> list[dict]:
+    """Décode les rencontres de monstres stockées en JSON ou à l'ancien format texte.
+
+    Args:
+        text: Contenu de l'ancien champ `monster_encounters`
+
+    Returns:
+        Liste de rencontres {name, paragraph, skill, stamina}, valeurs numériques converties en entiers
+    """
+    if not text or not text.strip():
+        return []
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = parse_monster_encounters(text)
+
+    if not isinstance(data, list):
+        return []
+
+    encounters = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        encounter = {
+            "name": str(item.get("name") or "").strip() or None,
+            "paragraph": _optional_int(item.get("paragraph")),
+            "skill": _optional_int(item.get("skill")),
+            "stamina": _optional_int(item.get("stamina")),
+        }
+        if any(value is not None for value in encounter.values()):
+            encounters.append(encounter)
+
+    return encounters
+
+
 def validate_character_stats(skill: int, stamina: int, luck: int) -> bool:
     """Valide que les statistiques du personnage sont dans des limites raisonnables.
 
@@ -123,29 +226,149 @@ def validate_character_stats(skill: int, stamina: int, luck: int) -> bool:
     return True
 
 
-def get_next_attempt_number(book_id: int, db_session: "Session") -> int:
-    """Obtient le prochain numéro de tentative pour un livre donné.
+def json_default(value: object) -> str:
+    """Sérialise les dates au format ISO 8601 (argument `default` de `json.dumps`)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def table_row_from_json(table: "Table", row: object, columns: Collection[str] | None = None) -> dict:
+    """Convertit un enregistrement JSON (export, archive) en valeurs de colonnes d'une table.
 
     Args:
-        book_id: ID du livre
-        db_session: Session de base de données
+        table: Table de destination
+        row: Enregistrement décodé du JSON
+        columns: Colonnes acceptées (défaut: toutes les colonnes de la table)
 
     Returns:
-        Prochain numéro de tentative
+        Valeurs des colonnes, dates converties en datetime naïf UTC
+
+    Raises:
+        ValueError: Si l'enregistrement n'est pas un objet, contient une colonne inconnue ou une date invalide
     """
-    from .models import AdventureSheet
+    from sqlalchemy import DateTime
+
+    if not isinstance(row, dict):
+        raise ValueError("enregistrement invalide")
+
+    allowed = set(table.c.keys() if columns is None else columns)
+    unknown = [key for key in row if key not in allowed]
+    if unknown:
+        raise ValueError(f"colonnes inconnues pour {table.name} : {', '.join(unknown)}")
+
+    values = dict(row)
+    for key, value in values.items():
+        if isinstance(table.c[key].type, DateTime) and isinstance(value, str):
+            try:
+                values[key] = datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+            except ValueError as e:
+                raise ValueError(f"date invalide pour {key}") from e
+    return values
 
-    max_attempt = (
-        db_session.query(AdventureSheet.attempt_number)
-        .filter(AdventureSheet.book_id == book_id)
-        .order_by(AdventureSheet.attempt_number.desc())
-        .first()
+
+def insert_adventure_sheet(values: dict, db_session: "Session") -> int | None:
+    """Insère une feuille d'aventure en lui attribuant le prochain numéro de tentative de son livre.
+
+    Le numéro est calculé par la requête d'insertion elle-même (INSERT ... SELECT MAX + 1),
+    sans lecture préalable. L'index unique (book_id, attempt_number) rejette le doublon
+    si deux insertions concurrentes calculent le même numéro : l'appelant peut alors réessayer.
+
+    Args:
+        values: Valeurs des colonnes de la feuille, dont `book_id` (sans `attempt_number`)
+        db_session: Session de base de données
+
+    Returns:
+        ID de la feuille créée, ou None si le livre n'existe pas
+
+    Raises:
+        IntegrityError: Si le numéro de tentative a été pris entre-temps
+    """
+    from sqlalchemy import exists, func, insert, literal, select, union_all
+
+    from .models import AdventureSheet, ArchivedSheet, Book
+
+    # Les valeurs par défaut calculées en Python ne s'appliquent pas à un INSERT ... SELECT
+    now = datetime.utcnow()
+    values = {"created_at": now, "updated_at": now, **values}
+
+    book_id = values["book_id"]
+    columns = AdventureSheet.__table__.c
+    # Les feuilles archivées gardent leur numéro de tentative
+    numbers = union_all(
+        select(AdventureSheet.attempt_number).where(AdventureSheet.book_id == book_id),
+        select(ArchivedSheet.attempt_number).where(ArchivedSheet.book_id == book_id),
+    ).subquery()
+    next_attempt = select(func.coalesce(func.max(numbers.c.attempt_number), 0) + 1).scalar_subquery()
+    source = select(*(literal(value, columns[name].type) for name, value in values.items()), next_attempt).where(
+        exists().where(Book.id == book_id)
     )
 
-    if max_attempt is None:
-        return 1
+    statement = insert(AdventureSheet).from_select([*values, "attempt_number"], source).returning(AdventureSheet.id)
+    return db_session.execute(statement).scalar()
+
+
+# Champs modifiables par PATCH, selon l'opération
+PATCH_INCREMENT_FIELDS = {"current_skill", "current_stamina", "current_luck", "gold"}
+PATCH_APPEND_SEPARATORS = {"jewelry": ", ", "potions": ", ", "provisions": ", ", "equipment": "\n", "notes": "\n"}
 
-    return max_attempt[0] + 1
+
+def sheet_patch_values(patch: "AdventureSheetUpdate | AdventureSheetPatchOps") -> dict:
+    """Traduit un patch de feuille d'aventure en valeurs pour une requête UPDATE.
+
+    Les opérations "inc" et "append" sont exprimées en SQL à partir de la valeur
+    courante de la colonne : la feuille n'a pas besoin d'être chargée et des
+    modifications concurrentes ne s'écrasent pas.
+
+    Args:
+        patch: JSON Merge Patch (champs à remplacer) ou liste d'opérations
+
+    Returns:
+        Dictionnaire {nom du champ: valeur ou expression SQL}
+
+    Raises:
+        ValueError: Si une opération porte sur un champ non modifiable ou a une valeur invalide
+    """
+    from pydantic import ValidationError
+    from sqlalchemy import ColumnElement, case, func, literal
+
+    from .models import AdventureSheet, AdventureSheetPatchOps, AdventureSheetUpdate
+
+    if not isinstance(patch, AdventureSheetPatchOps):
+        return patch.model_dump(exclude_unset=True)
+
+    values: dict = {}
+    for operation in patch.ops:
+        field = operation.field
+        if field not in AdventureSheetUpdate.model_fields:
+            raise ValueError(f"Champ non modifiable : {field}")
+
+        column = getattr(AdventureSheet, field)
+        current = values.get(field, column)
+        if field in values and not isinstance(current, ColumnElement):
+            # Champ déjà remplacé par un "set" plus haut dans la liste
+            current = literal(current, column.type)
+
+        if operation.op == "set":
+            try:
+                values[field] = getattr(AdventureSheetUpdate.model_validate({field: operation.value}), field)
+            except ValidationError:
+                raise ValueError(f"Valeur invalide pour le champ {field}") from None
+        elif operation.op == "inc":
+            if field not in PATCH_INCREMENT_FIELDS or type(operation.value) is not int:
+                raise ValueError(f"Incrément invalide pour le champ {field}")
+            # Fonction scalaire max() de SQLite : la valeur ne descend pas sous 0
+            values[field] = func.max(current + operation.value, 0)
+        else:
+            if field not in PATCH_APPEND_SEPARATORS or not isinstance(operation.value, str) or not operation.value:
+                raise ValueError(f"Ajout invalide pour le champ {field}")
+            item = literal(operation.value)
+            values[field] = case(
+                (current.is_(None) | (current == ""), item),
+                else_=current + PATCH_APPEND_SEPARATORS[field] + item,
+            )
+
+    return values
 
 
 # Fonctions pour le système de combat
@@ -156,6 +379,7 @@ def start_combat(
     player_skill: int,
     player_stamina: int,
     player_luck: int,
+    stream: DiceStream | None = None,
 ) -> "CombatState":
     """Commence un nouveau combat.
 
@@ -166,12 +390,16 @@ def start_combat(
         player_skill: Habileté du joueur
         player_stamina: Endurance actuelle du joueur
         player_luck: Chance actuelle du joueur
+        stream: Flux dans lequel tirer la graine du combat (flux global par défaut)
 
     Returns:
         État initial du combat
     """
     from .models import CombatState
 
+    if stream is None:
+        stream = default_stream()
+
     return CombatState(
         monster_name=monster_name,
         monster_skill=monster_skill,
@@ -184,26 +412,84 @@ def start_combat(
         round_number=1,
         is_active=True,
         winner=None,
+        rng_seed=stream.derive_seed(),
+        rng_offset=0,
     )
 
 
+def combat_stream(combat_state: "CombatState") -> DiceStream:
+    """Retourne le flux de dés d'un combat, positionné selon son état.
+
+    Args:
+        combat_state: État du combat
+
+    Returns:
+        Flux de dés du combat, ou flux global si le combat n'a pas de graine
+    """
+    if combat_state.rng_seed is None:
+        return default_stream()
+
+    name = f"combat:{combat_state.combat_id or combat_state.rng_seed}"
+    return dice_service.stream(name, seed=combat_state.rng_seed, offset=combat_state.rng_offset)
+
+
+def should_attempt_luck(combat_state: "CombatState", round_winner: str, luck_policy: "LuckPolicy") -> bool:
+    """Détermine si le joueur tente sa chance selon une stratégie donnée.
+
+    Args:
+        combat_state: État du combat avant application des dégâts
+        round_winner: Gagnant de l'assaut ("player", "monster" ou "draw")
+        luck_policy: Stratégie de test de chance
+
+    Returns:
+        True si le joueur doit tenter sa chance ce round
+    """
+    from .models import LuckPolicy
+    from .solver import solve_state, solver_bounds_exceeded
+
+    if luck_policy == LuckPolicy.ALWAYS:
+        return True
+    if luck_policy == LuckPolicy.ON_WIN:
+        return round_winner == "player"
+    if luck_policy == LuckPolicy.ON_LOSS:
+        return round_winner == "monster"
+    if luck_policy == LuckPolicy.OPTIMAL:
+        if solver_bounds_exceeded(combat_state.player_stamina, combat_state.monster_stamina, combat_state.player_luck):
+            return False
+        return solve_state(
+            combat_state.player_skill - combat_state.monster_skill,
+            max(0, combat_state.player_stamina),
+            max(0, combat_state.monster_stamina),
+            max(0, combat_state.player_luck),
+        )[1]
+    return False
+
+
 def execute_combat_round(
-    combat_state: "CombatState", attempt_luck: bool = False
+    combat_state: "CombatState",
+    attempt_luck: bool = False,
+    luck_policy: "LuckPolicy | None" = None,
+    stream: DiceStream | None = None,
 ) -> tuple["CombatRoundResult", "CombatState"]:
     """Exécute un round de combat.
 
     Args:
         combat_state: État actuel du combat
         attempt_luck: Si le joueur tente sa chance
+        luck_policy: Stratégie de test de chance, prioritaire sur `attempt_luck` si fournie
+        stream: Flux de dés à utiliser (défaut: flux du combat)
 
     Returns:
         Résultat du round de combat et nouvel état
     """
     from .models import CombatRoundResult, CombatState
 
+    if stream is None:
+        stream = combat_stream(combat_state)
+
     # Lancer les dés pour le joueur et le monstre
-    player_dice = [roll_1d6(), roll_1d6()]
-    monster_dice = [roll_1d6(), roll_1d6()]
+    player_dice = roll_dice_list(2, 6, stream)
+    monster_dice = roll_dice_list(2, 6, stream)
 
     # Calculer les forces d'attaque
     player_attack_strength = combat_state.player_skill + sum(player_dice)
@@ -228,13 +514,15 @@ def execute_combat_round(
         damage_to_player = 2
 
     # Gérer le test de chance
+    if luck_policy is not None:
+        attempt_luck = should_attempt_luck(combat_state, round_winner, luck_policy)
     luck_attempted = attempt_luck
     luck_dice = None
     luck_success = None
     player_luck_after = combat_state.player_luck
 
     if attempt_luck and combat_state.player_luck > 0:
-        luck_dice = [roll_1d6(), roll_1d6()]
+        luck_dice = roll_dice_list(2, 6, stream)
         luck_total = sum(luck_dice)
         luck_success = luck_total <= combat_state.player_luck
         player_luck_after = max(0, combat_state.player_luck - 1)  # Réduire la chance de 1
@@ -304,6 +592,129 @@ def execute_combat_round(
         round_number=combat_state.round_number + 1,
         is_active=not combat_ended,
         winner=combat_winner,
+        combat_id=combat_state.combat_id,
+        rng_seed=combat_state.rng_seed,
+        rng_offset=stream.offset if combat_state.rng_seed is not None else 0,
     )
 
     return round_result, new_combat_state
+
+
+def execute_combat_rounds(
+    combat_state: "CombatState",
+    max_rounds: int,
+    attempt_luck: bool = False,
+    luck_policy: "LuckPolicy | None" = None,
+) -> tuple[list["CombatRoundResult"], "CombatState"]:
+    """Exécute plusieurs rounds de combat d'affilée.
+
+    Args:
+        combat_state: État actuel du combat
+        max_rounds: Nombre maximal de rounds à résoudre
+        attempt_luck: Si le joueur tente sa chance à chaque round
+        luck_policy: Stratégie de test de chance, prioritaire sur `attempt_luck` si fournie
+
+    Returns:
+        Résultats des rounds joués et état final du combat
+    """
+    round_results = []
+    for _ in range(max_rounds):
+        if not combat_state.is_active:
+            break
+        round_result, combat_state = execute_combat_round(combat_state, attempt_luck, luck_policy)
+        round_results.append(round_result)
+
+    return round_results, combat_state
+
+
+def replay_combat(
+    initial_state: "CombatState", actions: list["CombatAction"]
+) -> tuple[list["CombatRoundResult"], "CombatState"]:
+    """Rejoue un combat à partir de son état initial et des actions de chaque round.
+
+    Args:
+        initial_state: État du combat au moment du rejeu (graine et position comprises)
+        actions: Action du joueur pour chaque round
+
+    Returns:
+        Résultats des rounds rejoués et état final du combat
+    """
+    if initial_state.rng_seed is None:
+        raise ValueError("Impossible de rejouer un combat sans graine")
+
+    # Flux indépendant du cache, pour ne pas perturber un combat en cours
+    stream = DiceStream(initial_state.rng_seed, initial_state.rng_offset)
+
+    round_results = []
+    combat_state = initial_state
+    for action in actions:
+        if not combat_state.is_active:
+            break
+        round_result, combat_state = execute_combat_round(
+            combat_state, action.attempt_luck, action.luck_policy, stream=stream
+        )
+        round_results.append(round_result)
+
+    return round_results, combat_state
+
+
+def combat_round_to_record(combat_id: int, round_result: "CombatRoundResult") -> dict:
+    """Convertit un résultat de round en ligne de la table `combat_rounds`.
+
+    Args:
+        combat_id: ID du combat enregistré
+        round_result: Résultat du round
+
+    Returns:
+        Valeurs des colonnes de la ligne
+    """
+    return {
+        "combat_id": combat_id,
+        "round_number": round_result.round_number,
+        "player_dice": json.dumps(round_result.player_dice),
+        "monster_dice": json.dumps(round_result.monster_dice),
+        "player_attack_strength": round_result.player_attack_strength,
+        "monster_attack_strength": round_result.monster_attack_strength,
+        "winner": round_result.winner,
+        "luck_attempted": round_result.luck_attempted,
+        "luck_dice": json.dumps(round_result.luck_dice) if round_result.luck_dice is not None else None,
+        "luck_success": round_result.luck_success,
+        "damage_to_player": round_result.damage_to_player,
+        "damage_to_monster": round_result.damage_to_monster,
+        "player_stamina_after": round_result.player_stamina_after,
+        "monster_stamina_after": round_result.monster_stamina_after,
+        "player_luck_after": round_result.player_luck_after,
+    }
+
+
+def combat_round_from_record(record: "CombatRound", combat: "Combat") -> "CombatRoundResult":
+    """Reconstruit un résultat de round à partir d'une ligne de la table `combat_rounds`.
+
+    Args:
+        record: Ligne du round
+        combat: Combat auquel appartient le round
+
+    Returns:
+        Résultat du round
+    """
+    from .models import CombatRoundResult
+
+    combat_ended = record.player_stamina_after <= 0 or record.monster_stamina_after <= 0
+    return CombatRoundResult(
+        round_number=record.round_number,
+        player_dice=json.loads(record.player_dice),
+        monster_dice=json.loads(record.monster_dice),
+        player_attack_strength=record.player_attack_strength,
+        monster_attack_strength=record.monster_attack_strength,
+        winner=record.winner,
+        luck_attempted=record.luck_attempted,
+        luck_dice=json.loads(record.luck_dice) if record.luck_dice else None,
+        luck_success=record.luck_success,
+        damage_to_player=record.damage_to_player,
+        damage_to_monster=record.damage_to_monster,
+        player_stamina_after=record.player_stamina_after,
+        monster_stamina_after=record.monster_stamina_after,
+        player_luck_after=record.player_luck_after,
+        combat_ended=combat_ended,
+        combat_winner=combat.winner if combat_ended else None,
+    )
@@ -0,0 +1,41 @@
+"""Configuration commune des tests : l'application est servie par une base SQLite temporaire."""
+
+import itertools
+import os
+import tempfile
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+# La configuration est lue à l'import de l'application : la base de test doit être choisie avant
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+
+# Numéros des séries créées par les tests (noms uniques)
+_series_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator[TestClient]:
+    """Client HTTP de l'application, démarrée une seule fois (migrations et catalogue de départ)."""
+    from ldvh_companion.api import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def sheet(client: TestClient) -> dict:
+    """Nouvelle feuille d'aventure dans le premier livre du catalogue de départ."""
+    response = client.post("/api/adventure-sheets", json={"book_id": 1})
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.fixture
+def book(client: TestClient) -> dict:
+    """Nouveau livre, seul dans une nouvelle série : les tests qui comptent ses feuilles en sont isolés."""
+    series = client.post("/api/series", json={"name": f"Série de test {next(_series_numbers)}"}).json()
+    response = client.post("/api/books", json={"title": "Livre de test", "series_id": series["id"], "book_number": 1})
+    assert response.status_code == 201
+    return response.json()
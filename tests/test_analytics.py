@@ -0,0 +1,83 @@
+"""Tests des statistiques par livre et par monstre, tenues à jour de façon incrémentale."""
+
+from fastapi.testclient import TestClient
+
+from ldvh_companion.analytics import rebuild_analytics
+from ldvh_companion.database import SessionLocal
+
+
+def book_counters(client: TestClient, book: dict) -> tuple[dict, list[dict]]:
+    """Statistiques d'un livre et paragraphes de ses morts."""
+    analytics = client.get(f"/api/analytics/books/{book['id']}").json()
+    deaths = client.get(f"/api/analytics/books/{book['id']}/deaths").json()
+    return analytics, deaths
+
+
+def rebuilt(client: TestClient, book: dict) -> tuple[dict, list[dict]]:
+    """Statistiques d'un livre après une reconstruction complète des compteurs."""
+    with SessionLocal() as db:
+        rebuild_analytics(db)
+    return book_counters(client, book)
+
+
+def die_at(client: TestClient, sheet: dict, *paragraphs: int) -> None:
+    """Visite des paragraphes puis termine la partie par une mort."""
+    for paragraph in paragraphs:
+        client.post(f"/api/adventure-sheets/{sheet['id']}/visits", json={"paragraph": paragraph})
+    client.patch(f"/api/adventure-sheets/{sheet['id']}", json={"current_stamina": 0, "is_active": False})
+
+
+def test_counters_follow_sheet_creation_and_deletion(client: TestClient, book: dict) -> None:
+    """Créer, terminer puis supprimer des feuilles met les compteurs à jour comme une reconstruction complète."""
+    sheets = [client.post("/api/adventure-sheets", json={"book_id": book["id"]}).json() for _ in range(3)]
+    die_at(client, sheets[0], 1, 25)
+    client.patch(f"/api/adventure-sheets/{sheets[1]['id']}", json={"is_active": False})
+
+    analytics, deaths = book_counters(client, book)
+    assert (analytics["attempt_count"], analytics["finished_count"], analytics["death_count"]) == (3, 2, 1)
+    assert analytics["completed_count"] == 1
+    assert analytics["average_attempts_to_complete"] == sheets[1]["attempt_number"]
+    assert [(death["paragraph"], death["death_count"]) for death in deaths] == [(25, 1)]
+    assert rebuilt(client, book) == (analytics, deaths)
+
+    assert client.delete(f"/api/adventure-sheets/{sheets[0]['id']}").status_code == 200
+
+    analytics, deaths = book_counters(client, book)
+    assert (analytics["attempt_count"], analytics["finished_count"], analytics["death_count"]) == (2, 1, 0)
+    assert deaths == []
+    assert rebuilt(client, book) == (analytics, deaths)
+
+
+def test_death_follows_visits_noted_after_it(client: TestClient, book: dict) -> None:
+    """Une visite notée après la mort y déplace la mort, comme le ferait une reconstruction."""
+    sheet = client.post("/api/adventure-sheets", json={"book_id": book["id"]}).json()
+    die_at(client, sheet, 1, 12)
+
+    client.post(f"/api/adventure-sheets/{sheet['id']}/visits", json={"paragraph": 40})
+
+    analytics, deaths = book_counters(client, book)
+    assert [(death["paragraph"], death["death_count"]) for death in deaths] == [(40, 1)]
+    assert rebuilt(client, book) == (analytics, deaths)
+
+
+def test_monster_stats_group_spellings_of_a_name(client: TestClient, sheet: dict) -> None:
+    """Les combats contre un même monstre saisi avec ou sans accents ni majuscules sont comptés ensemble."""
+    client.patch(f"/api/adventure-sheets/{sheet['id']}", json={"current_stamina": 999})
+    for name in ("Gobelin Épineux", "gobelin  epineux"):
+        combat = client.post(
+            "/api/combat/start",
+            params={"sheet_id": sheet["id"]},
+            json={"monster_name": name, "monster_skill": 1, "monster_stamina": 2},
+        ).json()
+        client.post("/api/combat/round", params={"until": "end"}, json={"combat_id": combat["combat_id"]})
+
+    def goblins() -> list[tuple[str, int]]:
+        monsters = client.get("/api/analytics/monsters", params={"sort": "combats", "limit": 100}).json()
+        return [
+            (row["monster_name"], row["combat_count"]) for row in monsters if "gobelin" in row["monster_name"].lower()
+        ]
+
+    assert goblins() == [("Gobelin Épineux", 2)]
+    with SessionLocal() as db:
+        rebuild_analytics(db)
+    assert goblins() == [("Gobelin Épineux", 2)]
@@ -0,0 +1,87 @@
+"""Tests de l'archivage des feuilles terminées et de leur restauration."""
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from ldvh_companion.database import SessionLocal
+from ldvh_companion.models import AdventureSheet, ArchivedSheet
+
+
+def sheet_data(client: TestClient, sheet_id: int) -> dict:
+    """Feuille, parcours et journal d'une feuille, lus par les routes GET."""
+    base = f"/api/adventure-sheets/{sheet_id}"
+    sheet = client.get(base).json()
+    sheet.pop("updated_at")
+    return {
+        "sheet": sheet,
+        "visits": client.get(f"{base}/visits").json(),
+        "events": client.get(f"{base}/events").json(),
+    }
+
+
+def backdate(sheet_id: int, days: int) -> None:
+    """Recule la date de dernière modification d'une feuille."""
+    with SessionLocal() as db:
+        db.execute(
+            update(AdventureSheet)
+            .where(AdventureSheet.id == sheet_id)
+            .values(updated_at=datetime.utcnow() - timedelta(days=days))
+        )
+        db.commit()
+
+
+def book_counters(client: TestClient, book: dict) -> tuple[dict, list[dict]]:
+    """Statistiques d'un livre et paragraphes de ses morts."""
+    return (
+        client.get(f"/api/analytics/books/{book['id']}").json(),
+        client.get(f"/api/analytics/books/{book['id']}/deaths").json(),
+    )
+
+
+def test_archive_then_restore_keeps_sheet_and_counters(client: TestClient, book: dict) -> None:
+    """Une feuille archivée reste lisible ; restaurée, elle redevient telle qu'elle était, compteurs inchangés."""
+    sheet = client.post("/api/adventure-sheets", json={"book_id": book["id"]}).json()
+    base = f"/api/adventure-sheets/{sheet['id']}"
+    for paragraph in (1, 7):
+        client.post(f"{base}/visits", json={"paragraph": paragraph})
+    client.patch(base, json={"gold": 9, "notes": "Passage secret"})
+    client.patch(base, json={"current_stamina": 0, "is_active": False})
+    stored = sheet_data(client, sheet["id"])
+    counters = book_counters(client, book)
+    # Terminée il y a dix jours : seule feuille assez ancienne pour l'archivage ci-dessous
+    backdate(sheet["id"], days=10)
+
+    result = client.post("/api/archive", params={"older_than_days": 5})
+
+    assert result.status_code == 200
+    assert result.json()["archived"] == 1
+    with SessionLocal() as db:
+        assert db.get(AdventureSheet, sheet["id"]) is None
+        assert db.get(ArchivedSheet, sheet["id"]) is not None
+    assert sheet_data(client, sheet["id"]) == stored
+    assert book_counters(client, book) == counters
+    assert client.post(f"{base}/visits", json={"paragraph": 8}).status_code == 404
+
+    restored = client.post(f"{base}/restore")
+
+    assert restored.status_code == 200
+    assert sheet_data(client, sheet["id"]) == stored
+    assert book_counters(client, book) == counters
+    assert client.post(f"{base}/restore").status_code == 404
+
+    # Restaurée à l'instant : elle n'est pas réarchivée par l'archivage suivant
+    assert client.post("/api/archive", params={"older_than_days": 5}).json()["archived"] == 0
+    with SessionLocal() as db:
+        assert db.get(AdventureSheet, sheet["id"]) is not None
+
+
+def test_active_sheets_are_not_archived(client: TestClient, sheet: dict) -> None:
+    """Seules les feuilles terminées sont archivées, même anciennes."""
+    backdate(sheet["id"], days=10)
+
+    assert client.post("/api/archive", params={"older_than_days": 5}).json()["archived"] == 0
+    with SessionLocal() as db:
+        assert db.get(AdventureSheet, sheet["id"]) is not None
+    assert client.post(f"/api/adventure-sheets/{sheet['id']}/restore").status_code == 404
@@ -0,0 +1,48 @@
+"""Tests de l'attribution des numéros de tentative et des index uniques qui les protègent."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from ldvh_companion.database import engine
+from ldvh_companion.migrations import create_unique_indexes
+
+
+def attempt_numbers(client: TestClient, book: dict) -> list[int]:
+    """Numéros de tentative des feuilles d'un livre, triés."""
+    sheets = client.get("/api/adventure-sheets", params={"book_id": book["id"]}).json()
+    return sorted(sheet["attempt_number"] for sheet in sheets)
+
+
+def test_concurrent_creations_get_distinct_attempt_numbers(client: TestClient, book: dict) -> None:
+    """Des feuilles créées en même temps dans un livre reçoivent les numéros 1 à N, sans doublon."""
+
+    def create(_: int) -> int:
+        return client.post("/api/adventure-sheets", json={"book_id": book["id"]}).status_code
+
+    with ThreadPoolExecutor(8) as executor:
+        codes = list(executor.map(create, range(20)))
+
+    assert codes == [201] * 20
+    assert attempt_numbers(client, book) == list(range(1, 21))
+
+
+def test_unique_index_migration_renumbers_duplicates_once(client: TestClient, book: dict) -> None:
+    """Lancée par plusieurs workers à la fois, la migration renumérote chaque doublon une seule fois."""
+    for _ in range(3):
+        client.post("/api/adventure-sheets", json={"book_id": book["id"]})
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX uq_adventure_sheets_book_id_attempt_number"))
+        connection.execute(
+            text("UPDATE adventure_sheets SET attempt_number = 1 WHERE book_id = :id"), {"id": book["id"]}
+        )
+
+    with ThreadPoolExecutor(4) as executor:
+        renumbered = list(executor.map(lambda _: create_unique_indexes(), range(4)))
+
+    assert sum(renumbered) == 2
+    assert attempt_numbers(client, book) == [1, 2, 3]
+    with engine.connect() as connection:
+        indexes = connection.execute(text("PRAGMA index_list(adventure_sheets)")).mappings().all()
+    assert "uq_adventure_sheets_book_id_attempt_number" in {index["name"] for index in indexes}
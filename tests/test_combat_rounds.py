@@ -0,0 +1,54 @@
+"""Tests des rounds de combat joués par lots (`rounds=N`) ou jusqu'à la fin (`until=end`)."""
+
+from fastapi.testclient import TestClient
+
+
+def start_combat(client: TestClient, sheet: dict, monster_stamina: int) -> dict:
+    """Commence un combat contre un monstre d'habileté égale à celle du personnage."""
+    response = client.post(
+        "/api/combat/start",
+        params={"sheet_id": sheet["id"]},
+        json={"monster_name": "Orque", "monster_skill": sheet["current_skill"], "monster_stamina": monster_stamina},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_rounds_are_played_in_a_batch(client: TestClient, sheet: dict) -> None:
+    """`rounds=N` joue N rounds consécutifs quand le combat ne se termine pas avant."""
+    client.patch(f"/api/adventure-sheets/{sheet['id']}", json={"current_stamina": 999})
+    combat = start_combat(client, {**sheet, "current_stamina": 999}, monster_stamina=500)
+
+    response = client.post("/api/combat/round", params={"rounds": 5}, json={"combat_id": combat["combat_id"]})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert [round_result["round_number"] for round_result in result["round_results"]] == [1, 2, 3, 4, 5]
+    assert result["round_result"] == result["round_results"][-1]
+    assert result["new_combat_state"]["round_number"] == 6
+    assert result["new_combat_state"]["is_active"]
+
+
+def test_until_end_resolves_the_combat_and_updates_the_sheet(client: TestClient, sheet: dict) -> None:
+    """`until=end` joue le combat jusqu'à sa fin et reporte l'endurance finale sur la feuille."""
+    combat = start_combat(client, sheet, monster_stamina=6)
+
+    response = client.post("/api/combat/round", params={"until": "end"}, json={"combat_id": combat["combat_id"]})
+
+    assert response.status_code == 200
+    result = response.json()
+    last = result["round_result"]
+    assert last["combat_ended"]
+    assert not result["new_combat_state"]["is_active"]
+    assert last["combat_winner"] == ("player" if last["player_stamina_after"] > 0 else "monster")
+
+    stored = client.get(f"/api/adventure-sheets/{sheet['id']}").json()
+    assert stored["current_stamina"] == last["player_stamina_after"]
+    combats = client.get(f"/api/adventure-sheets/{sheet['id']}/combats").json()
+    assert [(record["winner"], record["rounds_fought"]) for record in combats] == [
+        (last["combat_winner"], len(result["round_results"]))
+    ]
+
+    # Le combat terminé n'est plus jouable
+    again = client.post("/api/combat/round", json={"combat_id": combat["combat_id"]})
+    assert again.status_code == 404
@@ -0,0 +1,34 @@
+"""Tests des flux de dés (dice.py)."""
+
+import pytest
+
+from ldvh_companion import dice
+from ldvh_companion.dice import DiceService, DiceStream
+
+
+def test_stream_replays_from_seed_and_offset() -> None:
+    """Un flux recréé avec sa graine et une position redonne exactement les mêmes tirages."""
+    stream = DiceStream(1234)
+    stream.roll(5)
+    offset = stream.offset
+    rolls = stream.roll(3000, 20)
+
+    assert DiceStream(1234, offset).roll(3000, 20) == rolls
+
+
+def test_master_seed_does_not_repeat_streams_across_processes() -> None:
+    """Avec la même graine maîtresse, deux processus (deux registres) n'ont pas les mêmes flux."""
+    first, second = DiceService(master_seed=7), DiceService(master_seed=7)
+
+    assert first.stream("global").seed != second.stream("global").seed
+    assert DiceService(7, nonce=1).stream("sheet:1").seed == DiceService(7, nonce=1).stream("sheet:1").seed
+
+
+def test_evicted_stream_gets_a_new_seed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Un flux évincé du cache puis recréé ne rejoue pas les tirages déjà donnés."""
+    monkeypatch.setattr(dice, "MAX_CACHED_STREAMS", 1)
+    service = DiceService(master_seed=7, nonce=1)
+    seed = service.stream("sheet:1").seed
+
+    service.stream("sheet:2")
+    assert service.stream("sheet:1").seed != seed
@@ -0,0 +1,86 @@
+"""Tests des expressions de dés (dice_expressions.py) et de la route de lancer."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ldvh_companion.dice_expressions import MAX_CONSTANT, compile_expression, distribution
+
+
+def test_constant_within_bounds_is_accepted() -> None:
+    """Une constante à la limite est acceptée et gardée telle quelle."""
+    compiled = compile_expression(f"1d6+{MAX_CONSTANT}")
+
+    assert compiled.constant == MAX_CONSTANT
+    assert compiled.maximum == MAX_CONSTANT + 6
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["1d6+99999999999999999999", f"1d6-{MAX_CONSTANT + 1}", f"{MAX_CONSTANT}+{MAX_CONSTANT}"],
+)
+def test_constant_out_of_bounds_is_rejected(expression: str) -> None:
+    """Une constante (ou une somme de constantes) hors limites est refusée à l'analyse."""
+    with pytest.raises(ValueError, match="constantes"):
+        compile_expression(expression)
+
+
+def test_roll_with_huge_constant_returns_400(client: TestClient) -> None:
+    """La route de lancer répond 400, et non 500, à une constante démesurée."""
+    response = client.post("/api/dice/roll", json={"expression": "1d6+99999999999999999999"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    ("expression", "message"),
+    [
+        ("", "vide"),
+        ("3d6+", "invalide"),
+        ("3x6", "invalide"),
+        ("0d6", "nombre de dés"),
+        ("101d6", "nombre de dés"),
+        ("2d1", "nombre de faces"),
+        ("2d1001", "nombre de faces"),
+        ("2d6kh3", "dés gardés"),
+        ("+".join(["1d6"] * 11), "groupes de dés"),
+    ],
+)
+def test_invalid_expressions_are_rejected(expression: str, message: str) -> None:
+    """Les expressions mal formées ou hors limites sont refusées avec un message explicite."""
+    with pytest.raises(ValueError, match=message):
+        compile_expression(expression)
+
+
+def test_expression_is_normalized() -> None:
+    """Les espaces et la casse sont ignorés ; les bornes tiennent compte des termes soustraits."""
+    compiled = compile_expression(" 4D6KH3 - 1d4 + 2 ")
+
+    assert str(compiled) == "4d6kh3-1d4+2"
+    assert (compiled.minimum, compiled.maximum) == (1, 19)
+
+
+def test_distribution_is_exact() -> None:
+    """La distribution de 2d6 est la distribution triangulaire connue, et celle d'un terme gardé somme à 1."""
+    assert distribution(compile_expression("2d6")) == pytest.approx(
+        {total: (6 - abs(total - 7)) / 36 for total in range(2, 13)}
+    )
+
+    kept = distribution(compile_expression("4d6kh3-1"))
+    assert min(kept) == 2
+    assert max(kept) == 17
+    assert sum(kept.values()) == pytest.approx(1)
+    assert kept[17] == pytest.approx(21 / 6**4)
+
+
+@pytest.mark.parametrize("expression", ["100d1000", "+".join(["100d100"] * 4), "+".join(["5d30kh3"] * 4)])
+def test_costly_distribution_is_rejected(expression: str) -> None:
+    """Le coût d'une distribution est estimé avant le calcul : une expression trop coûteuse est refusée."""
+    with pytest.raises(ValueError, match="trop coûteuse"):
+        distribution(compile_expression(expression))
+
+
+def test_roll_with_costly_distribution_returns_400(client: TestClient) -> None:
+    """La route de lancer répond 400 quand la distribution demandée est trop coûteuse."""
+    response = client.post("/api/dice/roll", json={"expression": "100d1000", "distribution": True})
+
+    assert response.status_code == 400
@@ -0,0 +1,47 @@
+"""Tests des ETags et des réponses 304 des routes GET (http_cache.py)."""
+
+from fastapi.testclient import TestClient
+
+
+def test_unchanged_sheet_returns_304(client: TestClient, sheet: dict) -> None:
+    """Une lecture qui renvoie l'ETag courant reçoit un 304 vide, avec les mêmes en-têtes de cache."""
+    url = f"/api/adventure-sheets/{sheet['id']}"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+
+    second = client.get(url, headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+    assert second.headers["Cache-Control"] == first.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_write_changes_the_etag(client: TestClient, sheet: dict) -> None:
+    """Une modification de la feuille change l'ETag : l'ancien ne donne plus de 304."""
+    url = f"/api/adventure-sheets/{sheet['id']}"
+    etag = client.get(url).headers["ETag"]
+
+    client.patch(url, json={"gold": 3})
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["gold"] == 3
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_depends_on_the_url(client: TestClient) -> None:
+    """Deux URLs différentes (paramètres compris) n'ont pas le même ETag."""
+    first = client.get("/api/books", params={"limit": 1}).headers["ETag"]
+    second = client.get("/api/books", params={"limit": 2}).headers["ETag"]
+
+    assert first != second
+    assert client.get("/api/books", params={"limit": 2}, headers={"If-None-Match": first}).status_code == 200
+
+
+def test_if_none_match_accepts_lists_and_wildcard(client: TestClient) -> None:
+    """`If-None-Match` peut lister plusieurs ETags (éventuellement faibles) ou valoir `*`."""
+    etag = client.get("/api/series").headers["ETag"]
+
+    assert client.get("/api/series", headers={"If-None-Match": f'"autre", W/{etag}'}).status_code == 304
+    assert client.get("/api/series", headers={"If-None-Match": "*"}).status_code == 304
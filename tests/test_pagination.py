@@ -0,0 +1,70 @@
+"""Tests de la pagination par clé et de la projection de champs des routes de liste."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ldvh_companion.pagination import decode_cursor, encode_cursor
+
+
+def create_sheets(client: TestClient, book: dict, count: int) -> list[dict]:
+    """Crée des feuilles d'aventure dans un livre, dans l'ordre de leurs tentatives."""
+    return [client.post("/api/adventure-sheets", json={"book_id": book["id"]}).json() for _ in range(count)]
+
+
+def test_cursor_round_trip() -> None:
+    """Un curseur redonne la clé encodée ; un curseur mal formé ou de mauvaise taille est refusé."""
+    assert decode_cursor(encode_cursor([3, 14]), 2) == [3, 14]
+    for cursor, size in [("pas-un-curseur!", 2), (encode_cursor([3, 14]), 1), (encode_cursor(["a", 1]), 2)]:
+        with pytest.raises(ValueError, match="Curseur"):
+            decode_cursor(cursor, size)
+
+
+def test_pages_cover_all_rows_once_in_key_order(client: TestClient, book: dict) -> None:
+    """Les pages successives suivent l'ordre de la clé, sans doublon ni trou ; la dernière n'a pas de curseur."""
+    sheets = create_sheets(client, book, 7)
+    seen: list[int] = []
+    cursor = None
+    while True:
+        params = {"book_id": book["id"], "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/adventure-sheets", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen += [sheet["attempt_number"] for sheet in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [sheet["attempt_number"] for sheet in sheets] == list(range(1, 8))
+
+
+def test_rows_created_between_pages_are_not_skipped(client: TestClient, book: dict) -> None:
+    """Une feuille créée entre deux pages apparaît à la fin : la page suivante repart de la dernière clé lue."""
+    create_sheets(client, book, 4)
+    first = client.get("/api/adventure-sheets", params={"book_id": book["id"], "limit": 2})
+    create_sheets(client, book, 1)
+    rest = client.get(
+        "/api/adventure-sheets", params={"book_id": book["id"], "cursor": first.headers["X-Next-Cursor"]}
+    ).json()
+
+    assert [sheet["attempt_number"] for sheet in rest] == [3, 4, 5]
+
+
+def test_fields_projection(client: TestClient, book: dict) -> None:
+    """`fields` ne renvoie que les champs demandés, même quand la clé de pagination n'en fait pas partie."""
+    create_sheets(client, book, 3)
+    response = client.get(
+        "/api/adventure-sheets", params={"book_id": book["id"], "limit": 2, "fields": "id,current_stamina"}
+    )
+
+    assert response.status_code == 200
+    assert all(set(sheet) == {"id", "current_stamina"} for sheet in response.json())
+    assert "X-Next-Cursor" in response.headers
+
+
+@pytest.mark.parametrize("params", [{"cursor": "pas-un-curseur!"}, {"fields": "id,inconnu"}, {"fields": ","}])
+def test_invalid_parameters_return_400(client: TestClient, params: dict) -> None:
+    """Un curseur invalide ou un champ inconnu répond 400."""
+    response = client.get("/api/adventure-sheets", params={"limit": 2, **params})
+
+    assert response.status_code == 400
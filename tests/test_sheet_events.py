@@ -0,0 +1,88 @@
+"""Tests du journal des feuilles d'aventure : instantanés et reconstruction."""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from ldvh_companion.analytics import rebuild_analytics
+from ldvh_companion.config import settings
+from ldvh_companion.database import SessionLocal
+from ldvh_companion.models import AdventureSheet, SheetSnapshot
+
+
+@pytest.fixture
+def snapshot_every_three(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Instantané tous les trois événements, pour en croiser plusieurs en quelques requêtes."""
+    monkeypatch.setattr(settings, "sheet_snapshot_interval", 3)
+
+
+def snapshots(sheet_id: int) -> list[tuple[int, str]]:
+    """(numéro d'événement, état) des instantanés d'une feuille, dans l'ordre."""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(SheetSnapshot.sequence, SheetSnapshot.state)
+            .where(SheetSnapshot.sheet_id == sheet_id)
+            .order_by(SheetSnapshot.sequence)
+        )
+        return [tuple(row) for row in rows]
+
+
+def play(client: TestClient, sheet: dict) -> None:
+    """Quelques modifications, dont un lot d'événements qui franchit un multiple de l'intervalle."""
+    base = f"/api/adventure-sheets/{sheet['id']}"
+    assert client.patch(base, json={"gold": 7}).status_code == 200
+    ops = [
+        {"op": "inc", "field": "gold", "value": 3},
+        {"op": "append", "field": "equipment", "value": "Épée"},
+        {"op": "inc", "field": "current_stamina", "value": -2},
+        {"op": "append", "field": "notes", "value": "Porte de fer"},
+    ]
+    assert client.patch(base, json={"ops": ops}).status_code == 200
+    assert client.patch(base, json={"current_stamina": 0, "is_active": False}).status_code == 200
+
+
+def test_snapshots_are_taken_at_multiples_of_the_interval(
+    client: TestClient, sheet: dict, snapshot_every_three: None
+) -> None:
+    """Un lot d'événements qui franchit un multiple de l'intervalle y prend l'instantané, pas à sa fin."""
+    play(client, sheet)
+
+    sequences = [sequence for sequence, _ in snapshots(sheet["id"])]
+    assert sequences == [3, 6]
+
+
+def test_rebuild_matches_stored_sheet_and_snapshots(
+    client: TestClient, sheet: dict, snapshot_every_three: None
+) -> None:
+    """Rejouer tout le journal redonne la feuille et les instantanés enregistrés au fil des modifications."""
+    play(client, sheet)
+    stored = client.get(f"/api/adventure-sheets/{sheet['id']}").json()
+    stored_snapshots = snapshots(sheet["id"])
+
+    response = client.post(f"/api/adventure-sheets/{sheet['id']}/rebuild")
+
+    assert response.status_code == 200
+    rebuilt = response.json()
+    assert rebuilt.pop("sequence") == 8
+    assert rebuilt == stored
+    assert snapshots(sheet["id"]) == stored_snapshots
+
+
+def test_rebuild_refreshes_book_counters(client: TestClient, book: dict) -> None:
+    """La reconstruction remet la feuille et les statistiques de son livre d'accord avec le journal."""
+    sheet = client.post("/api/adventure-sheets", json={"book_id": book["id"]}).json()
+    client.patch(f"/api/adventure-sheets/{sheet['id']}", json={"current_stamina": 0, "is_active": False})
+    analytics = f"/api/analytics/books/{book['id']}"
+    assert client.get(analytics).json()["death_count"] == 1
+
+    # Feuille modifiée hors journal, statistiques recalculées d'après elle, puis feuille reconstruite
+    with SessionLocal() as db:
+        db.execute(update(AdventureSheet).where(AdventureSheet.id == sheet["id"]).values(is_active=True))
+        db.commit()
+        rebuild_analytics(db)
+    assert client.get(analytics).json()["death_count"] == 0
+    client.post(f"/api/adventure-sheets/{sheet['id']}/rebuild")
+
+    assert client.get(f"/api/adventure-sheets/{sheet['id']}").json()["is_active"] is False
+    counters = client.get(analytics).json()
+    assert (counters["attempt_count"], counters["finished_count"], counters["death_count"]) == (1, 1, 1)
@@ -0,0 +1,93 @@
+"""Tests de la modification partielle des feuilles d'aventure (PATCH)."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def patch(client: TestClient, sheet: dict, body: dict) -> dict:
+    """Envoie un PATCH valide et retourne sa réponse."""
+    response = client.patch(f"/api/adventure-sheets/{sheet['id']}", json=body)
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def test_merge_patch_returns_only_changed_fields(client: TestClient, sheet: dict) -> None:
+    """Un JSON Merge Patch remplace les champs donnés et ne retourne qu'eux, avec l'ID et la date."""
+    result = patch(client, sheet, {"gold": 12, "notes": "Clé de cuivre"})
+
+    assert set(result) == {"id", "gold", "notes", "updated_at"}
+    stored = client.get(f"/api/adventure-sheets/{sheet['id']}").json()
+    assert (stored["gold"], stored["notes"]) == (12, "Clé de cuivre")
+    assert stored["current_stamina"] == sheet["current_stamina"]
+
+
+def test_inc_ops_are_applied_in_sql_and_floored_at_zero(client: TestClient, sheet: dict) -> None:
+    """Les incréments partent de la valeur en base, s'enchaînent, et ne descendent pas sous 0."""
+    patch(client, sheet, {"gold": 5})
+    result = patch(
+        client,
+        sheet,
+        {
+            "ops": [
+                {"op": "inc", "field": "gold", "value": 3},
+                {"op": "inc", "field": "gold", "value": 2},
+                {"op": "inc", "field": "current_stamina", "value": -1000},
+            ]
+        },
+    )
+
+    assert result["gold"] == 10
+    assert result["current_stamina"] == 0
+
+
+def test_set_then_inc_on_the_same_field(client: TestClient, sheet: dict) -> None:
+    """Un incrément après un "set" du même champ part de la valeur posée."""
+    result = patch(
+        client, sheet, {"ops": [{"op": "set", "field": "gold", "value": 4}, {"op": "inc", "field": "gold", "value": 1}]}
+    )
+
+    assert result["gold"] == 5
+
+
+def test_append_ops_use_each_field_separator(client: TestClient, sheet: dict) -> None:
+    """Un ajout à un champ vide pose la valeur, les suivants l'ajoutent avec le séparateur du champ."""
+    ops = [
+        {"op": "append", "field": "potions", "value": "Potion d'Adresse"},
+        {"op": "append", "field": "potions", "value": "Potion de Vigueur"},
+        {"op": "append", "field": "equipment", "value": "Épée"},
+        {"op": "append", "field": "equipment", "value": "Bouclier"},
+    ]
+    result = patch(client, sheet, {"ops": ops})
+
+    assert result["potions"] == "Potion d'Adresse, Potion de Vigueur"
+    assert result["equipment"] == "Épée\nBouclier"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"current_stamina": None},
+        {"is_active": None},
+        {"ops": [{"op": "set", "field": "current_luck", "value": None}]},
+        {"ops": [{"op": "set", "field": "gold", "value": "beaucoup"}]},
+        {"ops": [{"op": "inc", "field": "notes", "value": 1}]},
+        {"ops": [{"op": "inc", "field": "gold", "value": 1.5}]},
+        {"ops": [{"op": "append", "field": "gold", "value": "x"}]},
+        {"ops": [{"op": "append", "field": "notes", "value": ""}]},
+        {"ops": [{"op": "set", "field": "attempt_number", "value": 3}]},
+        {},
+    ],
+)
+def test_invalid_patches_are_rejected(client: TestClient, sheet: dict, body: dict) -> None:
+    """null sur un champ obligatoire, une opération invalide ou un patch vide sont refusés sans rien modifier."""
+    response = client.patch(f"/api/adventure-sheets/{sheet['id']}", json=body)
+
+    assert response.status_code in (400, 422)
+    assert client.get(f"/api/adventure-sheets/{sheet['id']}").json() == sheet
+
+
+def test_patch_unknown_sheet_returns_404(client: TestClient) -> None:
+    """Modifier une feuille qui n'existe pas répond 404."""
+    response = client.patch("/api/adventure-sheets/999999", json={"gold": 1})
+
+    assert response.status_code == 404
@@ -0,0 +1,103 @@
+"""Tests du solveur exact des combats (solver.py), comparé au simulateur de Monte-Carlo."""
+
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from ldvh_companion.models import LuckPolicy
+from ldvh_companion.simulation import simulate_combats
+from ldvh_companion.solver import (
+    MAX_SOLVER_LUCK,
+    MAX_SOLVER_STAMINA,
+    combat_odds,
+    luck_decision_table,
+    round_probabilities,
+    solve_state,
+)
+
+
+@pytest.mark.parametrize(
+    ("player_skill", "player_stamina", "player_luck", "monster_skill", "monster_stamina"),
+    [(10, 20, 9, 8, 10), (8, 14, 7, 10, 12), (11, 6, 12, 11, 6)],
+)
+def test_solver_matches_simulation(
+    player_skill: int, player_stamina: int, player_luck: int, monster_skill: int, monster_stamina: int
+) -> None:
+    """Les probabilités exactes (sans chance, et avec la stratégie optimale) sont celles du simulateur."""
+    odds = combat_odds(player_skill, player_stamina, player_luck, monster_skill, monster_stamina)
+
+    for policy, expected in [
+        (LuckPolicy.NEVER, odds.win_probability_without_luck),
+        (LuckPolicy.OPTIMAL, odds.win_probability),
+    ]:
+        result = simulate_combats(
+            player_skill,
+            player_stamina,
+            player_luck,
+            monster_skill,
+            monster_stamina,
+            luck_policy=policy,
+            simulations=200_000,
+            max_rounds=1000,
+            rng=np.random.default_rng(42),
+        )
+        assert result.win_probability == pytest.approx(expected, abs=0.005)
+
+
+def test_optimal_strategy_is_never_worse() -> None:
+    """Tenter sa chance au bon moment ne fait jamais baisser la probabilité de victoire."""
+    for luck in range(MAX_SOLVER_LUCK + 1):
+        with_luck, _ = solve_state(0, 12, 12, luck)
+        without_luck, _ = solve_state(0, 12, 12, 0)
+        assert with_luck >= without_luck
+
+
+def test_terminal_states_and_round_probabilities() -> None:
+    """Un joueur sans endurance a perdu, un monstre sans endurance est vaincu ; un assaut a trois issues."""
+    assert solve_state(0, 0, 10, 5) == (0.0, False)
+    assert solve_state(0, 10, 0, 5) == (1.0, False)
+    assert sum(round_probabilities(0)) == pytest.approx(1)
+    assert round_probabilities(11) == (1.0, 0.0, 0.0)
+    assert solve_state(40, 1, MAX_SOLVER_STAMINA, 0) == (1.0, False)
+
+
+def test_decision_table_matches_solver() -> None:
+    """La table des décisions du simulateur donne les mêmes décisions que le solveur."""
+    table = luck_decision_table(-2, 12, 10, 6)
+
+    assert table.shape == (13, 11, 7)
+    assert not table.flags.writeable
+    for player, monster, luck in [(12, 10, 6), (3, 8, 2), (1, 1, 1), (7, 2, 6)]:
+        assert table[player, monster, luck] == solve_state(-2, player, monster, luck)[1]
+
+
+def test_largest_state_is_fast() -> None:
+    """Le plus grand état accepté se résout vite, et les lectures suivantes sont immédiates."""
+    started = time.perf_counter()
+    combat_odds(10, MAX_SOLVER_STAMINA, MAX_SOLVER_LUCK, 10, MAX_SOLVER_STAMINA)
+    assert time.perf_counter() - started < 2
+
+    started = time.perf_counter()
+    for stamina in range(1, MAX_SOLVER_STAMINA + 1):
+        solve_state(0, stamina, stamina, MAX_SOLVER_LUCK)
+    assert time.perf_counter() - started < 0.1
+
+
+def test_odds_out_of_bounds_returns_400(client: TestClient) -> None:
+    """La route des chances refuse une chance au-delà des tables du solveur."""
+    state = {
+        "monster_name": "Orque",
+        "monster_skill": 8,
+        "monster_stamina": 10,
+        "monster_max_stamina": 10,
+        "player_skill": 10,
+        "player_stamina": 20,
+        "player_luck": MAX_SOLVER_LUCK + 1,
+        "player_max_luck": MAX_SOLVER_LUCK + 1,
+    }
+    response = client.post("/api/combat/odds", json=state)
+
+    assert response.status_code == 400
+    assert str(MAX_SOLVER_LUCK) in response.json()["detail"]
@@ -0,0 +1,153 @@
+"""Tests de l'export et de l'import en masse (transfer.py)."""
+
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine, func, select
+from sqlalchemy.orm import Session
+
+from ldvh_companion import archive
+from ldvh_companion.archive import archive_finished_sheets
+from ldvh_companion.database import create_db_engine
+from ldvh_companion.models import AdventureSheet, Base, Book, Combat, Encounter, Series
+from ldvh_companion.transfer import export_lines, import_lines
+
+
+def create_database(path: Path) -> Engine:
+    """Crée une base SQLite vide avec toutes les tables."""
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def add_default_catalog(db: Session) -> Series:
+    """Ajoute la série et les tomes créés par init_db au démarrage d'une base vide."""
+    series = Series(name="Défis fantastiques", description="Série de livres dont vous êtes le héros")
+    series.books = [Book(title=f"Tome {number}", book_number=number) for number in (1, 2, 3)]
+    db.add(series)
+    db.commit()
+    return series
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Engine:
+    """Base contenant le catalogue de départ et une feuille avec une rencontre et un combat."""
+    engine = create_database(tmp_path / "source.db")
+    with Session(engine) as db:
+        series = add_default_catalog(db)
+        sheet = AdventureSheet(
+            book_id=series.books[1].id,
+            attempt_number=1,
+            character_name="Alaric",
+            initial_skill=10,
+            initial_stamina=20,
+            initial_luck=9,
+            current_skill=10,
+            current_stamina=14,
+            current_luck=8,
+        )
+        sheet.encounters = [Encounter(position=0, name="Orque", skill=6, stamina=5, paragraph=12)]
+        sheet.combats = [Combat(monster_name="Orque", monster_skill=6, monster_max_stamina=5, winner="player")]
+        db.add(sheet)
+        db.commit()
+    return engine
+
+
+def test_keep_round_trip_into_empty_database(source: Engine, tmp_path: Path) -> None:
+    """Un export restauré avec mode=keep dans une base vide redonne exactement le même export."""
+    exported = "".join(export_lines(source))
+    target = create_database(tmp_path / "target.db")
+
+    with Session(target) as db:
+        counts = import_lines(db, exported.splitlines(keepends=True), "keep")
+
+    assert counts["series"] == 1
+    assert counts["books"] == 3
+    assert counts["adventure_sheets"] == 1
+    assert counts["encounters"] == 1
+    assert counts["combats"] == 1
+    assert "".join(export_lines(target)) == exported
+
+
+def test_remap_reuses_existing_series_and_books(source: Engine, tmp_path: Path) -> None:
+    """Avec mode=remap, la série et les livres déjà présents sont réutilisés, sous d'autres identifiants.
+
+    La tentative importée prend le prochain numéro libre de son livre.
+    """
+    exported = "".join(export_lines(source))
+    target = create_database(tmp_path / "target.db")
+    with Session(target) as db:
+        db.add(Series(name="Sorcellerie !"))
+        db.commit()
+        series = add_default_catalog(db)
+        db.add(
+            AdventureSheet(
+                book_id=series.books[1].id,
+                attempt_number=1,
+                initial_skill=7,
+                initial_stamina=14,
+                initial_luck=7,
+                current_skill=7,
+                current_stamina=0,
+                current_luck=7,
+            )
+        )
+        db.commit()
+
+        counts = import_lines(db, exported.splitlines(keepends=True), "remap")
+
+        assert counts["series"] == 0
+        assert counts["books"] == 0
+        assert counts["adventure_sheets"] == 1
+        assert db.scalar(select(func.count()).select_from(Series)) == 2
+        assert db.scalar(select(func.count()).select_from(Book)) == 3
+
+        sheet = db.scalars(select(AdventureSheet).where(AdventureSheet.character_name == "Alaric")).one()
+        assert sheet.book.series.name == "Défis fantastiques"
+        assert sheet.book.book_number == 2
+        assert sheet.attempt_number == 2
+        assert [encounter.name for encounter in sheet.encounters] == ["Orque"]
+        assert [combat.winner for combat in sheet.combats] == ["player"]
+
+
+def test_archived_sheets_are_exported_with_one_decompression_each(
+    source: Engine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Les feuilles archivées sont exportées avec les courantes, chaque archive n'étant décompressée qu'une fois."""
+    with Session(source) as db:
+        book_id = db.scalar(select(Book.id).where(Book.book_number == 3))
+        for number in (1, 2):
+            sheet = AdventureSheet(
+                book_id=book_id,
+                attempt_number=number,
+                initial_skill=9,
+                initial_stamina=18,
+                initial_luck=8,
+                current_skill=9,
+                current_stamina=0,
+                current_luck=8,
+                is_active=False,
+            )
+            sheet.encounters = [Encounter(position=0, name="Troll", skill=9, stamina=10)]
+            sheet.combats = [Combat(monster_name="Troll", monster_skill=9, monster_max_stamina=10, winner="monster")]
+            db.add(sheet)
+        db.commit()
+        assert archive_finished_sheets(db, older_than_days=0) == 2
+
+    decompressed = []
+    decompress = archive.decompress
+    monkeypatch.setattr(
+        archive, "decompress", lambda data, codec: decompressed.append(codec) or decompress(data, codec)
+    )
+    exported = "".join(export_lines(source))
+
+    assert len(decompressed) == 2
+    tables = [json.loads(line).get("table") for line in exported.splitlines()[1:]]
+    assert (tables.count("adventure_sheets"), tables.count("encounters"), tables.count("combats")) == (3, 3, 3)
+
+    # Importées dans une base vide, les feuilles archivées deviennent courantes
+    target = create_database(tmp_path / "target.db")
+    with Session(target) as db:
+        counts = import_lines(db, exported.splitlines(keepends=True), "keep")
+    assert (counts["adventure_sheets"], counts["encounters"], counts["combats"]) == (3, 3, 3)